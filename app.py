@@ -1,14 +1,40 @@
 import time
+import json
+import asyncio
 import logging
 import os
 import sys
-import json
-import re
-import urllib.request
+import uuid
+import threading
+import inspect
+import atexit
 from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, send_from_directory
+from urllib.parse import urlparse
+from flask import Flask, Response, request, jsonify, send_from_directory, g
 from flask_cors import CORS
 
+from async_engine import AsyncEngine
+from browser_pool import BrowserPool
+from jobs import JobQueue, QueueFull
+from purchase_flow import StepFlow, Step, Retry, Abort, Rewind
+from session_cache import SessionCache
+from screen_stream import ScreenHub, BOUNDARY as SCREEN_BOUNDARY
+from selector_cache import SelectorResolver
+from network_filter import ResourceFilter
+from selftest import SelfTest
+from static_assets import AssetPipeline, IMMUTABLE, SHELL_CACHE
+from history_store import HistoryStore, encode_cursor, decode_cursor
+from draw_archive import DrawArchive
+from stats_engine import StatsEngine
+from combo_index import ComboIndex
+from backtest import Backtester, BacktestError, parse_numbers as parse_backtest_numbers
+import draw_calendar
+import lotto_match
+import recommender
+import combo_index as combos
+import metrics
+import numpy as np
+
 # ── Render/Docker 환경 브라우저 경로 근본 해결 ──────────────────
 def _setup_browser_env():
     # 1. 환경변수가 이미 설정되어 있고 존재한다면 최우선 사용
@@ -33,7 +59,7 @@ def _setup_browser_env():
         os.environ['PLAYWRIGHT_BROWSERS_PATH'] = "/opt/render/.cache/ms-playwright"
     return None
 
-_setup_browser_env()
+BROWSERS_PATH = _setup_browser_env()
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
@@ -48,8 +74,11 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 app = Flask(__name__)
 CORS(app)
 
-# ── 구매 이력 파일 ─────────────────────────────────────────────
-HISTORY_FILE = os.path.join(BASE_DIR, 'purchase_history.json')
+# ── 구매 이력 저장소 ───────────────────────────────────────────
+HISTORY_FILE = os.path.join(BASE_DIR, 'purchase_history.json')  # 구버전 JSON (가져오기 전용)
+HISTORY_DB = os.environ.get('HISTORY_DB', os.path.join(BASE_DIR, 'purchase_history.db'))
+HISTORY_RETENTION_DAYS = 30
+HISTORY_PAGE_MAX = 1000
 
 # ── User-Agent ────────────────────────────────────────────────
 UA = (
@@ -58,14 +87,129 @@ UA = (
     "Chrome/133.0.0.0 Safari/537.36"
 )
 
-# ── 실시간 화면 중계용 ──────────────────────────────────────────
-latest_screenshot = None
+# ── 동행복권 주소 (로컬 모의 사이트 bench/mock_dhlottery.py 사용 시 교체) ──
+DHL_WWW = os.environ.get('DHL_WWW_BASE', 'https://www.dhlottery.co.kr').rstrip('/')
+DHL_OL = os.environ.get('DHL_OL_BASE', 'https://ol.dhlottery.co.kr').rstrip('/')
+DHL_EL = os.environ.get('DHL_EL_BASE', 'https://el.dhlottery.co.kr').rstrip('/')
+
+# ── 당첨번호 아카이브 (회차별 결과 영구 보관) ──────────────────
+draw_archive = DrawArchive(
+    os.environ.get('DRAW_ARCHIVE_FILE', os.path.join(BASE_DIR, 'draw_archive.json')),
+    user_agent=UA,
+)
+
+# ── 당첨번호 통계 (아카이브 갱신 시에만 증분 재계산) ───────────
+stats_engine = StatsEngine()
+_stats_version = -1
+
+def _refresh_stats():
+    global _stats_version
+    version = draw_archive.version
+    if version != _stats_version:
+        stats_engine.update(draw_archive.all())
+        _stats_version = version
+
+# ── 회차별 당첨 마스크 배열 (아카이브 갱신 시에만 재생성) ──────
+_draw_masks = {"version": -1}
+
+def _get_draw_masks():
+    if _draw_masks["version"] != draw_archive.version:
+        draws = draw_archive.all()
+        _draw_masks.update(
+            version=draw_archive.version,
+            rounds=np.array([d['round'] for d in draws], dtype=np.int64),
+            masks=np.array([lotto_match.numbers_to_mask(d['numbers']) for d in draws], dtype=np.uint64),
+            bonus=np.array([1 << (d['bonus'] - 1) for d in draws], dtype=np.uint64),
+        )
+    return _draw_masks
+
+# ── 전략 백테스트 (프로세스 풀은 첫 대규모 실행 시 생성, 결과는 조건별 캐시) ──
+BACKTEST_MAX_TICKETS = int(os.environ.get('BACKTEST_MAX_TICKETS', 100000))
+backtester = Backtester(workers=int(os.environ.get('BACKTEST_WORKERS', 2)))
+atexit.register(backtester.shutdown)
+
+# ── 전체 조합 색인 (역대 1등 비트셋 + 회차별 선택 수, memmap) ──
+combo_index = ComboIndex(os.environ.get('COMBO_INDEX_DIR', os.path.join(BASE_DIR, '.combo_index')))
+_combo_winners = {"version": -1}
+
+def _sync_combo_winners():
+    if _combo_winners["version"] != draw_archive.version:
+        combo_index.sync_winners(draw_archive.all())
+        _combo_winners["version"] = draw_archive.version
+
+def _rebuild_combo_round(round_no):
+    """구매 이력에서 해당 회차 선택 수를 다시 계산"""
+    rows = [r for r in history_store.tickets() if _ticket_round(r[3], r[1]) == round_no]
+    masks = np.array([r[4] for r in rows], dtype=np.uint64)
+    combo_index.rebuild_round(round_no, combos.rank_many(combos.masks_to_combos(masks)) if len(masks) else [])
+
+def _record_combo_picks(entries, delta):
+    """이력 항목 [(회차 문자열, 구매 시각, 번호 마스크)] 의 선택 수를 회차별로 증감
+    색인이 없는 회차는 건너뜀 (색인은 판매 회차 구매 기록 시에만 생성)"""
+    by_round = {}
+    for round_text, timestamp, mask in entries:
+        by_round.setdefault(_ticket_round(round_text, timestamp), []).append(mask)
+    for round_no, masks in by_round.items():
+        if round_no >= 1:
+            ranks = combos.rank_many(combos.masks_to_combos(np.array(masks, dtype=np.uint64)))
+            combo_index.record_picks(round_no, ranks, delta=delta, create=False)
+
+def _combo_round(round_no=None):
+    """조회 회차 (기본 판매 회차) 검증 - 조회는 파일을 만들지 않으며 색인 없는 회차는 선택 수 0
+    1 ~ 판매 회차 밖이면 ValueError"""
+    current = draw_calendar.sales_round()
+    round_no = current if round_no is None else round_no
+    if not 1 <= round_no <= current:
+        raise ValueError(f"회차는 1~{current} 사이여야 합니다.")
+    return round_no
+
+def _combo_round_arg():
+    """?round= → 검증된 회차 (없으면 판매 회차)"""
+    raw = request.args.get('round', '').strip()
+    if not raw:
+        return _combo_round()
+    try:
+        return _combo_round(int(raw))
+    except ValueError as e:
+        raise ValueError(str(e) if raw.lstrip('-').isdigit() else "회차 형식 오류") from None
+
+def _ticket_round(round_text, timestamp):
+    """이력의 회차 문자열 → 정수 (미상이면 구매 시각으로 판매 회차 계산)"""
+    if round_text and str(round_text).isdigit():
+        return int(round_text)
+    try:
+        bought = datetime.fromisoformat(timestamp).astimezone(draw_calendar.KST)
+        return draw_calendar.sales_round(bought)
+    except ValueError:
+        return 0
+
+# ── 학습형 셀렉터 해석기 (버튼별 성공 프레임 기억, 셀렉터는 항상 우선순위 순) ──────
+selector_resolver = SelectorResolver(
+    os.environ.get('SELECTOR_CACHE_FILE', os.path.join(BASE_DIR, 'selector_cache.json'))
+)
+
+# ── 프런트엔드 자산 (인라인 CSS/JS 분리 + 사전 압축, 기동 시 빌드) ──
+asset_pipeline = AssetPipeline(os.path.join(BASE_DIR, 'lotto_ai.html'))
+
+# ── 실시간 화면 중계용 (작업별 채널, 프레임률 상한 SCREEN_MAX_FPS, 동시 시청자 상한) ──
+screen_hub = ScreenHub(
+    max_fps=float(os.environ.get('SCREEN_MAX_FPS', 4)),
+    max_viewers=int(os.environ.get('SCREEN_MAX_VIEWERS', 4)),
+    max_viewers_per_channel=int(os.environ.get('SCREEN_MAX_VIEWERS_PER_JOB', 2)),
+)
+
+# ── 네트워크 리소스 필터 (RESOURCE_FILTER_MODE=off|lite|strict) ──
+resource_filter = ResourceFilter(
+    os.environ.get('RESOURCE_FILTER_MODE', 'off').strip().lower(),
+    first_party_hosts={urlparse(u).hostname for u in (DHL_WWW, DHL_OL, DHL_EL)},
+)
 
 # ── 프록시/타이밍 설정 ──────────────────────────────────────────
 PROXY_SERVER = os.environ.get('PROXY_SERVER') # 예: http://ip:port
 PROXY_USER = os.environ.get('PROXY_USER')
 PROXY_PASS = os.environ.get('PROXY_PASS')
 DEFAULT_TIMEOUT = 60000 # 60초 (60,000ms)
+MAX_GAMES_PER_SLIP = 5  # 동행복권 1회 구매 최대 게임 수 (슬립 1장 A~E)
 
 def _get_proxy_config():
     if not PROXY_SERVER:
@@ -79,35 +223,30 @@ def _get_proxy_config():
 # ══════════════════════════════════════════════════════════════
 #  이력 관리
 # ══════════════════════════════════════════════════════════════
-def load_history(user_id=None):
-    """구매 이력 로드 + 30일 초과 자동 삭제 (user_id 기준 필터)"""
-    if not os.path.exists(HISTORY_FILE):
-        return []
+# SQLite(WAL) 저장소: 기존 JSON 파일은 최초 기동 시 1회 가져옴
+history_store = HistoryStore(HISTORY_DB, retention_days=HISTORY_RETENTION_DAYS)
+
+def load_history(user_id=None, limit=None, offset=0):
+    """구매 이력 로드 (30일 이내, 최신순, user_id 기준 필터 + 페이지 단위)"""
     try:
-        with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-            history = json.load(f)
-        cutoff = datetime.now() - timedelta(days=30)
-        filtered = [h for h in history if datetime.fromisoformat(h['timestamp']) > cutoff]
-        if len(filtered) != len(history):
-            save_history(filtered)
-        # 사용자 ID로 필터링
-        if user_id:
-            filtered = [h for h in filtered if h.get('user_id') == user_id]
-        return filtered
+        return history_store.list(user_id=user_id, limit=limit, offset=offset)
     except Exception as e:
         logger.error(f"[HISTORY] 로드 실패: {e}")
         return []
 
-def save_history(history):
+def delete_history(user_id=None):
     try:
-        with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(history, f, ensure_ascii=False, indent=2)
+        removed = [(r[3], r[1], r[4]) for r in history_store.tickets(user_id=user_id)]
+        history_store.delete(user_id=user_id)
     except Exception as e:
-        logger.error(f"[HISTORY] 저장 실패: {e}")
+        logger.error(f"[HISTORY] 삭제 실패: {e}")
+        return
+    try:  # 지운 항목의 선택 수만 차감
+        _record_combo_picks(removed, -1)
+    except Exception as e:
+        logger.warning(f"[COMBO] 선택 수 갱신 실패: {e}")
 
 def add_history(numbers, round_no, round_date, user_id=None):
-    # 전체 이력 로드 (필터 없이)
-    history = load_history()
     entry = {
         'timestamp': datetime.now().isoformat(),
         'numbers': numbers,
@@ -115,123 +254,269 @@ def add_history(numbers, round_no, round_date, user_id=None):
         'round_date': round_date or datetime.now().strftime('%Y-%m-%d'),
         'user_id': user_id or 'unknown',
     }
-    history.insert(0, entry)
-    save_history(history[:500])
+    try:
+        history_store.add(entry)
+    except Exception as e:
+        logger.error(f"[HISTORY] 저장 실패: {e}")
+        return entry
+    try:
+        round_int = _ticket_round(entry['round'], entry['timestamp'])
+        if round_int >= 1 and not combo_index.record_picks(round_int, [combos.rank(numbers)], create=False) \
+                and round_int == draw_calendar.sales_round():
+            _rebuild_combo_round(round_int)  # 판매 회차 색인 최초 생성 (방금 저장한 항목까지 포함)
+    except Exception as e:
+        logger.warning(f"[COMBO] 선택 수 기록 실패: {e}")
     return entry
 
 # ══════════════════════════════════════════════════════════════
 #  Playwright 헬퍼
 # ══════════════════════════════════════════════════════════════
-def _get_playwright_module():
-    """Playwright를 lazy import (서버 시작 속도에 영향 주지 않도록)"""
-    from playwright.sync_api import sync_playwright
-    return sync_playwright
+def _browser_launch_options():
+    is_headless = bool(os.environ.get('RENDER') or os.environ.get('DOCKER_ENV'))
+    logger.info(f"[CORE] Headless={is_headless}")
+    return dict(
+        headless=is_headless,
+        proxy=_get_proxy_config(),
+        args=[
+            "--no-sandbox",
+            "--disable-setuid-sandbox",
+            "--disable-dev-shm-usage",
+            "--disable-blink-features=AutomationControlled",
+            "--disable-infobars",
+            "--disable-gpu",
+            "--no-zygote",
+            "--disable-software-rasterizer"
+        ]
+    )
+
+# 앱 프로세스가 소유하는 상시 대기 브라우저 풀 (구매마다 새 컨텍스트만 생성)
+browser_pool = BrowserPool(
+    _browser_launch_options,
+    max_contexts_per_browser=int(os.environ.get('POOL_MAX_CONTEXTS', 50)),
+    max_browser_age=int(os.environ.get('POOL_MAX_AGE_SEC', 3600)),
+)
+atexit.register(browser_pool.shutdown)
+
+# 백그라운드 자가 진단 (요청 경로에서는 캐시된 결과만 읽음)
+self_test = SelfTest(
+    browsers_path=BROWSERS_PATH or os.environ.get('PLAYWRIGHT_BROWSERS_PATH'),
+    launch_options=_browser_launch_options,
+    upstream_url=f"{DHL_WWW}/",
+    work_dir=BASE_DIR,
+    interval=int(os.environ.get('SELFTEST_INTERVAL_SEC', 60)),
+    browser_interval=int(os.environ.get('SELFTEST_BROWSER_INTERVAL_SEC', 1800)),
+    min_disk_mb=int(os.environ.get('SELFTEST_MIN_DISK_MB', 200)),
+    min_memory_mb=int(os.environ.get('SELFTEST_MIN_MEMORY_MB', 300)),
+    user_agent=UA,
+)
+
+# 계정별 로그인 세션 캐시 (재구매 시 로그인 생략)
+session_cache = SessionCache(
+    directory=os.environ.get('SESSION_CACHE_DIR', os.path.join(BASE_DIR, '.session_cache')),
+    secret=os.environ.get('SESSION_CACHE_KEY'),
+    ttl=int(os.environ.get('SESSION_CACHE_TTL', 1800)),
+    max_entries=int(os.environ.get('SESSION_CACHE_MAX', 100)),
+)
+SESSION_PROBE_URL = f"{DHL_WWW}/userSsl.do?method=myPage"
 
 def _capture_screenshot(page):
-    """현재 브라우저 화면 캡처 및 전역 변수 업데이트"""
-    global latest_screenshot
+    """현재 작업 채널에 화면 기록 (screencast 동작 중이면 생략 → 구매 흐름 지연 없음)"""
+    screen_hub.capture(page)
+
+LOGIN_FAIL_MARKERS = ("로그인 정보가 맞지 않습니다", "아이디 또는 비밀번호")
+INTERSTITIAL_BUTTONS = [
+    "a:text-is('동행복권통합포탈이동')",
+    "button:text-is('동행복권통합포탈이동')",
+    "a:has-text('통합포탈')",
+    "button:has-text('통합포탈')",
+    "a:text-is('동행복권포탈이동')", # 기존 대비용
+]
+
+LOGIN_WAIT_MS = 15000  # 로그인 버튼 클릭 후 상태 판별 대기 예산
+LOGIN_POLL_MS = 100
+
+# 로그인 상태 판별 (evaluate 1회, DOM 직렬화 없이 페이지 안에서 바로 확인)
+#   logged_in       : 로그아웃 링크 / 마이페이지 링크
+#   bad_credentials : 로그인 실패 문구
+#   interstitial    : '간소화 페이지 운영 중' 안내
+#   null            : 아직 로딩 중 (wait_for_function 이 계속 폴링)
+# 세션 쿠키(JSESSIONID)는 HttpOnly 이고 로그인 전에도 발급되므로 판별 근거로 쓰지 않는다.
+# ignore 에 든 상태는 null 로 취급 (간소화 페이지 버튼 클릭 후 이동을 기다릴 때 등)
+JS_LOGIN_STATE = """({failMarkers, ignore}) => {
+    const body = document.body;
+    if (!body) return null;
+    const text = body.textContent || '';
+    const states = [];
+    if (text.includes('간소화') && text.includes('운영')) states.push('interstitial');
+    if (document.querySelector('.btn_logout, a[href*="logout" i], a[href*="myPage"]') || text.includes('로그아웃'))
+        states.push('logged_in');
+    if (failMarkers.some(m => text.includes(m))) states.push('bad_credentials');
+    return states.find(s => !ignore.includes(s)) || null;
+}"""
+JS_TEXT_INCLUDES = """(words) => {
+    const text = document.body ? document.body.textContent : '';
+    return words.some(w => text.includes(w));
+}"""
+
+def _login_state_arg(ignore=()):
+    return {"failMarkers": list(LOGIN_FAIL_MARKERS), "ignore": list(ignore)}
+
+# ══════════════════════════════════════════════════════════════
+#  동기/비동기 공용 실행 계층
+# ══════════════════════════════════════════════════════════════
+# 로그인/구매 흐름은 제너레이터 스크립트(*_script, PurchaseSession.step_*) 하나로만 작성하고
+# 페이지 호출은 yield 로 넘긴다. 엔진별로 다른 것은 아래 두 실행기와 Op 표뿐이다.
+#   yield lambda: page.goto(...)  → 두 API 의 메서드 이름이 같으므로 그대로 호출 (async 면 await)
+#   yield Op("sleep", 3)          → 엔진마다 구현이 다른 동작 (SYNC_OPS / ASYNC_OPS)
+# 호출 결과는 yield 의 값으로 돌아오고 예외는 yield 지점에서 다시 발생하므로 스크립트 안의 try/except 가
+# 그대로 동작한다. 하위 스크립트는 yield from 으로 호출한다.
+
+class Op:
+    """엔진별 구현이 다른 동작 (name → SYNC_OPS / ASYNC_OPS 의 함수에 args 그대로 전달)"""
+    __slots__ = ("name", "args")
+
+    def __init__(self, name, *args):
+        self.name = name
+        self.args = args
+
+def run_sync(script):
+    """스크립트를 동기 Playwright 로 실행 → 스크립트 반환값"""
+    value, error = None, None
+    while True:
+        try:
+            op = script.throw(error) if error is not None else script.send(value)
+        except StopIteration as stop:
+            return stop.value
+        value, error = None, None
+        try:
+            value = SYNC_OPS[op.name](*op.args) if isinstance(op, Op) else op()
+        except Exception as e:
+            error = e
+
+async def run_async(script):
+    """run_sync 의 async 판 - 호출 결과가 awaitable 이면 await (대기 중 이벤트 루프 양보)"""
+    value, error = None, None
+    while True:
+        try:
+            op = script.throw(error) if error is not None else script.send(value)
+        except StopIteration as stop:
+            return stop.value
+        value, error = None, None
+        try:
+            value = ASYNC_OPS[op.name](*op.args) if isinstance(op, Op) else op()
+            if inspect.isawaitable(value):
+                value = await value
+        except Exception as e:
+            error = e
+
+def _login_state_script(page):
+    """현재 로그인 상태 1회 판별 → logged_in / bad_credentials / interstitial / loading"""
     try:
-        # 가벼운 JPEG 포맷으로 캡처 (용량 최적화)
-        latest_screenshot = page.screenshot(type="jpeg", quality=60)
-    except Exception as e:
-        logger.debug(f"[SCREEN] 캡처 실패: {e}")
+        return (yield lambda: page.evaluate(JS_LOGIN_STATE, _login_state_arg())) or "loading"
+    except Exception:
+        return "loading"
 
-def is_logged_in(page):
+def _wait_login_state_script(page, timeout_ms, ignore=()):
+    """로그인 상태가 판별될 때까지 대기 (상태가 바뀌는 즉시 반환, 시간 초과 시 loading)"""
+    try:
+        handle = yield lambda: page.wait_for_function(JS_LOGIN_STATE, arg=_login_state_arg(ignore),
+                                                      timeout=timeout_ms, polling=LOGIN_POLL_MS)
+        return (yield lambda: handle.json_value())
+    except Exception:
+        return "loading"
+
+def _probe_session_script(context):
+    """캐시된 세션 유효성 확인 (페이지 렌더링 없이 API 요청 1회)"""
     try:
-        content = page.content()
-        return "로그아웃" in content or "btn_logout" in content or "myPage" in content
-    except:
+        resp = yield lambda: context.request.get(SESSION_PROBE_URL, timeout=10000)
+        if not resp.ok or "login" in resp.url.lower():
+            return False
+        body = yield lambda: resp.text()
+        return "로그아웃" in body or "btn_logout" in body
+    except Exception as e:
+        logger.debug(f"[SESSION] 세션 확인 실패: {e}")
         return False
 
-def do_login(page, user_id, user_pw):
+def _login_script(page, user_id, user_pw):
     logger.info(f"[LOGIN] '{user_id}' 로그인 시도...")
     try:
         logger.info("[LOGIN] 메인 홈페이지 먼저 접속 후 대기...")
-        page.goto("https://www.dhlottery.co.kr/", wait_until="domcontentloaded", timeout=DEFAULT_TIMEOUT)
-        time.sleep(3)
+        yield lambda: page.goto(f"{DHL_WWW}/", wait_until="domcontentloaded", timeout=DEFAULT_TIMEOUT)
+        yield Op("sleep", 3)
 
         logger.info("[LOGIN] 로그인 페이지로 이동...")
         # 리퍼러(이전 페이지 기록)를 조작하여 정상적인 링크 탑승으로 완전 위장
-        page.goto("https://www.dhlottery.co.kr/login", 
-                  referer="https://www.dhlottery.co.kr/", 
-                  wait_until="domcontentloaded", timeout=DEFAULT_TIMEOUT)
-        time.sleep(2)
-
-        # 변경된 아이디 입력창 (#inpUserId)
-        page.wait_for_selector("#inpUserId", timeout=30000)
-        page.wait_for_timeout(500)
-        page.locator("#inpUserId").click()
-        page.fill("#inpUserId", "")
-        page.type("#inpUserId", user_id, delay=150)
-        
-        # 변경된 비밀번호 입력창 (#inpUserPswdEncn)
-        page.locator("#inpUserPswdEncn").click()
-        page.fill("#inpUserPswdEncn", "")
-        page.type("#inpUserPswdEncn", user_pw, delay=200)
-        page.wait_for_timeout(500)
-        _capture_screenshot(page)
+        yield lambda: page.goto(f"{DHL_WWW}/login",
+                                referer=f"{DHL_WWW}/",
+                                wait_until="domcontentloaded", timeout=DEFAULT_TIMEOUT)
+        yield Op("sleep", 2)
+
+        # 변경된 아이디 입력창 (#inpUserId) / 비밀번호 입력창 (#inpUserPswdEncn)
+        yield lambda: page.wait_for_selector("#inpUserId", timeout=30000)
+        yield lambda: page.wait_for_timeout(500)
+        for selector, value, delay in (("#inpUserId", user_id, 150), ("#inpUserPswdEncn", user_pw, 200)):
+            yield lambda: page.locator(selector).click()
+            yield lambda: page.fill(selector, "")
+            yield lambda: page.type(selector, value, delay=delay)
+        yield lambda: page.wait_for_timeout(500)
+        yield Op("capture", page)
 
         # 로그인 버튼 (#btnLogin)
         login_btn = page.locator("#btnLogin")
-        login_btn.hover()
-        page.wait_for_timeout(300)
-        login_btn.click()
-        time.sleep(3)
-
-        # 1. 일반적인 로그인 성공 확인 + 간소화 페이지 대응
-        for i in range(15):
-            content = page.content()
-            # 간소화 페이지 운영 중 메시지 감지
-            if "간소화" in content and "운영" in content:
+        yield lambda: login_btn.hover()
+        yield lambda: page.wait_for_timeout(300)
+        yield lambda: login_btn.click()
+
+        # 1. 로그인 상태 판별 (상태가 바뀌는 즉시 감지) + 간소화 페이지 대응
+        deadline = time.time() + LOGIN_WAIT_MS / 1000
+        ignore, checks = [], 0
+        while (remaining := int((deadline - time.time()) * 1000)) > 0:
+            checks += 1
+            metrics.annotate(login_checks=checks)
+            state = yield from _wait_login_state_script(page, remaining, ignore)
+            metrics.annotate(login_state=state)
+            if state == "interstitial":
                 logger.info("[LOGIN] ⚠️ 간소화 페이지 감지! '동행복권통합포탈이동' 버튼 클릭 시도...")
+                metrics.incr("interstitials")
                 # '동행복권통합포탈이동' 버튼 클릭 시도
                 try:
-                    btns = [
-                        "a:text-is('동행복권통합포탈이동')",
-                        "button:text-is('동행복권통합포탈이동')",
-                        "a:has-text('통합포탈')",
-                        "button:has-text('통합포탈')",
-                        "a:text-is('동행복권포탈이동')", # 기존 대비용
-                    ]
                     clicked = False
-                    for b in btns:
-                        if page.locator(b).first.is_visible(timeout=2000):
-                            page.locator(b).first.click()
+                    for b in INTERSTITIAL_BUTTONS:
+                        if (yield lambda: page.locator(b).first.is_visible(timeout=2000)):
+                            yield lambda: page.locator(b).first.click()
                             logger.info(f"[LOGIN] '{b}' 버튼 클릭 성공")
                             clicked = True
                             break
                     if not clicked:
                         # 버튼을 못 찾으면 직접 메인으로 재접속
-                        page.goto("https://www.dhlottery.co.kr/common.do?method=main", timeout=30000)
-                except:
+                        yield lambda: page.goto(f"{DHL_WWW}/common.do?method=main", timeout=30000)
+                except Exception:
                     pass
-                time.sleep(3)
-            
-            if is_logged_in(page):
+                ignore = ["interstitial"]  # 이동이 끝날 때까지 남아 있는 안내 문구는 무시
+                continue
+            if state == "logged_in":
                 logger.info("[LOGIN] ✅ 로그인 성공!")
                 return True
-            
-            # 페이지에 '로그인 실패' 혹은 '로그인 정보' 등 키워드가 있는지 확인
-            current_text = page.content()
-            if "로그인 정보가 맞지 않습니다" in current_text or "아이디 또는 비밀번호" in current_text:
+            if state == "bad_credentials":
                 logger.warning("[LOGIN] ❌ 아이디/비밀번호 불일치 메시지 감지")
                 return False
-            
-            time.sleep(1)
+            yield lambda: page.wait_for_timeout(WAIT_SLICE_MS)  # 페이지 이동으로 대기가 끊긴 경우
 
         # 2. 로또 6/45 전용 직접 확인 (간소화 페이지 우회용)
         try:
-            page.goto("https://ol.dhlottery.co.kr/olotto/game/game645.do", timeout=10000)
-            if "로그아웃" in page.content() or "게임" in page.content():
+            metrics.annotate(fallback_check="game645")
+            yield lambda: page.goto(f"{DHL_OL}/olotto/game/game645.do", timeout=10000)
+            if (yield lambda: page.evaluate(JS_TEXT_INCLUDES, ["로그아웃", "게임"])):
                 logger.info("[LOGIN] ✅ 로또 전용 페이지를 통해 로그인 성공 확인!")
                 return True
-        except: pass
+        except Exception:
+            pass
 
         # 실패 메시지 확인
         try:
-            alert_msg = page.locator(".alert_msg, .login_fail, #popupLayer").first.inner_text(timeout=2000)
+            alert_msg = yield lambda: page.locator(".alert_msg, .login_fail, #popupLayer").first.inner_text(timeout=2000)
             logger.warning(f"[LOGIN] 실패 메시지: {alert_msg}")
-        except:
+        except Exception:
             pass
 
         logger.warning("[LOGIN] ❌ 로그인 확인 실패 (15초 타임아웃)")
@@ -240,518 +525,1330 @@ def do_login(page, user_id, user_pw):
         logger.error(f"[LOGIN] 오류: {e}")
         return False
 
-def _click_in_frame(page, selector, frame_names=["ifrm_lotto645", "ifrm_tab"]):
-    """지정된 프레임 내에서 클릭, 실패하면 전체 프레임 및 메인에서 시도"""
-    # 1. 우선순위 프레임들 탐색
-    for frame_name in frame_names:
-        try:
-            frame = page.frame(name=frame_name)
-            if frame:
-                el = frame.locator(selector).first
-                if el.is_visible(timeout=1000):
-                    el.click(force=True, timeout=2000)
-                    return True
-        except:
-            pass
+def login_state(page):
+    return run_sync(_login_state_script(page))
 
-    # 2. 모든 프레임 순회
-    try:
-        for frame in page.frames:
-            try:
-                el = frame.locator(selector).first
-                if el.is_visible(timeout=500):
-                    el.click(force=True, timeout=1000)
-                    return True
-            except:
-                pass
-    except:
-        pass
+def is_logged_in(page):
+    return login_state(page) == "logged_in"
 
-    # 3. 메인 페이지
-    try:
-        el = page.locator(selector).first
-        if el.is_visible(timeout=500):
-            el.click(force=True, timeout=1000)
-            return True
-    except:
-        pass
-    return False
-
-def _prepare_lotto_board(page):
-    """로또 마킹판 준비 (탭 활성화 및 초기화) - 한 번만 호출"""
-    logger.info("[PURCHASE] 마킹판 초기화 및 탭 활성화...")
-    try:
-        for fname in ["ifrm_tab", "ifrm_lotto645"]:
-            frame = page.frame(name=fname)
-            if frame:
-                frame.evaluate("""() => {
-                    try {
-                        if (typeof selectWayTab === 'function') selectWayTab(0);
-                        if (typeof resetNumber645 === 'function') resetNumber645();
-                        else if (typeof resetAllNum === 'function') resetAllNum();
-                        
-                        // 시각적 리셋 (ID 기반)
-                        const btnReset = document.getElementById('resetAllNum') || document.getElementById('btnReset');
-                        if (btnReset) btnReset.click();
-                    } catch(e) {}
-                }""")
-                time.sleep(1)
-                return True
-    except: pass
-    return False
+def do_login(page, user_id, user_pw):
+    return run_sync(_login_script(page, user_id, user_pw))
 
-def _mark_single_number(page, num):
-    """개별 번호 마킹 (초기화 없이 단순 마킹)"""
+# ══════════════════════════════════════════════════════════════
+#  단계별 대기 (고정 sleep 대신 구체적인 조건을 기다림)
+# ══════════════════════════════════════════════════════════════
+# 단계별 대기 예산 (ms) : PHASE_TIMEOUT_<단계명> 환경변수로 개별 조정
+PHASE_TIMEOUTS = {
+    "frame": 30000,     # 게임 iframe 부착 + 마킹판 스크립트 로드
+    "popup": 3000,      # 진입 안내 팝업 닫힘
+    "select": 10000,    # '확인' 후 선택번호가 구매 목록으로 이동
+    "buy": 10000,       # '구매하기' 후 구매확인 팝업 표시
+    "purchase": 30000,  # 구매확인 '확인' 후 구매 API 응답
+    "receipt": 10000,   # 구매내역 팝업 표시
+}
+WAIT_SLICE_MS = 250  # 프레임/다이얼로그 교차 확인 주기
+GAME_FRAMES = ["ifrm_lotto645", "ifrm_tab"]
+PURCHASE_API_MARKER = "execBuy"  # 구매 확정 XHR (olotto/game/execBuy.do)
+
+POPUP_CLOSE_SELECTORS = [
+    "input[value='닫기']", ".close_btn", ".btn_close",
+    "a:text-is('닫기')", "button:text-is('닫기')"
+]
+
+JS_BOARD_READY = """() =>
+    typeof check645 === 'function' || document.querySelector('[id^="check645num"]') !== null"""
+
+JS_POPUP_CLOSED = """() => {
+    const visible = el => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+    const closers = document.querySelectorAll("input[value='닫기'], .close_btn, .btn_close");
+    return ![...closers].some(visible);
+}"""
+
+JS_BOARD_CLEARED = """() =>
+    ![...document.querySelectorAll('input[id^="check645num"]')].some(c => c.checked)"""
+
+# 마킹판 초기화 → 번호 마킹 → 45칸 체크 상태 반환을 한 번의 evaluate 로 처리
+# (마킹판이 없는 프레임이면 null)
+JS_MARK_GAME = """async (numbers) => {
+    const box = n => document.getElementById('check645num' + n) ||
+                     document.getElementById('check645num' + String(n).padStart(2, '0'));
+    const toggle = cb => {
+        const label = document.querySelector(`label[for="${cb.id}"]`);
+        (label || cb).click();
+    };
+    if (!box(1)) return null;
+
+    try { if (typeof selectWayTab === 'function') selectWayTab(0); } catch (e) {}
+    try {
+        if (typeof resetNumber645 === 'function') resetNumber645();
+        else if (typeof resetAllNum === 'function') resetAllNum();
+        const btnReset = document.getElementById('resetAllNum') || document.getElementById('btnReset');
+        if (btnReset) btnReset.click();
+    } catch (e) {}
+    for (let n = 1; n <= 45; n++) {
+        const cb = box(n);
+        if (cb && cb.checked) toggle(cb);
+    }
+
+    for (const n of numbers) {
+        const cb = box(n);
+        if (!cb || cb.checked) continue;
+        try {
+            if (typeof check645 === 'function') check645(n);
+            if (!cb.checked) toggle(cb);
+        } catch (e) {}
+    }
+
+    // 사이트 스크립트의 후속 DOM 갱신이 끝난 뒤 상태 수집
+    await new Promise(r => setTimeout(r, 0));
+    const checked = [];
+    for (let n = 1; n <= 45; n++) {
+        const cb = box(n);
+        if (cb && cb.checked) checked.push(n);
+    }
+    return checked;
+}"""
+
+JS_CONFIRM_POPUP_VISIBLE = """() => {
+    const el = document.getElementById('popupLayerConfirm');
+    return !!el && getComputedStyle(el).display !== 'none' && getComputedStyle(el).visibility !== 'hidden';
+}"""
+
+JS_RECEIPT_POPUP_VISIBLE = """() => {
+    const el = document.getElementById('popReceipt') || document.querySelector('.btn_popup_buy_confirm');
+    return !!el && getComputedStyle(el).display !== 'none';
+}"""
+
+PHASE_TIMEOUTS_TOTAL = metrics.counter(
+    "lotto_phase_timeouts_total", "단계별 대기 예산 초과 횟수 (계속 진행한 경우 포함)", ("phase",))
+
+class PhaseTimeout(Exception):
+    """특정 구매 단계가 대기 예산을 초과함"""
+    def __init__(self, phase, timeout_ms, detail=""):
+        self.phase = phase
+        self.timeout_ms = timeout_ms
+        msg = f"'{phase}' 단계 대기 시간 초과 ({timeout_ms}ms)"
+        super().__init__(f"{msg} - {detail}" if detail else msg)
+
+def _phase_timeout(phase):
+    return int(os.environ.get(f"PHASE_TIMEOUT_{phase.upper()}", PHASE_TIMEOUTS[phase]))
+
+# 단계별 재시도 예산 (첫 시도 외 추가 횟수) : STEP_RETRIES_<단계명> 환경변수로 개별 조정
+# 목록에 없는 단계(round, popup, confirm, receipt)는 재시도하지 않는다 - 특히 confirm 은 중복 구매 방지
+STEP_RETRY_BUDGET = {
+    "login": 1,     # 로그인 상태 확인 실패 (아이디/비밀번호 불일치는 제외)
+    "navigate": 2,  # 구매 페이지 이동 실패
+    "frame": 1,     # 게임 프레임 미로딩 → 새로고침 후 다시 대기
+    "marking": 2,   # 번호 선택 '확인' 버튼 못 찾음 → 남은 게임부터 이어서
+    "buy": 2,       # '구매하기' 버튼 못 찾음 / 구매확인 팝업 미표시 → 다시 클릭
+}
+FLOW_MAX_REWINDS = 1  # 구매확인 '확인' 버튼을 못 찾으면 (요청 전송 전에 한해) 'buy' 단계로 되감기
+
+def _step_retries(step):
+    return int(os.environ.get(f"STEP_RETRIES_{step.upper()}", STEP_RETRY_BUDGET.get(step, 0)))
+
+def _wait_in_frames_script(page, phase, predicate, arg=None, frame_names=GAME_FRAMES, dialog_msgs=None):
+    """지정 프레임들 중 한 곳에서 JS 조건이 참이 될 때까지 대기 (None = 메인 페이지)
+    dialog_msgs 를 넘기면 새 다이얼로그가 뜨는 즉시 반환한다."""
+    timeout = _phase_timeout(phase)
+    deadline = time.time() + timeout / 1000
+    seen = len(dialog_msgs) if dialog_msgs is not None else 0
+    while True:
+        if dialog_msgs is not None and len(dialog_msgs) > seen:
+            return None
+        found = False
+        for name in frame_names:
+            target = page.main_frame if name is None else page.frame(name=name)
+            if target is None:
+                continue
+            found = True
+            try:
+                yield lambda: target.wait_for_function(predicate, arg=arg, timeout=WAIT_SLICE_MS)
+                return target
+            except Exception:
+                pass
+        if not found:
+            yield lambda: page.wait_for_timeout(WAIT_SLICE_MS)  # 프레임 부착 이벤트 처리
+        if time.time() >= deadline:
+            PHASE_TIMEOUTS_TOTAL.inc(phase=phase)
+            metrics.annotate(timed_out=True)
+            raise PhaseTimeout(phase, timeout)
+
+def _purchase_result(data):
+    """구매 API 응답 본문(JSON) → (성공 여부, 메시지)"""
+    result = data.get("result", data) if isinstance(data, dict) else {}
+    code = str(result.get("resultCode", "100"))
+    if code != "100":
+        return False, result.get("resultMsg") or f"코드 {code}"
+    return True, result.get("resultMsg", "SUCCESS")
+
+def _parse_purchase_response_script(resp):
+    """구매 API 응답 해석 → (성공 여부, 메시지)"""
     try:
-        for fname in ["ifrm_tab", "ifrm_lotto645"]:
-            frame = page.frame(name=fname)
-            if frame:
-                success = frame.evaluate(f"""(n) => {{
-                    try {{
-                        const pad = String(n).padStart(2,'0');
-                        const id = 'check645num' + n;
-                        const id_padded = 'check645num' + pad;
-                        const cb = document.getElementById(id) || document.getElementById(id_padded);
-                        
-                        // 이미 체크되어 있다면 건너뜀 (중복 클릭 방지)
-                        if (cb && cb.checked) return true;
-
-                        // 사이트 내장 함수 호출
-                        if (typeof check645 === 'function') {{
-                            check645(n);
-                            return true;
-                        }} else {{
-                            // 직접 클릭 (레이블 우선)
-                            const label = document.querySelector(`label[for="${{id}}"]`) || 
-                                           document.querySelector(`label[for="${{id_padded}}"]`);
-                            if (label) {{ label.click(); return true; }}
-                            if (cb) {{ cb.click(); return true; }}
-                        }}
-                    }} catch(e) {{}}
-                    return false;
-                }}""", num)
-                if success: return True
-    except: pass
-    return False
-
-def _mark_numbers_batch(page, numbers):
-    # 이 함수는 이제 순차 마킹 로직으로 통합 운영됩니다.
-    _prepare_lotto_board(page)
-    count = 0
-    for n in numbers:
-        if _mark_single_number(page, n):
-            count += 1
-        time.sleep(0.8)
-    return count >= 6
-
-def _click_number(page, num):
-    # 개별 마킹용 폴백
-    return _mark_single_number(page, num)
-
-def get_round_info(page):
-    """현재 회차 정보 수집"""
-    round_no, round_date = "---", datetime.now().strftime("%Y-%m-%d")
+        if not resp.ok:
+            return False, f"HTTP {resp.status}"
+        return _purchase_result((yield lambda: resp.json()))
+    except Exception:
+        # 응답 본문을 해석할 수 없어도 요청 자체는 정상 완료됨
+        return True, "응답 본문 확인 불가"
+
+# 논리 동작별 후보 셀렉터 (우선순위 순) - 성공 프레임은 selector_resolver 가 학습
+ACTION_SELECTORS = {
+    "select_confirm": ["#btnSelectNum", "input[value='확인']", "a.btn_common:text-is('확인')"],
+    "buy": ["#btnBuy", "input[value='구매하기']", "a.btn_common:text-is('구매하기')", "button:text-is('구매하기')"],
+    "purchase_confirm": [
+        "#popupLayerConfirm input[value='확인']",
+        ".btn_confirm input[value='확인']",
+        "input[value='확인']",
+        "a:text-is('확인')", "button:text-is('확인')"
+    ],
+    "receipt_close": [
+        ".btn_popup_buy_confirm input[value='확인']",
+        ".confirm input[value='확인']",
+        "input[value='확인']",
+        "a:text-is('확인')", "button:text-is('확인')"
+    ],
+    "popup_close": POPUP_CLOSE_SELECTORS,
+}
+
+def _click_action(page, action):
+    """학습된 프레임에서 우선순위 순으로 먼저 클릭, 실패 시 전체 탐색 → 사용된 셀렉터 (실패 시 None)"""
+    return selector_resolver.click(page, action, ACTION_SELECTORS[action], GAME_FRAMES)
+
+def _expect_purchase(page, timeout, script):
+    """구매 API 응답을 기다리며 script(구매확인 클릭) 실행 → 응답"""
+    with page.expect_response(lambda r: PURCHASE_API_MARKER in r.url, timeout=timeout) as resp_info:
+        run_sync(script)
+    return resp_info.value
+
+def _mark_game_script(page, numbers):
+    """마킹판 초기화 + 번호 마킹 + 검증을 왕복 1회로 처리
+    → (요청 번호와 체크 상태가 정확히 일치하는지, 실제 체크된 번호)"""
+    for fname in ["ifrm_tab", "ifrm_lotto645"]:
+        frame = page.frame(name=fname)
+        if not frame:
+            continue
+        try:
+            checked = yield lambda: frame.evaluate(JS_MARK_GAME, list(numbers))
+        except Exception as e:
+            logger.debug(f"[PURCHASE] {fname} 마킹 실패: {e}")
+            continue
+        if checked is None:
+            continue
+        return sorted(checked) == sorted(numbers), checked
+    return False, []
+
+# 동기 엔진의 Op 구현 (작업 스레드에서 그대로 호출)
+SYNC_OPS = {
+    "sleep": time.sleep,
+    "capture": _capture_screenshot,
+    "click": _click_action,
+    "blocking": lambda fn, *args: fn(*args),
+    "expect_purchase": _expect_purchase,
+    "flow": lambda flow: flow.run(),
+}
+
+# ── 회차 계산 교차 확인 (추첨 일정 계산값 vs 당첨번호 아카이브, 비동기/간헐적) ──
+ROUND_CHECK_INTERVAL = int(os.environ.get('ROUND_CHECK_INTERVAL_SEC', 6 * 3600))
+ENFORCE_SALES_WINDOW = os.environ.get('ENFORCE_SALES_WINDOW', '1') != '0'
+ROUND_CHECKS = metrics.counter(
+    "lotto_round_crosscheck_total", "회차 계산 교차 확인 결과", ("result",))
+_round_check = {"last": 0.0, "lock": threading.Lock()}
+
+def _cross_check_round():
+    """계산한 최신 추첨 회차가 아카이브(공식 API)와 맞는지 확인 - 어긋나면 경고만 남김"""
+    latest = draw_calendar.latest_drawn_round()
     try:
-        page.goto("https://www.dhlottery.co.kr/common.do?method=main",
-                  wait_until="domcontentloaded", timeout=DEFAULT_TIMEOUT)
-        time.sleep(1)
-        content = page.content()
-
-        # 회차 번호
-        m = re.search(r'제\s*(\d{3,4})\s*회', content)
-        if not m:
-            m = re.search(r'(\d{3,4})회차', content)
-        if m:
-            round_no = m.group(1)
-
-        # 추첨일
-        m2 = re.search(r'(\d{4})[.\-](\d{2})[.\-](\d{2})', content)
-        if m2:
-            round_date = f"{m2.group(1)}-{m2.group(2)}-{m2.group(3)}"
+        known = draw_archive.get(latest)
+        ahead = draw_archive.get(latest + 1)
     except Exception as e:
-        logger.warning(f"[ROUND] 조회 실패: {e}")
-    logger.info(f"[ROUND] 회차: {round_no}, 추첨일: {round_date}")
-    return round_no, round_date
+        logger.warning(f"[ROUND] 교차 확인 실패: {e}")
+        ROUND_CHECKS.inc(result="error")
+        return
+    if ahead is not None:
+        result = "ahead"  # 아카이브에 계산보다 앞선 회차 존재 → 일정 계산 오류
+    elif known is None:
+        result = "missing"  # 결과 반영 지연일 수 있음
+    elif known.get('date') != draw_calendar.draw_date(latest).strftime("%Y-%m-%d"):
+        result = "date_mismatch"
+    else:
+        result = "ok"
+    ROUND_CHECKS.inc(result=result)
+    if result != "ok":
+        logger.warning(f"[ROUND] 회차 계산 불일치 ({result}): 계산 {latest}회, 아카이브 {known and known.get('date')}")
+
+def _schedule_round_check():
+    with _round_check["lock"]:
+        if time.time() - _round_check["last"] < ROUND_CHECK_INTERVAL:
+            return
+        _round_check["last"] = time.time()
+    threading.Thread(target=_cross_check_round, name="round-check", daemon=True).start()
+
+def get_round_info(now=None):
+    """판매 중인 회차 정보 (추첨 일정으로 계산 - 페이지 이동 없음)
+    → (회차 문자열, 추첨일, 판매 상태)"""
+    status = draw_calendar.sales_status(now)
+    _schedule_round_check()
+    logger.info(f"[ROUND] 회차: {status['round']}, 추첨일: {status['draw_date']}"
+                + ("" if status["open"] else f" (판매 중지: {status['reason']})"))
+    return str(status["round"]), status["draw_date"], status
+
+def _noop_progress(step, msg=""):
+    pass
+
+LOGIN_FAILED_MSG = "❌ 로그인 실패. 아이디/비밀번호를 확인하세요."
+BUY_ERROR_WORDS = ["부족", "초과", "오류", "마감", "로그인", "실패"]
+
+class PurchaseSession:
+    """구매 1건의 단계 스크립트(step_*) + 진행 상태 (StepFlow 로 실행, 엔진은 runner 로 선택)
+    login → round → navigate → frame → popup → marking → buy → confirm → receipt
+    재시도는 실패한 단계만 다시 실행하며, 마킹은 이미 구매 목록에 담긴 게임을 건너뛰고 이어서 진행한다."""
+
+    def __init__(self, page, games, progress=_noop_progress, context=None,
+                 user_id=None, user_pw=None, cached_state=None):
+        self.page = page
+        self.context = context
+        self.user_id = user_id
+        self.user_pw = user_pw
+        self.cached_state = cached_state
+        self.games = games
+        self.progress = progress
+        self.dialog_msgs = []
+        self.game_results = [{"numbers": numbers, "success": False, "message": ""} for numbers in games]
+        self.next_game = 0          # marking 체크포인트: 다음에 처리할 게임 위치
+        self.purchase_requests = 0  # 전송된 구매 API 요청 수 (1 이상이면 구매 확정 단계를 다시 실행하지 않음)
+        self.round_no = None
+        self.round_date = None
+        self.flow = None
+        self._dialog_handler = self._on_dialog
+        self._request_handler = self._on_request
+
+    def steps(self, login=True):
+        steps = [
+            Step("login", self._bind(self.step_login), _step_retries("login"), message="🔐 연계 계정 로그인 처리 중..."),
+            Step("round", self._bind(self.step_round), message="📅 회차 정보 확인 중..."),
+            Step("navigate", self._bind(self.step_navigate), _step_retries("navigate"), retry_on=(Exception,),
+                 message="🎱 로또 6/45 구매 페이지 진입 중..."),
+            Step("frame", self._bind(self.step_frame), _step_retries("frame"), retry_on=(PhaseTimeout,)),
+            Step("popup", self._bind(self.step_popup)),
+            Step("marking", self._bind(self.step_marking), _step_retries("marking"),
+                 message=f"🔢 {len(self.games)}게임 번호 자동 선택 및 마킹 중..."),
+            Step("buy", self._bind(self.step_buy), _step_retries("buy"), retry_on=(PhaseTimeout,),
+                 message="💳 최종 구매 확정 처리 중..."),
+            Step("confirm", self._bind(self.step_confirm), message="⏳ 최종 결과 수신 대기 중..."),
+            Step("receipt", self._bind(self.step_receipt)),
+        ]
+        return steps if login else steps[1:]
+
+    # ── 이벤트 ────────────────────────────────────────────────
+    def _on_dialog(self, dialog):
+        logger.info(f"[DIALOG] '{dialog.message}' → 자동 확인")
+        self.dialog_msgs.append(dialog.message)
+        return dialog.accept()  # async API 면 코루틴 → 이벤트 루프가 실행
 
-def do_purchase(page, numbers):
-    logger.info(f"[PURCHASE] 구매 번호: {numbers}")
-    dialog_msgs = []
+    def _on_request(self, req):
+        if PURCHASE_API_MARKER in req.url:
+            self.purchase_requests += 1
 
-    def handle_dialog(dialog):
-        logger.info(f"[DIALOG] '{dialog.message}' → 자동 확인")
-        dialog_msgs.append(dialog.message)
-        dialog.accept()
+    def _attach(self):
+        self.page.on("dialog", self._dialog_handler)
+        self.page.on("request", self._request_handler)
 
-    page.on("dialog", handle_dialog)
+    def _detach(self):
+        for event, handler in (("dialog", self._dialog_handler), ("request", self._request_handler)):
+            try:
+                self.page.remove_listener(event, handler)
+            except Exception:
+                pass
 
-    try:
-        # ─────────────────────────────────────────
-        # 0. 회차 정보 수집
-        # ─────────────────────────────────────────
-        round_no, round_date = get_round_info(page)
-
-        # ─────────────────────────────────────────
-        # 1. 구매 페이지 이동
-        # ─────────────────────────────────────────
+    # ── 결과 ──────────────────────────────────────────────────
+    def fail(self, msg):
+        metrics.mark_failed()
+        for r in self.game_results:
+            if r["success"] or not r["message"]:
+                r["success"], r["message"] = False, msg
+        return False, msg, self.round_no, self.round_date, self.game_results
+
+    def _failure(self, error):
+        if isinstance(error, (Abort, Retry, Rewind)):
+            logger.warning(f"[PURCHASE] ❌ {error}")
+            return self.fail(str(error))
+        if isinstance(error, PhaseTimeout):
+            logger.error(f"[PURCHASE] ⏱ {error}")
+            return self.fail(f"구매 단계 시간 초과: {error}")
+        logger.error(f"[PURCHASE] 오류: {error}", exc_info=error)
+        return self.fail(f"구매 중 오류 발생: {str(error)[:80]}")
+
+    def _success(self):
+        logger.info("[PURCHASE] ✅ 구매 프로세스 완료!")
+        bought = [r for r in self.game_results if r["success"]]
+        for r in bought:
+            r["message"] = "구매 완료"
+        return (True, f"✅ {len(bought)}게임 구매 성공! 동행복권 마이페이지에서 구매내역을 확인하세요.",
+                self.round_no, self.round_date, self.game_results)
+
+    def _annotate(self):
+        summary = self.flow.summary()
+        metrics.annotate(completed_steps=len(summary["completed"]), failed_step=summary["failed_step"],
+                         step_retries=summary["retries"], rewinds=summary["rewinds"])
+
+    def _check_buy_dialogs(self):
+        for m in self.dialog_msgs:
+            if any(err in m for err in BUY_ERROR_WORDS):
+                raise Abort(f"구매 실패: {m}")
+
+    def _check_resubmit(self):
+        if self.purchase_requests:
+            raise Abort("구매 요청이 이미 전송되어 다시 시도하지 않습니다. 마이페이지에서 구매내역을 확인하세요.")
+
+    def _confirm_missed(self):
+        msg = "구매확인 팝업의 '확인' 버튼을 클릭하지 못했습니다."
+        if self.purchase_requests:
+            return Abort(msg)
+        # 구매 요청은 나가지 않음 → '구매하기'부터 다시 (구매확인 팝업 다시 띄우기)
+        return Rewind("buy", msg)
+
+    def _mark_failed_game(self, result, numbers, checked, span):
+        missing = sorted(set(numbers) - set(checked))
+        extra = sorted(set(checked) - set(numbers))
+        logger.warning(f"[PURCHASE] 번호 마킹 불일치 (누락 {missing}, 초과 {extra}) → 이 게임 제외")
+        result["message"] = f"번호 마킹 실패 (누락 {missing}, 초과 {extra})"
+        span.incr("mismatches")
+
+    def _after_marking(self):
+        if not any(r["success"] for r in self.game_results):
+            raise Abort("선택한 모든 게임의 번호 마킹에 실패했습니다.")
+
+    def _round_info(self):
+        self.round_no, self.round_date, sales = get_round_info()
+        if ENFORCE_SALES_WINDOW and not sales["open"]:
+            reopens = sales["reopens_at"][:16].replace("T", " ")
+            raise Abort(f"판매 시간이 아닙니다 ({sales['reason']}, {reopens} 재개)")
+
+    # ── 실행 ──────────────────────────────────────────────────
+    runner = staticmethod(run_sync)  # 단계 스크립트 실행기 (AsyncPurchaseSession 은 run_async)
+
+    def _bind(self, step):
+        """단계 스크립트 → StepFlow 단계 함수 fn(attempt)"""
+        return lambda attempt: self.runner(step(attempt))
+
+    def run(self, login=True):
+        """→ (성공 여부, 메시지, 회차, 추첨일, 게임별 결과 리스트) - AsyncPurchaseSession 이면 코루틴"""
+        return self.runner(self._run_script(login))
+
+    def _run_script(self, login):
+        logger.info(f"[PURCHASE] 구매 번호: {self.games}")
+        self.flow = StepFlow(self.steps(login), progress=self.progress, max_rewinds=FLOW_MAX_REWINDS)
+        self._attach()
+        failure = None
+        try:
+            yield Op("flow", self.flow)
+        except Exception as e:
+            if isinstance(e, PhaseTimeout):
+                yield Op("capture", self.page)
+            failure = self._failure(e)
+        finally:
+            self._detach()
+            self._annotate()
+        if self.context is not None and "login" in self.flow.completed:
+            # 구매 중 갱신된 쿠키까지 반영
+            yield from self._save_session_script()
+        return failure or self._success()
+
+    def _save_session_script(self):
+        state = yield lambda: self.context.storage_state()
+        yield Op("blocking", session_cache.put, self.user_id, self.user_pw, state)
+
+    # ── 단계 ──────────────────────────────────────────────────
+    def step_login(self, attempt):
+        with metrics.span("login", attempt=attempt) as span:
+            # 캐시된 세션 재사용 / 재시도라면 직전 시도에서 이미 로그인됐는지 먼저 확인 (API 요청 1회)
+            if (self.cached_state or attempt > 1) and (yield from _probe_session_script(self.context)):
+                if attempt == 1:
+                    logger.info("[SESSION] ✅ 캐시된 세션 재사용 → 로그인 생략")
+                    span.set(session_reused=True)
+                    return
+                logger.info("[LOGIN] ✅ 직전 시도에서 로그인 완료 확인")
+                yield from self._save_session_script()
+                return
+            if self.cached_state and attempt == 1:
+                logger.info("[SESSION] 캐시된 세션 만료 → 재로그인")
+                yield Op("blocking", session_cache.invalidate, self.user_id)
+            span.set(session_reused=False, session_expired=bool(self.cached_state))
+            if not (yield from _login_script(self.page, self.user_id, self.user_pw)):
+                # 아이디/비밀번호 불일치는 다시 해도 같음 (계정 잠금 방지) → 나머지만 재시도
+                if (yield from _login_state_script(self.page)) == "bad_credentials":
+                    raise Abort(LOGIN_FAILED_MSG)
+                raise Retry("❌ 로그인 확인 실패. 잠시 후 다시 시도하세요.")
+            yield from self._save_session_script()
+
+    def step_round(self, attempt):
+        with metrics.span("round"):
+            self._round_info()
+        yield from ()  # 페이지 호출 없는 단계 (스크립트 형식만 맞춤)
+
+    def step_navigate(self, attempt):
         logger.info("[PURCHASE] 6/45 구매 페이지 이동...")
-        page.goto(
-            "https://el.dhlottery.co.kr/game/TotalGame.jsp?LottoId=LO40",
-            wait_until="domcontentloaded", timeout=DEFAULT_TIMEOUT
-        )
-        _capture_screenshot(page)
+        with metrics.span("navigate", attempt=attempt):
+            yield lambda: self.page.goto(
+                f"{DHL_EL}/game/TotalGame.jsp?LottoId=LO40",
+                wait_until="domcontentloaded", timeout=DEFAULT_TIMEOUT
+            )
+        yield Op("capture", self.page)
 
-        # ─────────────────────────────────────────
-        # ─────────────────────────────────────────
-        # 2. iframe 로딩 대기 (다중 프레임 지원)
-        # ─────────────────────────────────────────
+    def step_frame(self, attempt):
+        """iframe 로딩 대기 (마킹판 스크립트가 준비될 때까지) - 재시도 시 구매 페이지 새로고침"""
+        if attempt > 1:
+            yield lambda: self.page.reload(wait_until="domcontentloaded", timeout=DEFAULT_TIMEOUT)
         logger.info("[PURCHASE] 게임 프레임 로딩 대기...")
-        try:
-            # ifrm_lotto645 또는 ifrm_tab 둘 중 하나가 나타날 때까지 대기
-            page.wait_for_function("""() => 
-                document.getElementById('ifrm_lotto645') !== null || 
-                document.getElementById('ifrm_tab') !== null ||
-                document.getElementsByName('ifrm_lotto645').length > 0 ||
-                document.getElementsByName('ifrm_tab').length > 0
-            """, timeout=30000)
-            logger.info("[PURCHASE] 게임 프레임 식별 성공")
-        except:
-            logger.warning("[PURCHASE] 프레임 로딩 대기 시간 초과, 계속 진행 시도...")
-        
-        time.sleep(3)
-
-        # ─────────────────────────────────────────
-        # 3. 팝업 닫기 및 '혼합선택' 탭 클릭 (번호 입력을 위해 필수)
-        # ─────────────────────────────────────────
-        for close_sel in [
-            "input[value='닫기']", ".close_btn", ".btn_close",
-            "a:text-is('닫기')", "button:text-is('닫기')"
-        ]:
+        with metrics.span("frame", attempt=attempt):
+            yield from _wait_in_frames_script(self.page, "frame", JS_BOARD_READY)
+        logger.info("[PURCHASE] 게임 프레임 식별 성공")
+
+    def step_popup(self, attempt):
+        """진입 안내 팝업 닫기 (닫기 버튼이 사라질 때까지)"""
+        with metrics.span("popup"):
+            # 안내 팝업이 여러 겹일 수 있으므로 보이는 닫기 버튼이 없을 때까지 (후보 수만큼까지)
+            for _ in POPUP_CLOSE_SELECTORS:
+                if not (yield Op("click", self.page, "popup_close")):
+                    break
             try:
-                _click_in_frame(page, close_sel)
-            except:
-                pass
-        time.sleep(1)
-
-        # ─────────────────────────────────────────
-        # 3. 마킹 준비 (탭 활성화 및 초기화)
-        # ─────────────────────────────────────────
-        logger.info("[PURCHASE] 번호 선택판 준비 중...")
-        # 이 과정은 _mark_numbers_batch 내부에서 JS로 더 안정적으로 처리하도록 이양했습니다.
-        time.sleep(1)
-
-        # ─────────────────────────────────────────
-        # ─────────────────────────────────────────
-        # 4. 번호 선택 (순차적으로 정밀 마킹)
-        # ─────────────────────────────────────────
-        logger.info(f"[PURCHASE] {numbers} 번호를 하나씩 순차적으로 마킹합니다...")
-        
-        # 4-1. 마킹판 준비 (탭 활성화 및 초기화) - 한 번만 수행
-        _prepare_lotto_board(page)
-        
-        selected_count = 0
-        for num in numbers:
-            # 개별 순차 마킹 (중복 클릭 및 초기화 루프 방지)
-            ok = _mark_single_number(page, num)
-            if ok:
-                selected_count += 1
-                logger.info(f"[PURCHASE] {num}번 마킹 완료 ✅ ({selected_count}/6)")
-            else:
-                logger.warning(f"[PURCHASE] {num}번 마킹 실패 ⚠️")
-            
-            # 사람이 직접 누르는 느낌과 인식률을 위해 0.8초 간격 유지
-            time.sleep(0.8)
-            if num == numbers[-1]: _capture_screenshot(page) # 마지막 번호 선택 후 캡처
-
-        if selected_count < 6:
-            logger.warning(f"[PURCHASE] 번호 선택이 완벽하지 않음 ({selected_count}/6)")
-
-        time.sleep(1.0)
-
-        # ─────────────────────────────────────────
-        # 5. '확인' 버튼 (선택 완료)
-        # ─────────────────────────────────────────
-        logger.info("[PURCHASE] '확인' 버튼 클릭...")
-        ok = False
-        for sel in ["#btnSelectNum", "input[value='확인']", "a.btn_common:text-is('확인')"]:
-            if _click_in_frame(page, sel):
+                yield from _wait_in_frames_script(self.page, "popup", JS_POPUP_CLOSED,
+                                                  frame_names=GAME_FRAMES + [None])
+            except PhaseTimeout as e:
+                logger.warning(f"[PURCHASE] {e} → 계속 진행")
+
+    def step_marking(self, attempt):
+        """게임별 번호 선택 → '확인'으로 구매 목록에 추가 (한 장의 슬립에 모두 담음)
+        재시도 시 next_game 부터 이어서 진행 (이미 담긴 게임을 중복으로 담지 않음)"""
+        page, games = self.page, self.games
+        with metrics.span("marking", games=len(games), attempt=attempt) as span:
+            while self.next_game < len(games):
+                idx = self.next_game
+                result, numbers = self.game_results[idx], games[idx]
+                logger.info(f"[PURCHASE] [{idx + 1}/{len(games)}] {numbers} 번호를 하나씩 순차적으로 마킹합니다...")
+
+                # 초기화 + 마킹 + 45칸 상태 검증 (왕복 1회)
+                ok, checked = yield from _mark_game_script(page, numbers)
+                if not ok:
+                    self._mark_failed_game(result, numbers, checked, span)
+                    yield from _mark_game_script(page, [])  # 마킹판 비우기
+                    self.next_game += 1
+                    continue
+                logger.info(f"[PURCHASE] {numbers} 마킹 및 검증 완료 ✅")
+
+                # '확인' 버튼 (선택 완료 → 구매 목록 추가)
+                logger.info("[PURCHASE] '확인' 버튼 클릭...")
+                sel = yield Op("click", page, "select_confirm")
+                if not sel:
+                    raise Retry("번호 선택 '확인' 버튼을 클릭하지 못했습니다.")
                 logger.info(f"[PURCHASE] '확인' 버튼 클릭 성공 ({sel})")
-                ok = True
-                break
-        if not ok:
-            logger.warning("[PURCHASE] ❌ '확인' 버튼 못 찾음")
-            return False, "번호 선택 '확인' 버튼을 클릭하지 못했습니다.", round_no, round_date
-
-        time.sleep(2)
-
-        # 예치금 부족 체크
-        if any("부족" in m for m in dialog_msgs):
-            return False, f"예치금 부족: {dialog_msgs[-1]}", round_no, round_date
 
-        # ─────────────────────────────────────────
-        # 6. '구매하기' 버튼
-        # ─────────────────────────────────────────
+                # 선택 번호가 구매 목록으로 옮겨져 마킹판이 비워지거나, 경고창이 뜰 때까지
+                try:
+                    yield from _wait_in_frames_script(page, "select", JS_BOARD_CLEARED,
+                                                      dialog_msgs=self.dialog_msgs)
+                except PhaseTimeout as e:
+                    logger.warning(f"[PURCHASE] {e} → 계속 진행")
+
+                # 예치금 부족 체크
+                if any("부족" in m for m in self.dialog_msgs):
+                    raise Abort(f"예치금 부족: {self.dialog_msgs[-1]}")
+                result["success"] = True
+                self.next_game += 1
+        yield Op("capture", page)  # 마킹 완료 후 캡처
+        self._after_marking()
+
+    def step_buy(self, attempt):
+        """'구매하기' → 구매확인 팝업 또는 경고창(잔액부족, 구매한도, 구매불가 시간 등) 대기"""
         logger.info("[PURCHASE] '구매하기' 버튼 클릭...")
-        ok = False
-        for sel in ["#btnBuy", "input[value='구매하기']", "a.btn_common:text-is('구매하기')", "button:text-is('구매하기')"]:
-            if _click_in_frame(page, sel):
-                logger.info(f"[PURCHASE] '구매하기' 버튼 클릭 성공 ({sel})")
-                ok = True
-                break
-        if not ok:
-            logger.warning("[PURCHASE] ❌ '구매하기' 버튼 못 찾음")
-            return False, "'구매하기' 버튼을 클릭하지 못했습니다.", round_no, round_date
-
-        time.sleep(2)
-        
-        # 구매 후 나타난 모든 경고/에러 다이얼로그(잔액부족, 구매한도, 구매불가 시간 등) 다시 한 번 확인
-        for m in dialog_msgs:
-            if any(err in m for err in ["부족", "초과", "오류", "마감", "로그인", "실패"]):
-                return False, f"구매 실패: {m}", round_no, round_date
-
-        # ─────────────────────────────────────────
-        # 7. 확인 팝업 ("구매하시겠습니까?")
-        # ─────────────────────────────────────────
+        with metrics.span("buy", attempt=attempt):
+            sel = yield Op("click", self.page, "buy")
+            if not sel:
+                raise Retry("'구매하기' 버튼을 클릭하지 못했습니다.")
+            logger.info(f"[PURCHASE] '구매하기' 버튼 클릭 성공 ({sel})")
+            yield from _wait_in_frames_script(self.page, "buy", JS_CONFIRM_POPUP_VISIBLE,
+                                              frame_names=GAME_FRAMES + [None], dialog_msgs=self.dialog_msgs)
+            self._check_buy_dialogs()
+
+    def _click_confirm_script(self):
+        sel = yield Op("click", self.page, "purchase_confirm")
+        if not sel:
+            raise self._confirm_missed()
+        logger.info(f"[PURCHASE] 확인 팝업 클릭 ({sel})")
+
+    def step_confirm(self, attempt):
+        """확인 팝업 ("구매하시겠습니까?") → 구매 API 응답 대기 (요청이 나간 뒤에는 재시도 없음)"""
+        from playwright.sync_api import TimeoutError as PlaywrightTimeoutError  # async_api 와 같은 클래스
+        self._check_resubmit()
         logger.info("[PURCHASE] 구매확인 팝업 처리...")
-        for sel in [
-            "#popupLayerConfirm input[value='확인']",
-            ".btn_confirm input[value='확인']",
-            "input[value='확인']",
-            "a:text-is('확인')", "button:text-is('확인')"
-        ]:
+        with metrics.span("confirm"):
+            purchase_timeout = _phase_timeout("purchase")
             try:
-                if _click_in_frame(page, sel):
-                    logger.info(f"[PURCHASE] 확인 팝업 클릭 ({sel})")
-                    break
-            except:
-                pass
-
-        time.sleep(2)
-
-        # ─────────────────────────────────────────
-        # 8. 구매내역 확인 팝업
-        # ─────────────────────────────────────────
+                purchase_resp = yield Op("expect_purchase", self.page, purchase_timeout,
+                                         self._click_confirm_script())
+            except PlaywrightTimeoutError:
+                PHASE_TIMEOUTS_TOTAL.inc(phase="purchase")
+                raise PhaseTimeout("purchase", purchase_timeout, "구매 요청 응답 없음")
+
+            ok, resp_msg = yield from _parse_purchase_response_script(purchase_resp)
+            if not ok:
+                raise Abort(f"구매 실패: {resp_msg}")
+
+    def step_receipt(self, attempt):
+        """구매내역 확인 팝업"""
         logger.info("[PURCHASE] 구매내역 확인 팝업 처리...")
-        for sel in [
-            ".btn_popup_buy_confirm input[value='확인']",
-            ".confirm input[value='확인']",
-            "input[value='확인']",
-            "a:text-is('확인')", "button:text-is('확인')"
-        ]:
+        with metrics.span("receipt"):
             try:
-                if _click_in_frame(page, sel):
-                    logger.info(f"[PURCHASE] 구매내역 팝업 클릭 ({sel})")
-                    _capture_screenshot(page) # 최종 완료 직전 캡처
-                    break
+                yield from _wait_in_frames_script(self.page, "receipt", JS_RECEIPT_POPUP_VISIBLE,
+                                                  frame_names=GAME_FRAMES + [None])
+            except PhaseTimeout as e:
+                # 구매 API는 이미 성공 응답 → 팝업 지연은 결과에 영향 없음
+                logger.warning(f"[PURCHASE] {e}")
+            yield Op("capture", self.page)  # 최종 완료 직전 캡처
+            sel = yield Op("click", self.page, "receipt_close")
+            if sel:
+                logger.info(f"[PURCHASE] 구매내역 팝업 클릭 ({sel})")
+
+def do_purchase(page, games, progress=_noop_progress):
+    """games: 번호 6개짜리 리스트의 리스트 (최대 MAX_GAMES_PER_SLIP) - 로그인된 page 에서 회차 확인부터 진행
+    반환: (성공 여부, 메시지, 회차, 추첨일, 게임별 결과 리스트)"""
+    return PurchaseSession(page, games, progress).run(login=False)
+
+# 고급 스텔스 설정
+STEALTH_INIT_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
+    window.chrome = { runtime: {} };
+    Object.defineProperty(navigator, 'languages', { get: () => ['ko-KR', 'ko', 'en-US', 'en'] });
+    Object.defineProperty(navigator, 'plugins', { get: () => [1, 2, 3, 4, 5] });
+"""
+
+def _context_options(cached_state):
+    return dict(
+        viewport={"width": 1920, "height": 1080},
+        user_agent=UA,
+        locale="ko-KR",
+        timezone_id="Asia/Seoul",
+        ignore_https_errors=True,
+        storage_state=cached_state,
+    )
+
+def automate_purchase(user_id, user_pw, games, progress=_noop_progress, stream_id=None):
+    try:
+        progress("browser", "🌐 브라우저 준비 중...")
+        cached_state = session_cache.get(user_id, user_pw)
+        with browser_pool.context(**_context_options(cached_state)) as context:
+            context.add_init_script(STEALTH_INIT_SCRIPT)
+            filter_session = resource_filter.install(context)
+            page = context.new_page()
+
+            # Playwright Stealth (있으면 적용)
+            try:
+                from playwright_stealth import Stealth
+                Stealth().apply_stealth_sync(page)
             except:
                 pass
 
-        time.sleep(1)
-
-        logger.info("[PURCHASE] ✅ 구매 프로세스 완료!")
-        return True, "✅ 구매 성공! 동행복권 마이페이지에서 구매내역을 확인하세요.", round_no, round_date
-
+            try:
+                with screen_hub.session(stream_id or uuid.uuid4().hex, context, page), \
+                        metrics.span("purchase_total", games=len(games)):
+                    return PurchaseSession(page, games, progress, context=context, user_id=user_id,
+                                           user_pw=user_pw, cached_state=cached_state).run()
+            finally:
+                resource_filter.finish(filter_session)
     except Exception as e:
-        logger.error(f"[PURCHASE] 오류: {e}", exc_info=True)
-        return False, f"구매 중 오류 발생: {str(e)[:80]}", None, None
-
-def automate_purchase(user_id, user_pw, numbers):
-    sync_playwright = _get_playwright_module()
-    is_headless = bool(os.environ.get('RENDER') or os.environ.get('DOCKER_ENV'))
-    logger.info(f"[CORE] Headless={is_headless}")
+        logger.error(f"[CORE] 전체 실패: {e}", exc_info=True)
+        return False, f"시스템 오류: {str(e)[:80]}", None, None, []
+
+def _run_purchase_job(job, user_id, user_pw, games):
+    """백그라운드 실행기에서 구매 자동화를 수행하고 이력까지 기록"""
+    outcome = automate_purchase(user_id, user_pw, games, progress=job.progress, stream_id=job.id)
+    return _job_result(user_id, outcome)
+
+def _job_result(user_id, outcome):
+    """자동화 결과 → 작업 결과 dict (구매된 게임은 이력에 기록)"""
+    success, msg, round_no, round_date, game_results = outcome
+    entries = []
+    for result in game_results:
+        result["entry"] = None
+        if success and result["success"]:
+            result["entry"] = add_history(result["numbers"], round_no, round_date, user_id=user_id)
+            entries.append(result["entry"])
+    return {
+        "success": success,
+        "message": msg,
+        "round": round_no,
+        "round_date": round_date,
+        "games": game_results,
+        "entry": entries[0] if entries else None,
+        "entries": entries,
+    }
 
+# ══════════════════════════════════════════════════════════════
+#  asyncio 엔진용 구매 흐름 (AUTOMATION_ENGINE=async)
+# ══════════════════════════════════════════════════════════════
+# 동기 흐름과 같은 스크립트를 playwright.async_api 객체로 run_async 가 실행한다.
+# 모든 세션이 async_engine 의 이벤트 루프 하나에서 돌며, 대기 중에는 루프를 양보하므로
+# 스레드 수를 늘리지 않고 여러 구매를 동시에 진행할 수 있다. 블로킹 I/O(세션 캐시, 이력 DB)는
+# asyncio.to_thread 로 루프 밖에서 처리한다.
+
+async def _click_action_async(page, action):
+    return await selector_resolver.click_async(page, action, ACTION_SELECTORS[action], GAME_FRAMES)
+
+async def _expect_purchase_async(page, timeout, script):
+    async with page.expect_response(lambda r: PURCHASE_API_MARKER in r.url, timeout=timeout) as resp_info:
+        await run_async(script)
+    return await resp_info.value
+
+# async 엔진의 Op 구현 (반환된 코루틴은 run_async 가 await)
+ASYNC_OPS = {
+    "sleep": asyncio.sleep,
+    "capture": screen_hub.capture_async,
+    "click": _click_action_async,
+    "blocking": asyncio.to_thread,
+    "expect_purchase": _expect_purchase_async,
+    "flow": lambda flow: flow.run_async(),
+}
+
+async def login_state_async(page):
+    return await run_async(_login_state_script(page))
+
+async def do_login_async(page, user_id, user_pw):
+    return await run_async(_login_script(page, user_id, user_pw))
+
+class AsyncPurchaseSession(PurchaseSession):
+    """PurchaseSession 을 async_engine 루프에서 실행 - 같은 단계 스크립트, run() 은 코루틴 반환"""
+    runner = staticmethod(run_async)
+
+async def do_purchase_async(page, games, progress=_noop_progress):
+    """do_purchase 의 async 판 - 반환 형식 동일"""
+    return await AsyncPurchaseSession(page, games, progress).run(login=False)
+
+async def automate_purchase_async(user_id, user_pw, games, progress=_noop_progress, stream_id=None):
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(
-                headless=is_headless,
-                proxy=_get_proxy_config(),
-                args=[
-                    "--no-sandbox",
-                    "--disable-setuid-sandbox",
-                    "--disable-dev-shm-usage",
-                    "--disable-blink-features=AutomationControlled",
-                    "--disable-infobars",
-                    "--disable-gpu",
-                    "--no-zygote",
-                    "--disable-software-rasterizer"
-                ]
-            )
-            context = browser.new_context(
-                viewport={"width": 1920, "height": 1080},
-                user_agent=UA,
-                locale="ko-KR",
-                timezone_id="Asia/Seoul",
-                ignore_https_errors=True
-            )
-            
-            # 고급 스텔스 설정
-            context.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
-                window.chrome = { runtime: {} };
-                Object.defineProperty(navigator, 'languages', { get: () => ['ko-KR', 'ko', 'en-US', 'en'] });
-                Object.defineProperty(navigator, 'plugins', { get: () => [1, 2, 3, 4, 5] });
-            """)
-            page = context.new_page()
+        progress("browser", "🌐 브라우저 준비 중...")
+        cached_state = await asyncio.to_thread(session_cache.get, user_id, user_pw)
+        async with async_engine.context(**_context_options(cached_state)) as context:
+            await context.add_init_script(STEALTH_INIT_SCRIPT)
+            filter_session = await resource_filter.install_async(context)
+            page = await context.new_page()
 
-            # Playwright Stealth (있으면 적용)
             try:
                 from playwright_stealth import Stealth
-                Stealth().apply_stealth_sync(page)
-            except:
+                await Stealth().apply_stealth_async(page)
+            except Exception:
                 pass
 
             try:
-                if not do_login(page, user_id, user_pw):
-                    return False, "❌ 로그인 실패. 아이디/비밀번호를 확인하세요.", None, None
-                return do_purchase(page, numbers)
+                async with screen_hub.session_async(stream_id or uuid.uuid4().hex, context, page):
+                    with metrics.span("purchase_total", games=len(games), engine="async"):
+                        return await AsyncPurchaseSession(page, games, progress, context=context, user_id=user_id,
+                                                          user_pw=user_pw, cached_state=cached_state).run()
             finally:
-                try:
-                    browser.close()
-                except:
-                    pass
+                resource_filter.finish(filter_session)
+    except asyncio.CancelledError:
+        raise  # 세션 마감 → 엔진이 SessionDeadline 으로 변환
     except Exception as e:
         logger.error(f"[CORE] 전체 실패: {e}", exc_info=True)
-        return False, f"시스템 오류: {str(e)[:80]}", None, None
+        return False, f"시스템 오류: {str(e)[:80]}", None, None, []
+
+async def _run_purchase_job_async(job, user_id, user_pw, games):
+    outcome = await automate_purchase_async(user_id, user_pw, games, progress=job.progress, stream_id=job.id)
+    return await asyncio.to_thread(_job_result, user_id, outcome)
+
+# 자동화 엔진 선택: sync = 작업 스레드마다 동기 Playwright (기본), async = 이벤트 루프 1개에서 동시 세션
+AUTOMATION_ENGINE = os.environ.get('AUTOMATION_ENGINE', 'sync').strip().lower()
+async_engine = AsyncEngine(
+    _browser_launch_options,
+    max_concurrency=int(os.environ.get('ASYNC_MAX_SESSIONS', 4)),
+    session_deadline=int(os.environ.get('ASYNC_SESSION_DEADLINE_SEC', 240)),
+    max_contexts_per_browser=int(os.environ.get('POOL_MAX_CONTEXTS', 50)),
+    max_browser_age=int(os.environ.get('POOL_MAX_AGE_SEC', 3600)),
+)
+atexit.register(async_engine.shutdown)
+
+def _purchase_runner(job, **kwargs):
+    """작업 큐 실행 함수 - async 엔진이면 세션을 이벤트 루프에 넘기고 Future 반환"""
+    if AUTOMATION_ENGINE == 'async':
+        return async_engine.submit(_run_purchase_job_async, job, **kwargs)
+    return _run_purchase_job(job, **kwargs)
+
+def _parse_credentials(data):
+    """요청 본문의 아이디/비밀번호 → ((id, pw), 오류 메시지) - 문자열이 아니거나 비어 있으면 오류"""
+    uid, upw = data.get('id'), data.get('pw')
+    if not isinstance(uid, str) or not isinstance(upw, str) or not uid.strip() or not upw.strip():
+        return (None, None), "아이디/비밀번호가 없습니다."
+    return (uid.strip(), upw.strip()), None
+
+def _parse_games(data):
+    """요청 본문에서 게임 목록 추출/검증 → (games, 오류 메시지)
+    games: [[6개], ...] (최대 MAX_GAMES_PER_SLIP), 하위 호환: numbers: [6개]"""
+    games = data.get('games')
+    if games is None:
+        games = [data.get('numbers') or []]
+    if not isinstance(games, list) or not games:
+        return None, "구매할 게임이 없습니다."
+    if len(games) > MAX_GAMES_PER_SLIP:
+        return None, f"한 번에 최대 {MAX_GAMES_PER_SLIP}게임까지 구매할 수 있습니다."
+    parsed = []
+    for numbers in games:
+        try:
+            numbers = sorted(int(n) for n in numbers)
+        except (TypeError, ValueError):
+            return None, "번호는 숫자여야 합니다."
+        if len(numbers) != 6 or len(set(numbers)) != 6:
+            return None, "게임마다 서로 다른 번호 6개가 필요합니다."
+        if numbers[0] < 1 or numbers[-1] > 45:
+            return None, "번호는 1~45 사이여야 합니다."
+        parsed.append(numbers)
+    return parsed, None
+
+# 구매 작업 큐 (동시 실행 수 = PURCHASE_WORKERS, 대기 상한 = PURCHASE_MAX_PENDING)
+job_queue = JobQueue(
+    _purchase_runner,
+    max_workers=int(os.environ.get('PURCHASE_WORKERS', 1)),
+    max_pending=int(os.environ.get('PURCHASE_MAX_PENDING', 20)),
+)
+
+def _run_backtest_job(job, **kwargs):
+    """백테스트 실행 (웹 스레드 대신 작업 큐 스레드에서 프로세스 풀 결과를 기다림)"""
+    job.progress("running", "📊 백테스트 실행 중...")
+    return {"success": True, **backtester.run(draw_archive.all(), **kwargs)}
+
+# 백테스트 작업 큐 (한 번에 1건, 대기 상한 = BACKTEST_MAX_PENDING)
+backtest_jobs = JobQueue(
+    _run_backtest_job,
+    max_workers=1,
+    max_pending=int(os.environ.get('BACKTEST_MAX_PENDING', 4)),
+    name="backtest",
+    queued_msg="⏳ 백테스트 대기열에 등록되었습니다.",
+)
 
 # ══════════════════════════════════════════════════════════════
 #  Flask Routes
 # ══════════════════════════════════════════════════════════════
+HTTP_SECONDS = metrics.histogram(
+    "lotto_http_request_duration_seconds", "Flask 요청 처리 시간", ("method", "endpoint", "status"))
+metrics.gauge("lotto_browser_pool_size", "살아 있는 브라우저 수", fn=lambda: browser_pool.stats()["size"])
+metrics.gauge("lotto_jobs_active", "대기/실행 중인 구매 작업 수",
+              fn=lambda: sum(n for st, n in job_queue.stats()["jobs"].items() if st in ("queued", "running")))
+metrics.gauge("lotto_async_sessions_active", "비동기 엔진에서 진행 중인 세션 수",
+              fn=lambda: async_engine.stats()["active"])
+
 @app.before_request
 def log_req():
+    g.request_started = time.perf_counter()
     logger.info(f"[REQ] {request.method} {request.path}")
 
+@app.after_request
+def observe_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # 경로 파라미터가 들어간 실제 URL 대신 라우트 규칙으로 집계 (카디널리티 제한)
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_SECONDS.observe(time.perf_counter() - started, method=request.method,
+                             endpoint=endpoint, status=response.status_code)
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus 스크레이프용 메트릭"""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+def _asset_response(asset, cache_control, kind):
+    """사전 압축 변형 중 Accept-Encoding 에 맞는 것을 골라 응답 (ETag 일치 시 304)"""
+    encoding, body, etag = asset.pick(request.headers.get('Accept-Encoding'))
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if request.if_none_match.contains(etag.strip('"')):
+        asset_pipeline.count(f"{kind}_304")
+        return Response(status=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    asset_pipeline.count(f"{kind}_200")
+    return Response(body, content_type=asset.content_type, headers=headers)
+
 @app.route('/')
 def index():
-    return send_from_directory(BASE_DIR, 'lotto_ai.html')
+    try:
+        shell = asset_pipeline.shell()
+    except Exception as e:
+        logger.error(f"[ASSETS] 셸 빌드 실패 → 원본 HTML 제공: {e}")
+        return send_from_directory(BASE_DIR, 'lotto_ai.html')
+    return _asset_response(shell, SHELL_CACHE, "shell")
+
+@app.route('/assets/<name>')
+def static_asset(name):
+    """내용 해시 파일명 자산 (immutable 캐시)"""
+    asset = asset_pipeline.asset(name)
+    if asset is None:
+        return jsonify({'success': False, 'msg': '자산 없음'}), 404
+    return _asset_response(asset, IMMUTABLE, "asset")
 
 @app.route('/health')
 @app.route('/ping')
 def health():
+    browser = self_test.results().get("browser")
     return jsonify({
         "status": "ok", 
         "env": "render" if os.environ.get('RENDER') else "local",
         "python": sys.version[:10],
-        "playwright": "available"
+        "playwright": "unknown" if browser is None else ("available" if browser["ok"] else "unavailable"),
+        "browser_pool": browser_pool.stats()["size"]
     }), 200
 
+@app.route('/livez')
+def livez():
+    """프로세스 생존 여부만 (외부 의존성 확인 없음)"""
+    return jsonify({"status": "ok", "uptime_sec": round(time.time() - self_test.started_at, 1)}), 200
+
+@app.route('/readyz')
+def readyz():
+    """백그라운드 자가 진단 캐시 기반 준비 상태 (브라우저 기동 없음)"""
+    ready, checks = self_test.readiness()
+    return jsonify({"status": "ready" if ready else "not_ready", "checks": checks}), 200 if ready else 503
+
+@app.route('/browser-pool')
+def browser_pool_stats():
+    """브라우저 풀 크기 및 재사용 카운터"""
+    return jsonify({
+        **browser_pool.stats(),
+        "session_cache": session_cache.stats(),
+        "selector_cache": selector_resolver.stats(),
+        "resource_filter": resource_filter.stats(),
+        "assets": asset_pipeline.stats(),
+        "engine": AUTOMATION_ENGINE,
+        "async_engine": async_engine.stats(),
+        "backtest": {**backtester.stats(), "jobs": backtest_jobs.stats()},
+        "combo_index": combo_index.stats(),
+    })
+
 @app.route('/diagnostic')
 def diagnostic():
-    """브라우저 실행 가능 여부 정밀 진단"""
-    logger.info("[DIAG] 브라우저 진단 시작...")
-    sync_playwright = _get_playwright_module()
-    try:
-        with sync_playwright() as p:
-            # 브라우저 실행 시 경로 이슈를 방지하기 위해 args와 함께 명시적 실행
-            browser = p.chromium.launch(
-                headless=True, 
-                proxy=_get_proxy_config(),
-                args=["--no-sandbox", "--disable-setuid-sandbox", "--disable-dev-shm-usage"]
-            )
-            page = browser.new_page()
-            # 동행복권 사이트 직접 접속 테스트
-            page.goto("https://www.dhlottery.co.kr/", timeout=DEFAULT_TIMEOUT)
-            title = page.title()
-            browser.close()
-            return jsonify({"success": True, "title": title, "msg": "브라우저 엔진이 정상 작동합니다."})
-    except Exception as e:
-        logger.error(f"[DIAG] 실패: {e}")
-        return jsonify({"success": False, "msg": str(e)}), 500
+    """자가 진단 결과 (캐시) - ?refresh=1 이면 백그라운드 재점검만 요청하고 즉시 응답"""
+    refresh = None
+    if request.args.get('refresh') == '1':
+        refresh = "scheduled" if self_test.request_refresh(include_browser=True) else "too_soon"
+    ready, checks = self_test.readiness()
+    browser = checks.get("browser") or {}
+    return jsonify({
+        "success": bool(browser.get("ok")),
+        "ready": ready,
+        "checks": checks,
+        "refresh": refresh,
+        "msg": "브라우저 엔진이 정상 작동합니다." if browser.get("ok")
+               else browser.get("error") or "자가 진단 결과 대기 중",
+    })
 
 @app.route('/screenshot')
 def get_screenshot():
-    """현재 캡처된 화면 이미지 전송"""
-    from flask import Response
-    if latest_screenshot:
-        return Response(latest_screenshot, mimetype='image/jpeg')
+    """가장 최근 작업의 화면 이미지 전송 (하위 호환용, 실시간은 /jobs/<id>/stream)"""
+    frame = screen_hub.latest_frame()
+    if frame:
+        return Response(frame, mimetype='image/jpeg')
     return "No screenshot", 404
 
 @app.route('/buy', methods=['POST'])
 def buy():
-    data = request.json or {}
-    uid      = data.get('id', '').strip()
-    upw      = data.get('pw', '').strip()
-    numbers  = data.get('numbers', [])
-
-    if not uid or not upw:
-        return jsonify({"success": False, "message": "아이디/비밀번호가 없습니다."}), 400
-    if not numbers or len(numbers) != 6:
-        return jsonify({"success": False, "message": "번호 6개가 필요합니다."}), 400
-
-    success, msg, round_no, round_date = automate_purchase(uid, upw, numbers)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"success": False, "message": "요청 본문은 JSON 객체여야 합니다."}), 400
+    (uid, upw), error = _parse_credentials(data)
+    if not error:
+        games, error = _parse_games(data)
+    if error:
+        return jsonify({"success": False, "message": error}), 400
 
-    entry = None
-    if success:
-        entry = add_history(numbers, round_no, round_date, user_id=uid)
+    try:
+        job = job_queue.submit(user_id=uid, user_pw=upw, games=games)
+    except QueueFull:
+        return jsonify({"success": False, "message": "구매 요청이 많습니다. 잠시 후 다시 시도하세요."}), 503
+    # 작업 시작 전에 접속한 시청자도 기다릴 수 있도록 화면 채널 미리 생성
+    screen_hub.channel(job.id, create=True)
 
     return jsonify({
-        "success": success,
-        "message": msg,
-        "round": round_no,
-        "round_date": round_date,
-        "entry": entry,
-    })
+        "success": True,
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "stream_url": f"/jobs/{job.id}/stream",
+    }), 202
+
+@app.route('/jobs')
+def jobs_stats():
+    """작업 큐 현황 (상태별 건수)"""
+    return jsonify(job_queue.stats())
+
+@app.route('/jobs/<job_id>/stream')
+def job_stream(job_id):
+    """작업 화면 실시간 중계 (MJPEG push, ?fps= 로 상한 이하 조정, 시청자 수 상한 초과 시 503)"""
+    if not screen_hub.channel(job_id):
+        return "No stream", 404
+    if not screen_hub.acquire_viewer(job_id):
+        return "Too many viewers", 503
+    fps = request.args.get('fps', type=float)
+    resp = Response(screen_hub.mjpeg(job_id, fps=fps),
+                    mimetype=f'multipart/x-mixed-replace; boundary={SCREEN_BOUNDARY}',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # 스트림이 시작되기 전에 연결이 끊겨도 자리는 반납되도록 응답 종료 시점에 해제
+    resp.call_on_close(lambda: screen_hub.release_viewer(job_id))
+    return resp
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """구매 작업 단계별 진행 상황 및 최종 결과"""
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"success": False, "message": "작업을 찾을 수 없습니다."}), 404
+    return jsonify(job.to_dict())
+
+def _history_etag(state):
+    return f"h{state['epoch']}.{state['last_seq']}.{state['count']}"
+
+def _int_args(*names):
+    """지정된 쿼리 인자 중 들어온 것만 정수로 → {이름: 값}, 정수가 아니면 ValueError"""
+    values = {}
+    for name in names:
+        raw = request.args.get(name)
+        if raw is None:
+            continue
+        try:
+            values[name] = int(raw)
+        except ValueError:
+            raise ValueError(f"{name} 형식 오류 (정수)") from None
+    return values
 
 @app.route('/history', methods=['GET'])
 def get_history():
-    # ?user_id=xxx 쿼리로 사용자별 필터 가능
+    """구매 이력 조회 (?user_id= 필터)
+    - 기본: 전체 목록 (최신순, 기존 응답과 동일 - 페이지 인자가 없을 때)
+    - ?limit= / ?cursor= : 최신순 커서 페이지 (cursor ← 직전 응답의 next_cursor)
+    - ?since=<seq>[&epoch=] : seq 이후 추가분만 (증분 동기화, epoch 가 바뀌었으면 reset)
+    - ?offset= : 구버전 오프셋 페이지
+    ETag 는 이력 상태(epoch, 마지막 seq, 건수) 기준 → 변화 없으면 304"""
     user_id = request.args.get('user_id', None)
-    return jsonify({"history": load_history(user_id=user_id)})
+    try:
+        ints = _int_args('limit', 'offset', 'since', 'epoch')
+    except ValueError as e:
+        return jsonify({"success": False, "msg": str(e)}), 400
+    limit = max(min(ints.get('limit', 200), HISTORY_PAGE_MAX), 1)
+    try:
+        state = history_store.state(user_id=user_id)
+    except Exception as e:
+        logger.error(f"[HISTORY] 상태 조회 실패: {e}")
+        return jsonify({"success": False, "msg": "이력 조회 실패"}), 500
+
+    etag = _history_etag(state)
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"}
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+    body = {"epoch": state["epoch"], "last_seq": state["last_seq"], "total": state["count"]}
+
+    since = ints.get('since')
+    if since is not None:
+        client_epoch = ints.get('epoch')
+        if client_epoch is not None and client_epoch != state["epoch"]:
+            # 삭제/교체가 있었음 → 추가분만으로는 맞출 수 없으므로 전체 재조회 요청
+            return jsonify({**body, "reset": True, "history": []}), 200, headers
+        rows = history_store.changes(user_id=user_id, since=since, limit=limit + 1)
+        page = rows[:limit]
+        body.update(history=page, has_more=len(rows) > limit,
+                    next_since=page[-1]['seq'] if page else since, reset=False)
+    elif not any(k in request.args for k in ('limit', 'cursor', 'offset')):
+        # 페이지 인자 없음 → 전체 (프런트엔드는 다음 페이지를 따라가지 않으므로 잘리면 안 됨)
+        body.update(history=load_history(user_id=user_id), has_more=False, next_cursor=None)
+    elif 'offset' in request.args:
+        offset = max(ints.get('offset', 0), 0)
+        history = load_history(user_id=user_id, limit=limit + 1, offset=offset)
+        body.update(history=history[:limit], has_more=len(history) > limit,
+                    next_offset=offset + limit if len(history) > limit else None)
+    else:
+        cursor = request.args.get('cursor')
+        try:
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({"success": False, "msg": str(e)}), 400
+        rows = history_store.page(user_id=user_id, limit=limit + 1, cursor=after)
+        page = rows[:limit]
+        body.update(history=page, has_more=len(rows) > limit,
+                    next_cursor=encode_cursor(page[-1]['timestamp'], page[-1]['seq'])
+                    if len(rows) > limit else None)
+    return jsonify(body), 200, headers
+
+@app.route('/history/export')
+def export_history():
+    """전체 이력 NDJSON 스트리밍 (한 줄에 1건, 최신순) - 헤더의 epoch/last_seq 로 이후 증분 동기화"""
+    user_id = request.args.get('user_id', None)
+    state = history_store.state(user_id=user_id)
+
+    def generate():
+        for entry in history_store.iter_entries(user_id=user_id):
+            yield json.dumps(entry, ensure_ascii=False) + "\n"
+
+    label = "".join(c for c in (user_id or "all") if c.isalnum() or c in "-_") or "user"
+    filename = f"history-{label}-{datetime.now():%Y%m%d}.ndjson"
+    return Response(generate(), content_type="application/x-ndjson; charset=utf-8", headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "X-History-Epoch": str(state["epoch"]),
+        "X-History-Last-Seq": str(state["last_seq"]),
+        "ETag": f'"{_history_etag(state)}"',
+    })
 
 @app.route('/history', methods=['DELETE'])
 def del_history():
+    # user_id 지정 시 해당 유저 이력만 삭제
     user_id = request.args.get('user_id', None)
-    if user_id:
-        # 해당 유저 이력만 삭제
-        all_history = load_history()
-        remaining = [h for h in all_history if h.get('user_id') != user_id]
-        save_history(remaining)
-    else:
-        save_history([])
+    delete_history(user_id=user_id)
     return jsonify({"success": True})
 
+@app.route('/history/check')
+def check_history():
+    """구매 이력 일괄 당첨 판정 (?user_id=, ?from=&to= 회차 범위, ?all=1 전체 회차 대조)"""
+    user_id = request.args.get('user_id', None)
+    round_from = request.args.get('from', 0, type=int)
+    round_to = request.args.get('to', 10 ** 6, type=int)
+    all_rounds = request.args.get('all') == '1'
+
+    rows = history_store.tickets(user_id=user_id)
+    rounds = np.array([_ticket_round(r[3], r[1]) for r in rows], dtype=np.int64)
+    keep = (rounds >= round_from) & (rounds <= round_to)
+    rows = [r for r, k in zip(rows, keep) if k]
+    rounds = rounds[keep]
+    masks = np.array([r[4] for r in rows], dtype=np.uint64)
+
+    draws = _get_draw_masks()
+    matches, rank, drawn = lotto_match.check_own_round(
+        masks, rounds, draws["rounds"], draws["masks"], draws["bonus"])
+
+    results = [{
+        "timestamp": row[1],
+        "user_id": row[2],
+        "round": int(rounds[i]),
+        "numbers": lotto_match.mask_to_numbers(int(masks[i])),
+        "drawn": bool(drawn[i]),
+        "matches": int(matches[i]),
+        "rank": int(rank[i]),
+    } for i, row in enumerate(rows)]
+
+    summary = {str(k): int((rank[drawn] == k).sum()) for k in range(6)}
+    body = {"success": True, "tickets": results, "summary": summary, "checked": int(drawn.sum())}
+
+    if all_rounds:
+        # 범위 내 모든 아카이브 회차와 대조 ("이 번호로 계속 샀다면")
+        sel = (draws["rounds"] >= round_from) & (draws["rounds"] <= round_to)
+        best, dist = lotto_match.check_all_rounds(masks, draws["masks"][sel], draws["bonus"][sel])
+        for i, res in enumerate(results):
+            res["best_rank_all_rounds"] = int(best[i])
+            res["rank_counts_all_rounds"] = dist[i].tolist()
+        body["draws_compared"] = int(sel.sum())
+
+    return jsonify(body)
+
+@app.route('/round')
+def current_round():
+    """판매 중인 회차/추첨일/판매 가능 여부 (서버 시각 KST 기준 계산)"""
+    return jsonify({
+        **draw_calendar.sales_status(),
+        "latest_drawn_round": draw_calendar.latest_drawn_round(),
+        "next_result_at": draw_calendar.next_result_time().isoformat(),
+    })
+
 @app.route('/lotto-result')
 def lotto_result():
-    """동행복권 API에서 최신 당첨번호 조회"""
+    """당첨번호 조회 (?round=N 지정 가능, 기본은 최신 회차) - 아카이브 메모리에서 응답"""
+    drw_no = None
+    if request.args.get('round', '').strip():
+        drw_no = request.args.get('round', type=int)
+        try:
+            if drw_no is None:
+                raise ValueError("회차 형식 오류")
+            draw_archive.check_round(drw_no, ahead=0)
+        except ValueError as e:
+            return jsonify({'success': False, 'msg': str(e)}), 400
     try:
-        # 1. 최신 회차 번호 파악 (메인에서 파싱)
-        headers = {'User-Agent': UA}
-        req = urllib.request.Request('https://www.dhlottery.co.kr/common.do?method=main', headers=headers)
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            html = resp.read().decode('utf-8')
-        m = re.search(r'제\s*(\d{3,4})\s*회', html)
-        if not m:
-            m = re.search(r'drwNo=(\d{3,4})', html)
-        latest_round = int(m.group(1)) if m else 1162
-
-        # 2. 해당 회차 당첨 정보 API 호출
-        api_url = f'https://www.dhlottery.co.kr/common.do?method=getLottoNumber&drwNo={latest_round}'
-        req2 = urllib.request.Request(api_url, headers=headers)
-        with urllib.request.urlopen(req2, timeout=10) as resp2:
-            result = json.loads(resp2.read().decode('utf-8'))
-
-        if result.get('returnValue') != 'success':
-            return jsonify({'success': False, 'msg': '당첨번호 데이터 없음'}), 404
-
-        return jsonify({
-            'success': True,
-            'round': result.get('drwNo'),
-            'date': result.get('drwNoDate'),
-            'numbers': [
-                result.get('drwtNo1'), result.get('drwtNo2'),
-                result.get('drwtNo3'), result.get('drwtNo4'),
-                result.get('drwtNo5'), result.get('drwtNo6'),
-            ],
-            'bonus': result.get('bnusNo'),
-            'first_winners': result.get('firstPrzwnerCo', 0),
-            'first_prize': result.get('firstWinamnt', 0),
-        })
+        result = draw_archive.get(drw_no) if drw_no else draw_archive.latest()
     except Exception as e:
         logger.error(f"[RESULT] 당첨번호 조회 실패: {e}")
-        return jsonify({'success': False, 'msg': str(e)}), 500
+        return jsonify({'success': False, 'msg': '당첨번호 조회 실패'}), 502
+    if not result:
+        return jsonify({'success': False, 'msg': '당첨번호 데이터 없음'}), 404
+    return jsonify({'success': True, **result})
+
+@app.route('/stats')
+def stats():
+    """전체 당첨번호 통계 (미리 계산된 결과 + ETag)"""
+    _refresh_stats()
+    etag, payload = stats_engine.snapshot()
+    if not payload:
+        return jsonify({'success': False, 'msg': '통계 데이터 없음'}), 404
+    resp = jsonify({'success': True, **payload})
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp.make_conditional(request)
+
+@app.route('/recommend')
+def recommend():
+    """조건부 번호 추천 (?count=, ?seed=, ?sum_min=&sum_max=, ?odd_min=&odd_max=, ?low_min=&low_max=,
+    ?max_run=, ?weighting=none|frequency|cold, ?exclude_winners=1, ?user_id= → 본인 구매 번호 제외)"""
+    args = request.args
+    started = time.perf_counter()
+    try:
+        weighting = args.get('weighting', 'none')
+        if weighting != 'none':
+            _refresh_stats()
+        exclude = []
+        if args.get('exclude_winners', '1') != '0':
+            exclude.append(_get_draw_masks()["masks"])
+        user_id = args.get('user_id')
+        if user_id and args.get('exclude_history', '1') != '0':
+            exclude.append(np.array([r[4] for r in history_store.tickets(user_id=user_id)], dtype=np.uint64))
+
+        tickets, info = recommender.generate(
+            args.get('count', 1, type=int),
+            seed=args.get('seed', type=int),
+            weights=recommender.number_weights(weighting, stats_engine.frequency()),
+            sum_range=(args.get('sum_min', type=int), args.get('sum_max', type=int)),
+            odd_range=(args.get('odd_min', type=int), args.get('odd_max', type=int)),
+            low_range=(args.get('low_min', type=int), args.get('low_max', type=int)),
+            max_run=args.get('max_run', type=int),
+            exclude_masks=np.concatenate(exclude) if exclude else None,
+        )
+    except recommender.RecommendError as e:
+        return jsonify({'success': False, 'msg': str(e)}), 400
+
+    return jsonify({
+        'success': len(tickets) > 0,
+        'tickets': tickets.tolist(),
+        'features': recommender.describe(tickets),
+        'weighting': weighting,
+        'excluded_combinations': int(sum(len(e) for e in exclude)),
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+        **info,
+    })
+
+@app.route('/combo')
+def combo_lookup():
+    """조합 조회 (?numbers=1,2,3,4,5,6 또는 ?rank=) → 조합 번호, 역대 1등 여부, 회차 선택 수 (?round=)"""
+    try:
+        if request.args.get('rank') is not None:
+            rank = request.args.get('rank', type=int)
+            if rank is None:
+                raise ValueError("조합 번호 형식 오류 (정수)")
+            numbers = combos.unrank(rank)
+        else:
+            raw = [n.strip() for n in request.args.get('numbers', '').split(',') if n.strip()]
+            if not all(n.isdigit() for n in raw):
+                raise ValueError("번호 형식 오류 (예: 1,2,3,4,5,6)")
+            numbers = [int(n) for n in raw]
+            rank = combos.rank(numbers)
+        round_no = _combo_round_arg()
+    except ValueError as e:
+        return jsonify({'success': False, 'msg': str(e)}), 400
+    _sync_combo_winners()
+    return jsonify({
+        'success': True,
+        'rank': rank,
+        'numbers': sorted(numbers),
+        'won_first_prize': bool(combo_index.has_won([rank])[0]),
+        'won_rounds': combo_index.won_rounds(rank),
+        'round': round_no,
+        'picks': int(combo_index.pick_counts(round_no, [rank])[0]),
+    })
+
+@app.route('/combo/unpicked')
+def combo_unpicked():
+    """회차에서 아직 아무도 고르지 않은(역대 1등 제외) 조합 무작위 추출 (?count=, ?seed=, ?round=)"""
+    count = max(min(request.args.get('count', 5, type=int), 1000), 1)
+    seed = request.args.get('seed', type=int)
+    if seed is not None and seed < 0:
+        return jsonify({'success': False, 'msg': 'seed 는 0 이상이어야 합니다.'}), 400
+    try:
+        round_no = _combo_round_arg()
+    except ValueError as e:
+        return jsonify({'success': False, 'msg': str(e)}), 400
+    _sync_combo_winners()
+    ranks = combo_index.sample_unpicked(round_no, count, seed=seed)
+    return jsonify({
+        'success': True,
+        'round': round_no,
+        'tickets': combos.unrank_many(ranks).tolist(),
+        'ranks': ranks.tolist(),
+        'summary': combo_index.round_summary(round_no),
+    })
+
+@app.route('/backtest')
+def run_backtest():
+    """전략 백테스트 작업 등록 → 202 + job_id (결과는 /backtest/jobs/<job_id>)
+    ?strategy=random|stat|cold|fixed|history, ?tickets= 회차당 장수, ?seed= (0 이상),
+    ?from=&to= 회차 범위, ?numbers=1,2,3,4,5,6;... (fixed), ?user_id= (history: 본인 구매 번호 고정 구매)"""
+    args = request.args
+    strategy = args.get('strategy', 'random')
+    numbers = None
+    try:
+        if strategy == 'history':
+            # 다른 사용자 이력이 섞이지 않도록 user_id 필수
+            if not args.get('user_id'):
+                raise BacktestError("history 전략에는 user_id 가 필요합니다.")
+            rows = history_store.tickets(user_id=args.get('user_id'))
+            numbers = [lotto_match.mask_to_numbers(r[4]) for r in rows]
+            strategy = 'fixed'
+        elif strategy == 'fixed':
+            numbers = parse_backtest_numbers(args.get('numbers'))
+        tickets = args.get('tickets', 10000, type=int)
+        seed = args.get('seed', 0, type=int)
+        if tickets > BACKTEST_MAX_TICKETS:
+            raise BacktestError(f"회차당 티켓은 최대 {BACKTEST_MAX_TICKETS}장입니다 (더 큰 실행은 backtest.py CLI 사용).")
+        Backtester.check(strategy, tickets, seed, numbers)
+        job = backtest_jobs.submit(strategy=strategy, tickets=tickets, seed=seed, numbers=numbers,
+                                   round_from=args.get('from', type=int), round_to=args.get('to', type=int))
+    except BacktestError as e:
+        return jsonify({'success': False, 'msg': str(e)}), 400
+    except QueueFull:
+        return jsonify({'success': False, 'msg': '백테스트 요청이 많습니다. 잠시 후 다시 시도하세요.'}), 503
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/backtest/jobs/{job.id}',
+    }), 202
+
+@app.route('/backtest/jobs/<job_id>')
+def backtest_job_status(job_id):
+    """백테스트 작업 상태 및 결과 (result)"""
+    job = backtest_jobs.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'msg': '작업을 찾을 수 없습니다.'}), 404
+    return jsonify(job.to_dict())
+
+# ══════════════════════════════════════════════════════════════
+#  백그라운드 작업 기동
+# ══════════════════════════════════════════════════════════════
+# 임포트 시점에는 스레드/파일 부작용 없음: 백테스트 spawn 워커가 `python app.py` 로
+# 띄운 앱을 __mp_main__ 으로 다시 임포트하므로, 기동은 __main__ 과 wsgi.py 에서만 호출
+_background = {"started": False, "lock": threading.Lock()}
+
+def start_background():
+    """이력 가져오기/보존 정리, 자산 빌드, 당첨번호 백필, 자가 진단 시작 (여러 번 호출해도 1회)"""
+    with _background["lock"]:
+        if _background["started"]:
+            return
+        _background["started"] = True
+    history_store.import_json_once(HISTORY_FILE)
+    history_store.start_retention()
+    asset_pipeline.build()
+    if os.environ.get('DRAW_BACKFILL', '1') != '0':
+        # 배포 디스크가 비어 있으면 매번 처음부터 받으므로 최근 DRAW_BACKFILL_MAX 회차만 (0 = 전체)
+        draw_archive.backfill_async(
+            limit=int(os.environ.get('DRAW_BACKFILL_MAX', 100)) or None,
+            pause=float(os.environ.get('DRAW_BACKFILL_PAUSE_SEC', 1.0)),
+        )
+    if os.environ.get('SELFTEST', '1') != '0':
+        self_test.start()
 
 # ══════════════════════════════════════════════════════════════
 #  개발 서버 실행
 # ══════════════════════════════════════════════════════════════
 if __name__ == '__main__':
+    start_background()
     port = int(os.environ.get('PORT', 5000))
     logger.info(f"Flask 개발 서버 시작: http://0.0.0.0:{port}")
     app.run(host='0.0.0.0', port=port, debug=False)
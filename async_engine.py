@@ -0,0 +1,167 @@
+import time
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# ══════════════════════════════════════════════════════════════
+#  asyncio 기반 자동화 엔진 (playwright.async_api)
+# ══════════════════════════════════════════════════════════════
+# 전용 스레드 하나가 이벤트 루프 + Chromium 1개를 소유하고, 구매 세션마다 컨텍스트를 발급한다.
+# 세션 대부분은 네트워크/화면 대기이므로 스레드를 점유하지 않고 한 루프에서 동시에 진행된다.
+#   - 동시 세션 수: Semaphore(max_concurrency)
+#   - 세션 마감: asyncio.wait_for(session_deadline) → 초과 시 취소 후 컨텍스트 정리
+# 호출 측(웹/작업 큐 스레드)은 submit() 이 돌려준 concurrent.futures.Future 만 다룬다.
+
+
+class SessionDeadline(Exception):
+    """세션이 마감 시간을 넘겨 취소됨"""
+    def __init__(self, deadline_sec):
+        self.deadline_sec = deadline_sec
+        super().__init__(f"세션 마감 시간 초과 ({deadline_sec}s)")
+
+
+class AsyncEngine:
+    def __init__(self, launch_options, max_concurrency=4, session_deadline=240,
+                 max_contexts_per_browser=200, max_browser_age=3600):
+        # launch_options: chromium.launch()에 넘길 kwargs를 돌려주는 callable
+        self._launch_options = launch_options
+        self.max_concurrency = max_concurrency
+        self.session_deadline = session_deadline
+        self.max_contexts_per_browser = max_contexts_per_browser
+        self.max_browser_age = max_browser_age
+        self._loop = None
+        self._thread = None
+        self._started = threading.Event()
+        self._semaphore = None
+        self._browser_lock = None
+        self._playwright = None
+        self._browser = None
+        self._launched_at = None
+        self._contexts_served = 0
+        self._active = 0
+        self._waiting = 0
+        self._counters = {"launches": 0, "sessions": 0, "deadline_exceeded": 0, "errors": 0}
+
+    # ── 이벤트 루프 스레드 ────────────────────────────────────
+    def start(self):
+        if self._thread:
+            return
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._browser_lock = asyncio.Lock()
+            self._started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="async-engine", daemon=True)
+        self._thread.start()
+        self._started.wait()
+        logger.info(f"[ASYNC] 엔진 시작 (동시 {self.max_concurrency}세션, 마감 {self.session_deadline}s)")
+
+    def submit(self, coro_fn, *args, **kwargs):
+        """coro_fn(*args, **kwargs) 를 동시 실행 한도/마감 시간 안에서 실행 → Future"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self._guarded(coro_fn, args, kwargs), self._loop)
+
+    async def _guarded(self, coro_fn, args, kwargs):
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._active += 1
+        self._counters["sessions"] += 1
+        try:
+            return await asyncio.wait_for(coro_fn(*args, **kwargs), timeout=self.session_deadline)
+        except asyncio.TimeoutError:
+            self._counters["deadline_exceeded"] += 1
+            raise SessionDeadline(self.session_deadline) from None
+        except Exception:
+            self._counters["errors"] += 1
+            raise
+        finally:
+            self._active -= 1
+            self._semaphore.release()
+
+    # ── 브라우저 / 컨텍스트 ───────────────────────────────────
+    def _needs_recycle(self):
+        if self._active > 1:  # 다른 세션이 쓰는 중이면 교체하지 않음
+            return False
+        if self._contexts_served >= self.max_contexts_per_browser:
+            return True
+        return bool(self._launched_at) and time.time() - self._launched_at > self.max_browser_age
+
+    async def _get_browser(self):
+        async with self._browser_lock:
+            alive = self._browser is not None and self._browser.is_connected()
+            if alive and not self._needs_recycle():
+                return self._browser
+            if self._browser is not None:
+                try:
+                    await self._browser.close()
+                except Exception:
+                    pass
+            if self._playwright is None:
+                from playwright.async_api import async_playwright
+                self._playwright = await async_playwright().start()
+            with metrics.span("browser_launch", engine="async"):
+                self._browser = await self._playwright.chromium.launch(**self._launch_options())
+            self._launched_at = time.time()
+            self._contexts_served = 0
+            self._counters["launches"] += 1
+            logger.info("[ASYNC] Chromium 기동 완료")
+            return self._browser
+
+    @asynccontextmanager
+    async def context(self, **context_options):
+        """격리된 새 BrowserContext 발급 후 사용이 끝나면 닫음"""
+        with metrics.span("context", engine="async"):
+            browser = await self._get_browser()
+            ctx = await browser.new_context(**context_options)
+            self._contexts_served += 1
+        try:
+            yield ctx
+        finally:
+            try:
+                await ctx.close()
+            except Exception:
+                pass
+
+    # ── 상태 / 종료 ───────────────────────────────────────────
+    def stats(self):
+        return {
+            "running": self._thread is not None,
+            "max_concurrency": self.max_concurrency,
+            "session_deadline": self.session_deadline,
+            "active": self._active,
+            "waiting": self._waiting,
+            "browser_alive": bool(self._browser and self._browser.is_connected()),
+            "contexts_served": self._contexts_served,
+            **self._counters,
+        }
+
+    def shutdown(self, timeout=10):
+        if not self._loop:
+            return
+
+        async def close():
+            try:
+                if self._browser is not None:
+                    await self._browser.close()
+                if self._playwright is not None:
+                    await self._playwright.stop()
+            except Exception:
+                pass
+
+        try:
+            asyncio.run_coroutine_threadsafe(close(), self._loop).result(timeout)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
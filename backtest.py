@@ -0,0 +1,271 @@
+"""번호 선택 전략 백테스트 (전체 당첨번호 아카이브 대상)
+
+실행:  python backtest.py --strategy stat --tickets 1000000 --workers 8
+       python backtest.py --strategy fixed --numbers "3,11,19,27,34,42;1,7,13,22,38,45" --json out.json
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import recommender
+from lotto_match import numbers_to_mask, popcount, prize_rank
+
+logger = logging.getLogger(__name__)
+
+# ══════════════════════════════════════════════════════════════
+#  전략 백테스트 (회차 구간별 프로세스 풀 + 결과 캐시)
+# ══════════════════════════════════════════════════════════════
+# 전략이 매 회차 티켓을 고른다고 가정하고 실제 당첨번호와 45비트 마스크로 대조해 등수를 센다.
+#   random : 균등 무작위 (기준선)
+#   stat   : 그 회차 "이전"까지의 출현 빈도 가중 (미래 정보 사용 안 함)
+#   cold   : 이전까지 덜 나온 번호 가중
+#   fixed  : 같은 번호(들)를 매 회차 구매 (사용자의 고정 번호 / 구매 이력)
+# 무작위 전략은 회차당 수백만 장도 가능하도록 회차 구간(ROUNDS_PER_TASK) 단위로 나눠
+# 프로세스 풀에서 병렬 실행한다. 구간마다 SeedSequence 를 고정 분할하므로 워커 수와 무관하게 재현된다.
+
+STRATEGIES = ("random", "stat", "cold", "fixed")
+TICKET_PRICE = 1000
+# 1등은 회차별 실제 1인당 당첨금(아카이브), 2·3등은 평균 추정치, 4·5등은 고정 당첨금
+PRIZES = {2: 55_000_000, 3: 1_500_000, 4: 50_000, 5: 5_000}
+DEFAULT_FIRST_PRIZE = 2_000_000_000
+# 무작위 티켓 1장의 이론 당첨 확률 (1~5등) - C(45,6) = 8,145,060
+THEORETICAL = {1: 1 / 8145060, 2: 6 / 8145060, 3: 228 / 8145060, 4: 11115 / 8145060, 5: 182780 / 8145060}
+ROUNDS_PER_TASK = 32
+TICKET_BATCH = 250_000
+PARALLEL_MIN_TICKETS = 2_000_000  # 전체 티켓 수가 이보다 적으면 현재 프로세스에서 바로 계산
+
+
+class BacktestError(ValueError):
+    """백테스트 조건이 잘못됨"""
+
+
+def _draw_arrays(draws):
+    rounds = np.array([d['round'] for d in draws], dtype=np.int64)
+    masks = np.array([numbers_to_mask(d['numbers']) for d in draws], dtype=np.uint64)
+    bonus = np.array([1 << (d['bonus'] - 1) for d in draws], dtype=np.uint64)
+    first = np.array([(d.get('first_prize') or DEFAULT_FIRST_PRIZE) for d in draws], dtype=np.float64)
+    hits = np.zeros((len(draws), 45), dtype=np.int64)
+    if len(draws):
+        hits[np.arange(len(draws))[:, None], np.array([d['numbers'] for d in draws]) - 1] = 1
+    # 각 회차 직전까지의 누적 출현 횟수 (해당 회차 결과는 포함하지 않음)
+    prior = np.cumsum(hits, axis=0) - hits
+    return rounds, masks, bonus, first, prior
+
+
+def _log_weights(strategy, prior_freq):
+    if strategy == "random" or not prior_freq.any():
+        return None
+    return np.log(recommender.number_weights("frequency" if strategy == "stat" else "cold", prior_freq))
+
+
+def _score_rounds(task):
+    """프로세스 풀 작업 단위: 회차 구간 → 회차별 등수 분포 [R×6] (열: 미당첨, 1~5등)"""
+    strategy, draw_masks, bonus_masks, prior, tickets, seed_seq, fixed_masks = task
+    rng = np.random.default_rng(seed_seq)
+    counts = np.zeros((len(draw_masks), 6), dtype=np.int64)
+    for i in range(len(draw_masks)):
+        draw = draw_masks[i]
+        bonus = bonus_masks[i]
+        if strategy == "fixed":
+            batches = [fixed_masks]
+        else:
+            log_w = _log_weights(strategy, prior[i])
+            batches = (recommender.to_masks(recommender.sample(rng, min(TICKET_BATCH, tickets - done), log_w))
+                       for done in range(0, tickets, TICKET_BATCH))
+        for masks in batches:
+            rank = prize_rank(popcount(masks & draw), (masks & bonus) != 0)
+            counts[i] += np.bincount(rank, minlength=6)
+    return counts
+
+
+class Backtester:
+    def __init__(self, workers=None, cache_size=32):
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._pool = None
+        self._lock = threading.Lock()
+        self._counters = {"runs": 0, "cache_hits": 0, "parallel_runs": 0}
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: 브라우저/스레드를 가진 웹 프로세스를 fork 하지 않음 (워커는 NumPy 만 로드)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    @staticmethod
+    def check(strategy, tickets, seed, numbers=None):
+        """실행 전 인자 검증 → (fixed 마스크 목록 또는 None, 실제 회차당 장수)"""
+        if strategy not in STRATEGIES:
+            raise BacktestError(f"strategy 는 {', '.join(STRATEGIES)} 중 하나여야 합니다.")
+        if isinstance(seed, bool) or not isinstance(seed, (int, np.integer)) or seed < 0:
+            raise BacktestError("seed 는 0 이상의 정수여야 합니다.")
+        if strategy == "fixed":
+            fixed = sorted({numbers_to_mask(n) for n in (numbers or []) if len(set(n)) == 6})
+            if not fixed:
+                raise BacktestError("fixed 전략에는 번호 6개짜리 조합이 하나 이상 필요합니다.")
+            return fixed, len(fixed)
+        if tickets < 1:
+            raise BacktestError("회차당 티켓 수는 1 이상이어야 합니다.")
+        return None, tickets
+
+    def run(self, draws, strategy="random", tickets=10000, seed=0, numbers=None, round_from=None, round_to=None):
+        """전략 백테스트 → 결과 dict (같은 전략/조건/아카이브 구간이면 캐시 반환)"""
+        fixed, tickets = self.check(strategy, tickets, seed, numbers)
+
+        draws = sorted(draws, key=lambda d: d['round'])
+        rounds, masks, bonus, first, prior = _draw_arrays(draws)
+        sel = np.ones(len(rounds), dtype=bool)
+        if round_from is not None:
+            sel &= rounds >= round_from
+        if round_to is not None:
+            sel &= rounds <= round_to
+        if not sel.any():
+            raise BacktestError("백테스트할 회차가 없습니다.")
+        rounds, masks, bonus, first, prior = rounds[sel], masks[sel], bonus[sel], first[sel], prior[sel]
+
+        key = json.dumps([strategy, int(tickets), int(seed), fixed, int(rounds[0]), int(rounds[-1]), len(rounds)])
+        with self._lock:
+            self._counters["runs"] += 1
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self._counters["cache_hits"] += 1
+                return {**cached, "cached": True}
+
+        started = time.perf_counter()
+        fixed_arr = np.array(fixed or [], dtype=np.uint64)
+        spans = [slice(i, i + ROUNDS_PER_TASK) for i in range(0, len(rounds), ROUNDS_PER_TASK)]
+        seeds = np.random.SeedSequence(seed).spawn(len(spans))
+        tasks = [(strategy, masks[s], bonus[s], prior[s], int(tickets), seq, fixed_arr)
+                 for s, seq in zip(spans, seeds)]
+        parallel = strategy != "fixed" and tickets * len(rounds) >= PARALLEL_MIN_TICKETS and self.workers > 1
+        if parallel:
+            self._counters["parallel_runs"] += 1
+            counts = np.vstack(list(self._get_pool().map(_score_rounds, tasks)))
+        else:
+            counts = np.vstack([_score_rounds(t) for t in tasks])
+
+        result = self._summarize(strategy, tickets, seed, rounds, first, counts)
+        result["elapsed_sec"] = round(time.perf_counter() - started, 3)
+        result["parallel"] = parallel
+        logger.info(f"[BACKTEST] {strategy} 회차당 {tickets}장 × {len(rounds)}회차 "
+                    f"→ {result['elapsed_sec']}s (수익률 {result['return_rate']:.4f})")
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return {**result, "cached": False}
+
+    @staticmethod
+    def _summarize(strategy, tickets, seed, rounds, first, counts):
+        total = int(counts.sum())
+        winnings = float((counts[:, 1] * first).sum())
+        winnings += sum(float(counts[:, k].sum()) * PRIZES[k] for k in (2, 3, 4, 5))
+        cost = total * TICKET_PRICE
+        dist = {str(k): int(counts[:, k].sum()) for k in range(1, 6)}
+        return {
+            "strategy": strategy,
+            "tickets_per_round": int(tickets),
+            "seed": int(seed),
+            "rounds": len(rounds),
+            "first_round": int(rounds[0]),
+            "last_round": int(rounds[-1]),
+            "tickets": total,
+            "distribution": {"0": int(counts[:, 0].sum()), **dist},
+            "hit_rate": {k: v / total for k, v in dist.items()},
+            "theoretical_rate": {str(k): p for k, p in THEORETICAL.items()},
+            "best_rank_rounds": [int(r) for r in rounds[counts[:, 1] > 0]][:100],  # 1등이 나온 회차
+            "cost": cost,
+            "winnings": round(winnings),
+            "return_rate": winnings / cost if cost else 0.0,  # 1원당 회수액 (1.0 = 본전)
+            "expected_return_per_ticket": winnings / total - TICKET_PRICE if total else 0.0,
+        }
+
+    def stats(self):
+        with self._lock:
+            return {"workers": self.workers, "cached": len(self._cache), **self._counters}
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def parse_numbers(text):
+    """"1,2,3,4,5,6;7,8,9,10,11,12" → [[...], ...] (번호 범위/개수 검증)"""
+    games = []
+    for chunk in filter(None, (c.strip() for c in (text or "").split(";"))):
+        try:
+            nums = sorted(int(n) for n in chunk.split(","))
+        except ValueError:
+            raise BacktestError(f"번호 형식 오류: '{chunk}'")
+        if len(set(nums)) != 6 or nums[0] < 1 or nums[-1] > 45:
+            raise BacktestError(f"서로 다른 1~45 번호 6개가 필요합니다: '{chunk}'")
+        games.append(nums)
+    return games
+
+
+def main(argv=None):
+    from draw_archive import DrawArchive
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="번호 선택 전략 백테스트")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="random")
+    parser.add_argument("--tickets", type=int, default=100000, help="회차당 모의 티켓 수 (fixed 제외)")
+    parser.add_argument("--numbers", help="fixed 전략 번호: '1,2,3,4,5,6;7,8,9,10,11,12'")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--from", dest="round_from", type=int)
+    parser.add_argument("--to", dest="round_to", type=int)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--archive", default=os.environ.get('DRAW_ARCHIVE_FILE', os.path.join(here, 'draw_archive.json')))
+    parser.add_argument("--backfill", action="store_true", help="실행 전 누락 회차를 API 로 채움")
+    parser.add_argument("--json", help="결과를 JSON 파일로 저장")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', stream=sys.stdout)
+
+    archive = DrawArchive(args.archive)
+    if args.backfill:
+        archive.backfill(pause=0.2)
+    draws = archive.all()
+    if not draws:
+        parser.error(f"당첨번호 아카이브가 비어 있습니다: {args.archive} (--backfill 사용)")
+
+    backtester = Backtester(workers=args.workers)
+    try:
+        result = backtester.run(draws, args.strategy, tickets=args.tickets, seed=args.seed,
+                                numbers=parse_numbers(args.numbers), round_from=args.round_from,
+                                round_to=args.round_to)
+    except BacktestError as e:
+        parser.error(str(e))
+    finally:
+        backtester.shutdown()
+
+    print(f"\n전략 {result['strategy']}  {result['first_round']}~{result['last_round']}회 "
+          f"({result['rounds']}회차, 총 {result['tickets']:,}장, {result['elapsed_sec']}s)")
+    print(f"{'등수':>4} {'당첨':>12} {'비율':>12} {'이론':>12}")
+    for k in ("1", "2", "3", "4", "5"):
+        print(f"{k + '등':>4} {result['distribution'][k]:>12,} "
+              f"{result['hit_rate'][k]:>12.3e} {result['theoretical_rate'][k]:>12.3e}")
+    print(f"구매 {result['cost']:,}원 → 당첨 {result['winnings']:,}원 "
+          f"(회수율 {result['return_rate'] * 100:.2f}%, 장당 기대손익 {result['expected_return_per_ticket']:,.1f}원)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
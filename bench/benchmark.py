@@ -0,0 +1,132 @@
+"""구매 흐름 종단 벤치마크 (모의 사이트 대상, 오프라인)
+
+모의 사이트를 띄우고 app.automate_purchase 를 반복 실행하면서
+진행 단계(progress) 콜백 시각으로 단계별 소요 시간을 모아 백분위수를 보고한다.
+
+실행:  python bench/benchmark.py -n 20 --latency-ms 30 --jitter-ms 40 --fault buy_error=0.05
+       python bench/benchmark.py -n 10 --filter-mode strict --json result.json
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+from collections import Counter
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+from mock_dhlottery import MockServer, add_mock_arguments, config_from_args  # noqa: E402
+
+PERCENTILES = (50, 90, 95, 99)
+SAMPLE_GAMES = [[3, 11, 19, 27, 34, 42], [1, 7, 13, 22, 38, 45], [5, 9, 16, 24, 31, 40],
+                [2, 8, 17, 29, 33, 44], [6, 12, 20, 26, 37, 41]]
+
+
+def _prepare_env(base_url, args, workdir):
+    """app 임포트 전에 모의 사이트 주소와 격리된 저장 경로를 지정"""
+    os.environ.update({
+        "DHL_WWW_BASE": base_url,
+        "DHL_OL_BASE": base_url,
+        "DHL_EL_BASE": base_url,
+        "DOCKER_ENV": "1",  # headless
+        "DRAW_BACKFILL": "0",
+        "ENFORCE_SALES_WINDOW": "0",  # 판매 중지 시간대에도 측정
+        "SELFTEST": "0",  # 측정 중 백그라운드 브라우저 기동 방지
+        "HISTORY_DB": os.path.join(workdir, "history.db"),
+        "DRAW_ARCHIVE_FILE": os.path.join(workdir, "draw_archive.json"),
+        "SELECTOR_CACHE_FILE": os.path.join(workdir, "selector_cache.json"),
+        "SESSION_CACHE_DIR": os.path.join(workdir, "session_cache"),
+        "RESOURCE_FILTER_MODE": args.filter_mode,
+    })
+    for key in ("PROXY_SERVER", "PROXY_USER", "PROXY_PASS"):
+        os.environ.pop(key, None)
+
+
+def run_once(app, user_id, games, reuse_session):
+    """구매 1회 → (성공 여부, 메시지, {단계: 초}, 전체 초)"""
+    if not reuse_session:
+        app.session_cache.invalidate(user_id)
+    marks = []
+    start = time.perf_counter()
+    ok, msg, *_ = app.automate_purchase(
+        user_id, "bench-pw", games, progress=lambda step, m="": marks.append((step, time.perf_counter())))
+    end = time.perf_counter()
+    phases = {}
+    for (step, t0), (_, t1) in zip(marks, marks[1:] + [("end", end)]):
+        phases[step] = phases.get(step, 0.0) + (t1 - t0)
+    return ok, msg, phases, end - start
+
+
+def summarize(samples):
+    """{단계: [초...]} → {단계: {n, mean, p50...}} (ms)"""
+    report = {}
+    for phase, values in samples.items():
+        arr = np.asarray(values) * 1000
+        row = {"n": len(arr), "mean": float(arr.mean()), "max": float(arr.max())}
+        row.update({f"p{p}": float(np.percentile(arr, p)) for p in PERCENTILES})
+        report[phase] = row
+    return report
+
+
+def print_report(report, outcomes, elapsed):
+    cols = ["n", "mean"] + [f"p{p}" for p in PERCENTILES] + ["max"]
+    print(f"\n{'phase':<12}" + "".join(f"{c:>10}" for c in cols))
+    for phase, row in report.items():
+        print(f"{phase:<12}" + "".join(
+            f"{row[c]:>10d}" if c == "n" else f"{row[c]:>10.1f}" for c in cols))
+    total = sum(outcomes.values())
+    print(f"\n총 {total}회 / {elapsed:.1f}s  (단위 ms)")
+    for msg, count in outcomes.most_common():
+        print(f"  {count:>4}  {msg}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="구매 흐름 단계별 지연 벤치마크")
+    parser.add_argument("-n", "--iterations", type=int, default=10)
+    parser.add_argument("--games", type=int, default=1, choices=range(1, 6))
+    parser.add_argument("--warmup", type=int, default=1, help="집계에서 제외할 초기 실행 수")
+    parser.add_argument("--reuse-session", action="store_true", help="세션 캐시 사용 (로그인 생략 경로 측정)")
+    parser.add_argument("--filter-mode", default="off", choices=["off", "lite", "strict"])
+    parser.add_argument("--json", metavar="PATH", help="결과를 JSON 파일로 저장")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockServer(config_from_args(args)).start()
+    workdir = tempfile.mkdtemp(prefix="lotto-bench-")
+    _prepare_env(server.base_url, args, workdir)
+    import app  # 환경 변수 적용 후 임포트
+
+    games = SAMPLE_GAMES[:args.games]
+    samples, outcomes = {}, Counter()
+    started = time.perf_counter()
+    try:
+        for i in range(args.warmup + args.iterations):
+            ok, msg, phases, total = run_once(app, "bench-user", games, args.reuse_session)
+            measured = i >= args.warmup
+            print(f"[{'run' if measured else 'warmup'} {i + 1}] {'OK ' if ok else 'FAIL'} {total * 1000:8.1f}ms  {msg}")
+            if not measured:
+                continue
+            outcomes["성공" if ok else msg] += 1
+            for phase, sec in phases.items():
+                samples.setdefault(phase, []).append(sec)
+            samples.setdefault("total", []).append(total)
+    finally:
+        app.browser_pool.shutdown()
+        server.stop()
+    elapsed = time.perf_counter() - started
+
+    report = summarize(samples)
+    print_report(report, outcomes, elapsed)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "phases": report, "outcomes": dict(outcomes),
+                       "mock_requests": server.counters(),
+                       "resource_filter": app.resource_filter.stats()}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""동행복권 구매 흐름 모의 사이트 (오프라인 벤치마크/회귀 확인용)
+
+app.py 가 의존하는 구조만 재현한다.
+  - 로그인 폼 (#inpUserId, #inpUserPswdEncn, #btnLogin) + 간소화 페이지 안내
+  - 메인 페이지 회차 표기 ("제 N회", 추첨일), 마이페이지 세션 확인
+  - TotalGame.jsp 의 ifrm_lotto645 / ifrm_tab iframe, 진입 안내 팝업
+  - 마킹판 check645num1..45 + check645 / selectWayTab / resetNumber645
+  - '확인'(#btnSelectNum) → 구매 목록, '구매하기'(#btnBuy) → 구매확인 팝업 → execBuy.do → 구매내역 팝업
+
+실행:  python bench/mock_dhlottery.py --port 8765 --latency-ms 50 --fault buy_error=0.1
+앱 연결: DHL_WWW_BASE=DHL_OL_BASE=DHL_EL_BASE=http://127.0.0.1:8765
+"""
+import os
+import sys
+import json
+import time
+import random
+import secrets
+import argparse
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import draw_calendar  # noqa: E402
+
+# 확률(0~1)로 주입하는 장애 종류
+FAULTS = {
+    "login_reject": "로그인 시 아이디/비밀번호 불일치 응답",
+    "interstitial": "로그인 직후 간소화 페이지 안내 표시",
+    "low_deposit": "번호 선택 '확인' 시 예치금 부족 경고",
+    "sales_closed": "'구매하기' 시 판매 마감 경고",
+    "buy_click_lost": "첫 '구매하기' 클릭에 구매확인 팝업이 뜨지 않음 (단계 재시도 확인용)",
+    "buy_error": "execBuy 가 실패 resultCode 반환",
+    "buy_500": "execBuy 가 HTTP 500 반환",
+    "buy_hang": "execBuy 응답을 --hang-sec 동안 지연",
+}
+
+
+class MockConfig:
+    def __init__(self, latency_ms=0, jitter_ms=0, buy_latency_ms=200, ui_delay_ms=100,
+                 board_delay_ms=300, hang_sec=60, board_frame="ifrm_tab", faults=None, seed=None):
+        self.latency_ms = latency_ms          # 모든 응답에 더하는 기본 지연
+        self.jitter_ms = jitter_ms            # 0~jitter 균등 분포 추가 지연
+        self.buy_latency_ms = buy_latency_ms  # execBuy 처리 시간
+        self.ui_delay_ms = ui_delay_ms        # 선택 반영/팝업 표시까지 걸리는 화면 처리 시간
+        self.board_delay_ms = board_delay_ms  # 마킹판 스크립트(check645) 로드 지연
+        self.hang_sec = hang_sec
+        self.board_frame = board_frame        # 마킹판이 들어갈 iframe 이름
+        self.faults = dict(faults or {})
+        self.rng = random.Random(seed)
+
+    def hit(self, fault):
+        return self.rng.random() < self.faults.get(fault, 0.0)
+
+
+# ══════════════════════════════════════════════════════════════
+#  페이지
+# ══════════════════════════════════════════════════════════════
+PAGE = """<!DOCTYPE html><html lang="ko"><head><meta charset="utf-8"><title>동행복권</title>
+<style>body{{font-family:sans-serif;margin:0}} .layer{{position:absolute;top:80px;left:120px;
+background:#fff;border:2px solid #333;padding:20px;z-index:10}}</style></head><body>{body}</body></html>"""
+
+
+def _header(logged_in):
+    if logged_in:
+        return ('<div id="gnb"><span>테스트 님</span> <a class="btn_logout" href="/logout">로그아웃</a></div>')
+    return '<div id="gnb"><a href="/login">로그인</a></div>'
+
+
+def page_main(logged_in):
+    round_no = draw_calendar.sales_round()
+    date = draw_calendar.draw_date(round_no).strftime("%Y.%m.%d")
+    return PAGE.format(body=f"""{_header(logged_in)}
+<div class="content"><h2>로또 6/45 제 {round_no}회</h2><p>추첨일 {date}</p>
+<a href="/game/TotalGame.jsp?LottoId=LO40">구매하기</a></div>""")
+
+
+def page_login(message=""):
+    msg = f'<p class="login_fail">{message}</p>' if message else ""
+    return PAGE.format(body=f"""{_header(False)}
+<form name="loginForm" method="post" action="/loginProc">
+  <input type="text" id="inpUserId" name="userId" placeholder="아이디">
+  <input type="password" id="inpUserPswdEncn" name="password" placeholder="비밀번호">
+  <a href="javascript:void(0)" id="btnLogin" onclick="document.loginForm.submit()">로그인</a>
+</form>{msg}""")
+
+
+def page_interstitial():
+    return PAGE.format(body="""<div class="simple"><p>현재 간소화 페이지 운영 중입니다.</p>
+<a href="/common.do?method=main">동행복권통합포탈이동</a></div>""")
+
+
+def page_total_game(board_frame):
+    other = "ifrm_lotto645" if board_frame == "ifrm_tab" else "ifrm_tab"
+    return PAGE.format(body=f"""{_header(True)}
+<iframe name="{other}" id="{other}" src="/game/notice.jsp" width="300" height="200"></iframe>
+<iframe name="{board_frame}" id="{board_frame}" src="/olotto/game/game645.do" width="1000" height="760"></iframe>""")
+
+
+def page_notice():
+    return PAGE.format(body="<p>로또 6/45 구매 안내</p>")
+
+
+BOARD_SCRIPT = """
+const CFG = %(cfg)s;
+let slip = [];
+function box(n) { return document.getElementById('check645num' + n); }
+function selected() { const a = []; for (let n = 1; n <= 45; n++) if (box(n).checked) a.push(n); return a; }
+function limit645(cb) {
+  if (cb.checked && selected().length > 6) { cb.checked = false; alert('번호는 6개까지 선택할 수 있습니다.'); }
+}
+function selectWayTab(i) {
+  document.getElementById('tabManual').style.display = i === 0 ? 'block' : 'none';
+}
+function resetNumber645() { for (let n = 1; n <= 45; n++) box(n).checked = false; }
+function renderSlip() {
+  document.getElementById('slipList').innerHTML =
+    slip.map((g, i) => '<li>' + 'ABCDE'[i] + ' 수동 ' + g.join(' ') + '</li>').join('');
+}
+function selectNum() {
+  const nums = selected();
+  if (nums.length !== 6) { alert('번호 6개를 선택하세요.'); return; }
+  if (slip.length >= 5) { alert('한 장에 5게임까지 구매할 수 있습니다.'); return; }
+  if (CFG.low_deposit) { alert('예치금이 부족합니다. 충전 후 이용하세요.'); return; }
+  setTimeout(() => { slip.push(nums); renderSlip(); resetNumber645(); }, CFG.ui_delay_ms);
+}
+function buyLotto() {
+  if (!slip.length) { alert('구매할 번호를 선택하세요.'); return; }
+  if (CFG.sales_closed) { alert('판매 마감 시간입니다.'); return; }
+  if (CFG.buy_click_lost) { CFG.buy_click_lost = false; return; }
+  setTimeout(() => { document.getElementById('popupLayerConfirm').style.display = 'block'; }, CFG.ui_delay_ms);
+}
+function closeConfirm() { document.getElementById('popupLayerConfirm').style.display = 'none'; }
+function execBuy() {
+  closeConfirm();
+  fetch('/olotto/game/execBuy.do', {
+    method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({games: slip})
+  }).then(r => r.json()).then(data => {
+    if (data.result.resultCode !== '100') { alert(data.result.resultMsg); return; }
+    document.getElementById('receiptList').innerHTML = slip.map(g => '<li>' + g.join(' ') + '</li>').join('');
+    document.getElementById('popReceipt').style.display = 'block';
+  }).catch(() => alert('구매 처리 중 오류가 발생했습니다.'));
+}
+function closeReceipt() { document.getElementById('popReceipt').style.display = 'none'; slip = []; renderSlip(); }
+"""
+
+
+def page_board(cfg):
+    boxes = "".join(
+        f'<span><input type="checkbox" id="check645num{n}" onclick="limit645(this)">'
+        f'<label for="check645num{n}">{n}</label></span>'
+        + ("<br>" if n % 7 == 0 else "")
+        for n in range(1, 46)
+    )
+    client_cfg = json.dumps({
+        "ui_delay_ms": cfg.ui_delay_ms,
+        "low_deposit": cfg.hit("low_deposit"),
+        "sales_closed": cfg.hit("sales_closed"),
+        "buy_click_lost": cfg.hit("buy_click_lost"),
+    })
+    # 마킹판 스크립트는 board_delay_ms 뒤에 로드 (JS_BOARD_READY 대기 측정용)
+    script = BOARD_SCRIPT % {"cfg": client_cfg}
+    return PAGE.format(body=f"""
+<div id="popupLayerAlert" class="layer"><p>구매 전 유의사항을 확인하세요.</p>
+  <input type="button" value="닫기" onclick="this.parentNode.style.display='none'"></div>
+<div id="tabManual">{boxes}
+  <div><input type="button" id="btnSelectNum" value="확인" onclick="selectNum()"></div></div>
+<ul id="slipList"></ul>
+<input type="button" id="btnBuy" value="구매하기" onclick="buyLotto()">
+<div id="popupLayerConfirm" class="layer" style="display:none"><p>구매하시겠습니까?</p>
+  <span class="btn_confirm"><input type="button" value="확인" onclick="execBuy()"></span>
+  <input type="button" value="취소" onclick="closeConfirm()"></div>
+<div id="popReceipt" class="layer" style="display:none"><p>구매내역</p><ul id="receiptList"></ul>
+  <div class="btn_popup_buy_confirm"><input type="button" value="확인" onclick="closeReceipt()"></div></div>
+<script>
+setTimeout(() => {{ const s = document.createElement('script');
+  s.textContent = {json.dumps(script)}; document.body.appendChild(s); }}, {cfg.board_delay_ms});
+</script>""")
+
+
+# ══════════════════════════════════════════════════════════════
+#  서버
+# ══════════════════════════════════════════════════════════════
+class MockHandler(BaseHTTPRequestHandler):
+    server_version = "MockDhlottery/1.0"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    @property
+    def cfg(self):
+        return self.server.cfg
+
+    def _session(self):
+        cookie = self.headers.get("Cookie", "")
+        for part in cookie.split(";"):
+            k, _, v = part.strip().partition("=")
+            if k == "JSESSIONID" and v in self.server.sessions:
+                return v
+        return None
+
+    def _delay(self):
+        ms = self.cfg.latency_ms + self.cfg.rng.uniform(0, self.cfg.jitter_ms)
+        if ms > 0:
+            time.sleep(ms / 1000)
+
+    def _send(self, status, body, content_type="text/html; charset=utf-8", headers=None):
+        data = body.encode("utf-8") if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _redirect(self, location, headers=None):
+        self._send(302, "", headers={"Location": location, **(headers or {})})
+
+    def _count(self, key):
+        with self.server.lock:
+            self.server.counters[key] = self.server.counters.get(key, 0) + 1
+
+    def do_GET(self):
+        self._delay()
+        url = urlparse(self.path)
+        qs = parse_qs(url.query)
+        logged_in = self._session() is not None
+        self._count("GET " + url.path)
+
+        if url.path == "/" or (url.path == "/common.do" and qs.get("method") == ["main"]):
+            return self._send(200, page_main(logged_in))
+        if url.path == "/login":
+            return self._send(200, page_login())
+        if url.path == "/logout":
+            self.server.sessions.discard(self._session())
+            return self._redirect("/")
+        if url.path == "/userSsl.do":
+            return self._send(200, page_main(True)) if logged_in else self._redirect("/login")
+        if url.path == "/simple.do":
+            return self._send(200, page_interstitial())
+        if url.path == "/__mock__/stats":
+            with self.server.lock:
+                return self._send(200, json.dumps(self.server.counters), "application/json")
+        if not logged_in and url.path in ("/game/TotalGame.jsp", "/olotto/game/game645.do"):
+            return self._redirect("/login")
+        if url.path == "/game/TotalGame.jsp":
+            return self._send(200, page_total_game(self.cfg.board_frame))
+        if url.path == "/game/notice.jsp":
+            return self._send(200, page_notice())
+        if url.path == "/olotto/game/game645.do":
+            return self._send(200, page_board(self.cfg))
+        self._send(404, "not found", "text/plain")
+
+    def do_POST(self):
+        self._delay()
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode("utf-8") if length else ""
+        self._count("POST " + url.path)
+
+        if url.path == "/loginProc":
+            form = parse_qs(raw)
+            if not form.get("userId") or not form.get("password") or self.cfg.hit("login_reject"):
+                return self._send(200, page_login("아이디 또는 비밀번호가 일치하지 않습니다."))
+            token = secrets.token_hex(16)
+            self.server.sessions.add(token)
+            target = "/simple.do" if self.cfg.hit("interstitial") else "/common.do?method=main"
+            return self._redirect(target, {"Set-Cookie": f"JSESSIONID={token}; Path=/; HttpOnly"})
+
+        if url.path == "/olotto/game/execBuy.do":
+            if self._session() is None:
+                return self._send(200, json.dumps({"result": {"resultCode": "-1", "resultMsg": "로그인 후 이용하세요."}}),
+                                  "application/json")
+            time.sleep(self.cfg.buy_latency_ms / 1000)
+            if self.cfg.hit("buy_hang"):
+                self._count("fault buy_hang")
+                time.sleep(self.cfg.hang_sec)
+            if self.cfg.hit("buy_500"):
+                self._count("fault buy_500")
+                return self._send(500, "Internal Server Error", "text/plain")
+            if self.cfg.hit("buy_error"):
+                self._count("fault buy_error")
+                result = {"resultCode": "-7", "resultMsg": "일시적인 오류로 구매하지 못했습니다."}
+            else:
+                games = json.loads(raw or "{}").get("games", [])
+                result = {"resultCode": "100", "resultMsg": "SUCCESS", "buyRound": str(
+                    draw_calendar.sales_round()), "arrGameChoiceNum": games,
+                    "issueDay": datetime.now().strftime("%Y/%m/%d")}
+            return self._send(200, json.dumps({"result": result}, ensure_ascii=False), "application/json")
+        self._send(404, "not found", "text/plain")
+
+
+class MockServer:
+    """백그라운드 스레드에서 모의 사이트 실행 (port=0 이면 임의 포트)"""
+    def __init__(self, cfg=None, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), MockHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.cfg = cfg or MockConfig()
+        self.httpd.sessions = set()
+        self.httpd.counters = {}
+        self.httpd.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-dhlottery", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def counters(self):
+        with self.httpd.lock:
+            return dict(self.httpd.counters)
+
+
+def parse_faults(items):
+    """['buy_error=0.1', ...] → {'buy_error': 0.1}"""
+    faults = {}
+    for item in items or []:
+        name, _, prob = item.partition("=")
+        if name not in FAULTS:
+            raise argparse.ArgumentTypeError(f"알 수 없는 장애 '{name}' (가능: {', '.join(FAULTS)})")
+        faults[name] = float(prob or 1.0)
+    return faults
+
+
+def add_mock_arguments(parser):
+    g = parser.add_argument_group("모의 사이트")
+    g.add_argument("--latency-ms", type=float, default=0)
+    g.add_argument("--jitter-ms", type=float, default=0)
+    g.add_argument("--buy-latency-ms", type=float, default=200)
+    g.add_argument("--ui-delay-ms", type=int, default=100)
+    g.add_argument("--board-delay-ms", type=int, default=300)
+    g.add_argument("--hang-sec", type=float, default=60)
+    g.add_argument("--board-frame", choices=["ifrm_tab", "ifrm_lotto645"], default="ifrm_tab")
+    g.add_argument("--fault", action="append", metavar="NAME=PROB",
+                   help="장애 주입 (" + ", ".join(FAULTS) + ")")
+    g.add_argument("--seed", type=int)
+    return parser
+
+
+def config_from_args(args):
+    return MockConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, buy_latency_ms=args.buy_latency_ms,
+        ui_delay_ms=args.ui_delay_ms, board_delay_ms=args.board_delay_ms, hang_sec=args.hang_sec,
+        board_frame=args.board_frame, faults=parse_faults(args.fault), seed=args.seed,
+    )
+
+
+def main():
+    parser = add_mock_arguments(argparse.ArgumentParser(description="동행복권 모의 사이트"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    server = MockServer(config_from_args(args), args.host, args.port)
+    print(f"모의 사이트 실행 중: {server.base_url}  (Ctrl+C 종료)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# ══════════════════════════════════════════════════════════════
+#  Chromium 상시 대기(warm) 풀
+# ══════════════════════════════════════════════════════════════
+# Playwright sync API 객체는 자신을 만든 스레드에서만 사용할 수 있으므로
+# 브라우저는 "스레드별 슬롯"에 하나씩 띄워 두고 재사용한다.
+# 요청마다 비용은 "새 브라우저"가 아니라 "새 컨텍스트" 수준으로 줄어든다.
+
+class _BrowserSlot:
+    def __init__(self, thread_name):
+        self.thread_name = thread_name
+        self.playwright = None
+        self.browser = None
+        self.launched_at = None
+        self.contexts_served = 0
+        self.active_contexts = 0
+
+    def is_alive(self):
+        try:
+            return self.browser is not None and self.browser.is_connected()
+        except Exception:
+            return False
+
+
+class BrowserPool:
+    """스레드별 Chromium 인스턴스를 유지하고 요청마다 격리된 컨텍스트를 발급"""
+
+    def __init__(self, launch_options, max_contexts_per_browser=50, max_browser_age=3600):
+        # launch_options: chromium.launch()에 넘길 kwargs를 돌려주는 callable
+        self._launch_options = launch_options
+        self.max_contexts_per_browser = max_contexts_per_browser
+        self.max_browser_age = max_browser_age
+        self._local = threading.local()
+        self._slots = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            "launches": 0,        # 최초 기동 포함 전체 브라우저 실행 횟수
+            "relaunches": 0,      # 크래시/노후화로 인한 재기동 횟수
+            "health_failures": 0, # 헬스체크 실패(연결 끊김) 감지 횟수
+            "contexts_created": 0,
+            "browser_reuses": 0,  # 이미 떠 있는 브라우저로 컨텍스트를 발급한 횟수
+        }
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._counters[key] += n
+
+    def _get_slot(self):
+        slot = getattr(self._local, 'slot', None)
+        if slot is None:
+            slot = _BrowserSlot(threading.current_thread().name)
+            self._local.slot = slot
+            with self._lock:
+                self._slots[threading.get_ident()] = slot
+        return slot
+
+    def _launch(self, slot):
+        if slot.playwright is None:
+            from playwright.sync_api import sync_playwright
+            slot.playwright = sync_playwright().start()
+        started = time.time()
+        with metrics.span("browser_launch", thread=slot.thread_name):
+            slot.browser = slot.playwright.chromium.launch(**self._launch_options())
+        slot.launched_at = time.time()
+        slot.contexts_served = 0
+        self._count("launches")
+        logger.info(f"[POOL] Chromium 기동 완료 ({slot.thread_name}, {slot.launched_at - started:.1f}s)")
+
+    def _close_browser(self, slot):
+        try:
+            if slot.browser is not None:
+                slot.browser.close()
+        except Exception:
+            pass
+        slot.browser = None
+
+    def _needs_recycle(self, slot):
+        if slot.active_contexts > 0:
+            return False
+        if slot.contexts_served >= self.max_contexts_per_browser:
+            return True
+        return bool(slot.launched_at) and time.time() - slot.launched_at > self.max_browser_age
+
+    def _acquire_browser(self):
+        slot = self._get_slot()
+        if slot.browser is None:
+            self._launch(slot)
+        elif not slot.is_alive():
+            logger.warning(f"[POOL] 브라우저 연결 끊김 감지 → 재기동 ({slot.thread_name})")
+            self._count("health_failures")
+            self._count("relaunches")
+            self._close_browser(slot)
+            self._launch(slot)
+        elif self._needs_recycle(slot):
+            logger.info(f"[POOL] 브라우저 교체 주기 도달 → 재기동 ({slot.thread_name})")
+            self._count("relaunches")
+            self._close_browser(slot)
+            self._launch(slot)
+        else:
+            self._count("browser_reuses")
+        return slot
+
+    @contextmanager
+    def context(self, **context_options):
+        """격리된 새 BrowserContext를 발급하고 사용 후 닫는다"""
+        with metrics.span("context") as span:
+            slot = self._acquire_browser()
+            try:
+                ctx = slot.browser.new_context(**context_options)
+            except Exception as e:
+                # 헬스체크 직후 죽은 경우: 한 번만 재기동 후 재시도
+                logger.warning(f"[POOL] 컨텍스트 생성 실패 → 재기동 후 재시도: {e}")
+                span.incr("retries")
+                self._count("health_failures")
+                self._count("relaunches")
+                self._close_browser(slot)
+                self._launch(slot)
+                ctx = slot.browser.new_context(**context_options)
+            span.set(browser_contexts_served=slot.contexts_served)
+
+        slot.contexts_served += 1
+        slot.active_contexts += 1
+        self._count("contexts_created")
+        try:
+            yield ctx
+        finally:
+            slot.active_contexts -= 1
+            try:
+                ctx.close()
+            except Exception:
+                pass
+
+    def stats(self):
+        with self._lock:
+            slots = list(self._slots.values())
+            counters = dict(self._counters)
+        now = time.time()
+        browsers = [{
+            "thread": s.thread_name,
+            "alive": s.is_alive(),
+            "age_sec": round(now - s.launched_at, 1) if s.launched_at else None,
+            "contexts_served": s.contexts_served,
+            "active_contexts": s.active_contexts,
+        } for s in slots if s.browser is not None]
+        return {
+            "size": sum(1 for b in browsers if b["alive"]),
+            "max_contexts_per_browser": self.max_contexts_per_browser,
+            "max_browser_age": self.max_browser_age,
+            "browsers": browsers,
+            **counters,
+        }
+
+    def shutdown(self):
+        """프로세스 종료 시 정리 (다른 스레드 소유 객체는 best-effort)"""
+        with self._lock:
+            slots = list(self._slots.values())
+            self._slots.clear()
+        for slot in slots:
+            self._close_browser(slot)
+            try:
+                if slot.playwright is not None:
+                    slot.playwright.stop()
+            except Exception:
+                pass
+            slot.playwright = None
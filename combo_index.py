@@ -0,0 +1,277 @@
+import os
+import re
+import logging
+import threading
+from math import comb
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ══════════════════════════════════════════════════════════════
+#  6/45 전체 조합 색인 (조합 번호 체계 + 메모리 매핑 배열)
+# ══════════════════════════════════════════════════════════════
+# 오름차순 번호 c1<…<c6 (0 기준) → rank = Σ C(c_i, i)  (i = 1…6)
+# 8,145,060 개 조합이 0…TOTAL-1 의 빈틈없는 정수에 1:1 대응하므로 배열 첨자로 바로 쓸 수 있다.
+#   winners.bits        : 역대 1등 조합 비트셋 (TOTAL 비트 ≈ 1MB)
+#   picks-<회차>.bits   : 회차별 '한 번 이상 선택됨' 비트셋 (≈ 1MB), 최근 KEEP_ROUNDS 개만 보관
+#   picks-<회차>.cnt    : 2번 이상 선택된 조합만 (조합 번호, 선택 수) int64 쌍 - 회차당 수백 건 수준
+#   → 디스크 사용량은 1MB + KEEP_ROUNDS × 1MB (기본 3회차 ≈ 4MB)
+# 비트셋은 np.memmap 으로 열어 필요한 페이지만 메모리에 올라오며, 조회/갱신은 첨자 접근 O(1)
+# (2번 이상 선택된 조합의 선택 수는 메모리 dict 로 O(1)).
+
+TOTAL = comb(45, 6)  # 8,145,060
+KEEP_ROUNDS = 3
+COUNT_MAX = 255
+WINNERS_FILE = "winners.bits"
+BITSET_SIZE = (TOTAL + 7) // 8
+PICKS_FILE = re.compile(r"^picks-(.*)\.(bits|cnt|u8)$")  # u8: 이전 형식 (회차당 7.8MB 카운터) - 정리 대상
+
+# BINOM[n, k] = C(n, k)  (n = 0…45, k = 0…6)
+BINOM = np.array([[comb(n, k) for k in range(7)] for n in range(46)], dtype=np.int64)
+_BITS = np.arange(45, dtype=np.uint64)
+
+
+def rank_many(combos):
+    """(N×6) 번호 배열(1~45, 순서 무관) → 조합 번호 배열 (int64)"""
+    c = np.sort(np.asarray(combos, dtype=np.int64).reshape(-1, 6), axis=1) - 1
+    return BINOM[c, np.arange(1, 7)].sum(axis=1)
+
+
+def rank(numbers):
+    nums = sorted(int(n) for n in numbers)
+    if len(set(nums)) != 6 or nums[0] < 1 or nums[-1] > 45:
+        raise ValueError("서로 다른 1~45 번호 6개가 필요합니다.")
+    return int(rank_many([nums])[0])
+
+
+def unrank_many(ranks):
+    """조합 번호 배열 → (N×6) 오름차순 번호 배열 (탐욕적 역변환, 자리마다 searchsorted)"""
+    r = np.asarray(ranks, dtype=np.int64).copy()
+    if r.size and (r.min() < 0 or r.max() >= TOTAL):
+        raise ValueError(f"조합 번호는 0~{TOTAL - 1} 사이여야 합니다.")
+    out = np.empty((len(r), 6), dtype=np.int64)
+    for k in range(6, 0, -1):
+        # C(c, k) <= r 인 가장 큰 c  (C(·, k) 는 c 에 대해 단조 증가)
+        c = np.searchsorted(BINOM[:, k], r, side="right") - 1
+        out[:, k - 1] = c + 1
+        r -= BINOM[c, k]
+    return out
+
+
+def unrank(value):
+    return unrank_many([value])[0].tolist()
+
+
+def masks_to_combos(masks):
+    """45비트 마스크 배열 → (N×6) 번호 배열 (번호가 정확히 6개인 마스크만 허용)"""
+    masks = np.asarray(masks, dtype=np.uint64)
+    bits = (masks[:, None] >> _BITS) & np.uint64(1)
+    rows, cols = np.nonzero(bits)
+    if len(rows) != 6 * len(masks):
+        raise ValueError("번호 6개짜리 마스크가 아닙니다.")
+    return (cols.reshape(-1, 6) + 1).astype(np.int64)
+
+
+class ComboIndex:
+    def __init__(self, directory, keep_rounds=KEEP_ROUNDS):
+        self.directory = directory
+        self.keep_rounds = keep_rounds
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._winners = self._open(os.path.join(directory, WINNERS_FILE), BITSET_SIZE)[0]
+        self._winner_rounds = {}  # 조합 번호 → [회차] (1등 조합은 회차 수만큼만 존재)
+        self._picks = {}          # 회차 → (선택 비트셋 memmap, {조합 번호: 2 이상 선택 수})
+
+    @staticmethod
+    def _open(path, size):
+        """고정 크기 0 초기화 파일을 memmap 으로 엶 → (배열, 새로 만들었는지)"""
+        created = not os.path.exists(path) or os.path.getsize(path) != size
+        if created:
+            with open(path, "wb") as f:
+                f.truncate(size)
+        return np.memmap(path, dtype=np.uint8, mode="r+", shape=(size,)), created
+
+    # ── 역대 1등 ──────────────────────────────────────────────
+    def sync_winners(self, draws):
+        """아카이브 결과로 1등 비트셋 갱신 (이미 켜진 비트는 그대로) → 새로 켠 수"""
+        if not draws:
+            return 0
+        ranks = rank_many([d['numbers'] for d in draws])
+        with self._lock:
+            before = self._winners[ranks >> 3] & (1 << (ranks & 7)).astype(np.uint8)
+            np.bitwise_or.at(self._winners, ranks >> 3, (1 << (ranks & 7)).astype(np.uint8))
+            self._winners.flush()
+            rounds = {}
+            for r, d in zip(ranks.tolist(), draws):
+                rounds.setdefault(r, []).append(d['round'])
+            self._winner_rounds = rounds
+        return int(np.unique(ranks[before == 0]).size)
+
+    def has_won(self, ranks):
+        ranks = np.asarray(ranks, dtype=np.int64)
+        return (self._winners[ranks >> 3] >> (ranks & 7).astype(np.uint8)) & 1 == 1
+
+    def won_rounds(self, value):
+        return list(self._winner_rounds.get(int(value), []))
+
+    # ── 회차별 선택 수 ────────────────────────────────────────
+    @staticmethod
+    def _check_round(round_no):
+        if isinstance(round_no, bool) or not isinstance(round_no, (int, np.integer)) or round_no < 1:
+            raise ValueError("회차는 1 이상의 정수여야 합니다.")
+
+    def _path(self, round_no, ext):
+        return os.path.join(self.directory, f"picks-{round_no}.{ext}")
+
+    def _round(self, round_no, create=False):
+        """회차 선택 현황 (비트셋, 다중 선택 수) - 색인이 없으면 create 일 때만 새로 만들고 아니면 None
+        (호출 측에서 self._lock 보유)"""
+        self._check_round(round_no)
+        picks = self._picks.get(round_no)
+        if picks is None:
+            path = self._path(round_no, "bits")
+            if not create and not os.path.exists(path):
+                return None
+            bits, created = self._open(path, BITSET_SIZE)
+            multi = {}
+            if created:
+                self._save_multi(round_no, multi)  # 남아 있던 .cnt 가 새 비트셋과 섞이지 않게 비움
+            elif os.path.exists(self._path(round_no, "cnt")):
+                pairs = np.fromfile(self._path(round_no, "cnt"), dtype=np.int64).reshape(-1, 2)
+                multi = dict(zip(pairs[:, 0].tolist(), pairs[:, 1].tolist()))
+            picks = self._picks[round_no] = (bits, multi)
+            if created:
+                self._prune(round_no)
+        return picks
+
+    def _save_multi(self, round_no, multi):
+        path = self._path(round_no, "cnt")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        np.array(sorted(multi.items()), dtype=np.int64).reshape(-1, 2).tofile(tmp)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _get_counts(picks, ranks):
+        bits, multi = picks
+        counts = ((bits[ranks >> 3] >> (ranks & 7).astype(np.uint8)) & 1).astype(np.uint8)
+        if multi:
+            for i in np.flatnonzero(counts):
+                counts[i] = multi.get(int(ranks[i]), 1)
+        return counts
+
+    def _set_counts(self, round_no, picks, ranks, counts):
+        """고유 조합 번호별 선택 수를 그대로 기록 (0 이면 비트 해제)"""
+        bits, multi = picks
+        byte, bit = ranks >> 3, (1 << (ranks & 7)).astype(np.uint8)
+        on = counts > 0
+        np.bitwise_or.at(bits, byte[on], bit[on])
+        np.bitwise_and.at(bits, byte[~on], ~bit[~on])
+        bits.flush()
+        before = dict(multi)
+        for r, n in zip(ranks.tolist(), counts.tolist()):
+            if n >= 2:
+                multi[r] = n
+            else:
+                multi.pop(r, None)
+        if multi != before:
+            self._save_multi(round_no, multi)
+
+    @staticmethod
+    def _file_round(name):
+        """picks-<회차>.bits|cnt → 회차 (정상 이름이 아니거나 이전 형식이면 None)"""
+        m = PICKS_FILE.match(name)
+        if not m or m.group(2) == "u8" or not m.group(1).isdigit() or int(m.group(1)) < 1 \
+                or name != f"picks-{int(m.group(1))}.{m.group(2)}":
+            return None
+        return int(m.group(1))
+
+    def _prune(self, newest):
+        """최근 keep_rounds 개 회차(+ 방금 연 회차) 파일만 남기고 나머지 picks-* 는 모두 삭제
+        (음수/0/앞자리 0 처럼 회차로 해석되지 않는 이름, 이전 형식 .u8 포함)"""
+        names = [n for n in os.listdir(self.directory) if PICKS_FILE.match(n)]
+        rounds = sorted({r for r in map(self._file_round, names) if r is not None})
+        keep = set(rounds[-self.keep_rounds:]) | {newest}
+        for name in names:
+            round_no = self._file_round(name)
+            if round_no in keep:
+                continue
+            self._picks.pop(round_no, None)
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def has_round(self, round_no):
+        self._check_round(round_no)
+        with self._lock:
+            return round_no in self._picks or os.path.exists(self._path(round_no, "bits"))
+
+    def record_picks(self, round_no, ranks, delta=1, create=True):
+        """회차 선택 수 증감 (255 포화, 0 미만 없음) - create=False 면 색인 없는 회차는 건너뜀"""
+        ranks = np.asarray(ranks, dtype=np.int64)
+        with self._lock:
+            picks = self._round(round_no, create=create)
+            if picks is None:
+                return False
+            uniq, n = np.unique(ranks, return_counts=True)  # 같은 조합이 여러 번 들어와도 한 번에 합산
+            counts = np.clip(self._get_counts(picks, uniq).astype(np.int64) + delta * n, 0, COUNT_MAX)
+            self._set_counts(round_no, picks, uniq, counts)
+            return True
+
+    def rebuild_round(self, round_no, ranks):
+        """회차 선택 수를 주어진 조합 목록으로 다시 만듦 (이력 삭제/최초 생성 시)"""
+        ranks = np.asarray(ranks, dtype=np.int64)
+        with self._lock:
+            bits, multi = picks = self._round(round_no, create=True)
+            bits[:] = 0
+            multi.clear()
+            self._save_multi(round_no, multi)
+            uniq, n = np.unique(ranks, return_counts=True)
+            self._set_counts(round_no, picks, uniq, np.minimum(n, COUNT_MAX))
+
+    def pick_counts(self, round_no, ranks):
+        """회차 선택 수 (색인이 없는 회차는 모두 0, 파일을 만들지 않음)"""
+        ranks = np.atleast_1d(np.asarray(ranks, dtype=np.int64))
+        with self._lock:
+            picks = self._round(round_no)
+            if picks is None:
+                return np.zeros(len(ranks), dtype=np.uint8)
+            return self._get_counts(picks, ranks)
+
+    def sample_unpicked(self, round_no, count, seed=None, exclude_winners=True):
+        """회차에서 아무도 고르지 않은 조합 무작위 count 개 (후보 추출 후 첨자 확인)"""
+        rng = np.random.default_rng(seed)
+        found = np.zeros(0, dtype=np.int64)
+        for _ in range(8):
+            cand = np.unique(rng.integers(0, TOTAL, size=max(count * 2, 64)))
+            ok = self.pick_counts(round_no, cand) == 0
+            if exclude_winners:
+                ok &= ~self.has_won(cand)
+            found = np.union1d(found, cand[ok])
+            if len(found) >= count:
+                break
+        return rng.permutation(found)[:count]
+
+    def round_summary(self, round_no):
+        """회차 선택 현황 (비트셋 전체 스캔 - 통계용)"""
+        with self._lock:
+            picks = self._round(round_no)
+            if picks is None:
+                return {"round": round_no, "distinct": 0, "picks": 0, "max": 0}
+            bits, multi = picks
+            distinct = int(np.unpackbits(np.asarray(bits)).sum(dtype=np.int64))
+            extra = sum(multi.values()) - len(multi)
+            top = max(multi.values(), default=1 if distinct else 0)
+        return {"round": round_no, "distinct": distinct, "picks": distinct + extra, "max": top}
+
+    def stats(self):
+        with self._lock:
+            multi = sum(len(m) for _, m in self._picks.values())
+            return {
+                "total_combinations": TOTAL,
+                "winning_combinations": len(self._winner_rounds),
+                "rounds": sorted(self._picks),
+                "bytes": {"winners": int(self._winners.size), "picks_per_round": BITSET_SIZE,
+                          "total": int(self._winners.size) + BITSET_SIZE * len(self._picks) + 16 * multi},
+            }
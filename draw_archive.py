@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+import urllib.request
+
+import draw_calendar
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# ══════════════════════════════════════════════════════════════
+#  당첨번호 아카이브 (디스크 저장 + 메모리 캐시)
+# ══════════════════════════════════════════════════════════════
+# - 한 번 조회한 회차(drwNo)는 바뀌지 않으므로 영구 보관
+# - 최신 회차는 추첨 일정으로 계산 → 메인 페이지 스크래핑 불필요
+# - 같은 회차 동시 조회는 업스트림 호출 1회로 합침 (single-flight)
+# - 아직 발표 전(returnValue=fail)인 회차는 잠시 재시도를 미룸
+# - 업스트림 오류도 잠시 기억해 장애 중 요청마다 타임아웃까지 기다리지 않음
+# - 조회 가능한 회차는 1 ~ (발표된 최신 회차 + 1) 로 제한 → 임의 회차로 업스트림 호출/캐시 항목이 생기지 않음
+# - 백필은 최신 회차부터 limit 개까지만, pause 간격으로 (배포마다 전 회차를 다시 받지 않게)
+
+LOTTO_API_URL = "https://www.dhlottery.co.kr/common.do?method=getLottoNumber&drwNo={}"
+MISS_RETRY_SEC = 300
+ERROR_RETRY_SEC = 30
+BACKFILL_SAVE_EVERY = 100  # 백필 중에는 이만큼 모일 때마다 한 번만 저장
+MAX_AHEAD = 1              # 발표 예정 회차 확인용으로 최신 회차 다음 1회까지 허용
+
+UPSTREAM_SECONDS = metrics.histogram(
+    "lotto_upstream_fetch_seconds", "당첨번호 업스트림 API 조회 시간", ("outcome",))
+
+def _normalize(raw):
+    return {
+        'round': raw.get('drwNo'),
+        'date': raw.get('drwNoDate'),
+        'numbers': [
+            raw.get('drwtNo1'), raw.get('drwtNo2'),
+            raw.get('drwtNo3'), raw.get('drwtNo4'),
+            raw.get('drwtNo5'), raw.get('drwtNo6'),
+        ],
+        'bonus': raw.get('bnusNo'),
+        'first_winners': raw.get('firstPrzwnerCo', 0),
+        'first_prize': raw.get('firstWinamnt', 0),
+    }
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class DrawArchive:
+    def __init__(self, path, user_agent=None, timeout=10):
+        self.path = path
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self._draws = {}      # drwNo → 정규화된 결과
+        self._misses = {}     # drwNo → 재시도 가능 시각 (발표 전 회차)
+        self._errors = {}     # drwNo → (재시도 가능 시각, 예외) (업스트림 오류)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._counters = {"hits": 0, "upstream_calls": 0, "coalesced": 0, "upstream_errors": 0,
+                          "cached_errors": 0}
+        self.version = 0      # 회차가 추가될 때마다 증가 (파생 캐시 무효화용)
+        self._load()
+
+    # ── 디스크 ────────────────────────────────────────────────
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for d in json.load(f):
+                    self._draws[int(d['round'])] = d
+            self.version += 1
+            logger.info(f"[ARCHIVE] 당첨번호 {len(self._draws)}회차 로드")
+        except Exception as e:
+            logger.error(f"[ARCHIVE] 로드 실패: {e}")
+
+    def _save(self):
+        """전체 아카이브를 쓰기마다 고유한 임시 파일에 쓴 뒤 교체 (저장끼리는 _save_lock 으로 직렬화)"""
+        with self._save_lock:
+            with self._lock:
+                draws = [self._draws[k] for k in sorted(self._draws)]
+            fd, tmp = tempfile.mkstemp(prefix=os.path.basename(self.path) + ".", suffix=".tmp",
+                                       dir=os.path.dirname(os.path.abspath(self.path)))
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(draws, f, ensure_ascii=False)
+                os.replace(tmp, self.path)
+            except Exception as e:
+                logger.error(f"[ARCHIVE] 저장 실패: {e}")
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+
+    # ── 업스트림 ──────────────────────────────────────────────
+    def _fetch_upstream(self, drw_no):
+        headers = {'User-Agent': self.user_agent} if self.user_agent else {}
+        req = urllib.request.Request(LOTTO_API_URL.format(drw_no), headers=headers)
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            raw = json.loads(resp.read().decode('utf-8'))
+        if raw.get('returnValue') != 'success':
+            return None
+        return _normalize(raw)
+
+    def _fetch_coalesced(self, drw_no, save=True):
+        with self._lock:
+            call = self._inflight.get(drw_no)
+            leader = call is None
+            if leader:
+                call = self._inflight[drw_no] = _Call()
+                self._counters["upstream_calls"] += 1
+            else:
+                self._counters["coalesced"] += 1
+        if leader:
+            started = time.perf_counter()
+            try:
+                call.result = self._fetch_upstream(drw_no)
+            except Exception as e:
+                call.error = e
+            finally:
+                outcome = "error" if call.error is not None else ("miss" if call.result is None else "ok")
+                UPSTREAM_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
+                with self._lock:
+                    del self._inflight[drw_no]
+                    self._expire(time.time())
+                    if call.error is not None:
+                        self._counters["upstream_errors"] += 1
+                        self._errors[drw_no] = (time.time() + ERROR_RETRY_SEC, call.error)
+                    elif call.result is None:
+                        self._misses[drw_no] = time.time() + MISS_RETRY_SEC
+                    else:
+                        self._draws[drw_no] = call.result
+                        self._misses.pop(drw_no, None)
+                        self.version += 1
+                    if call.error is None:
+                        self._errors.pop(drw_no, None)
+                call.event.set()
+                if call.result is not None and save:
+                    self._save()
+        else:
+            call.event.wait(self.timeout + 1)
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _expire(self, now):
+        """재시도 시각이 지난 발표 전/오류 기록 정리 (_lock 보유 상태에서 호출)"""
+        self._misses = {k: t for k, t in self._misses.items() if t > now}
+        self._errors = {k: v for k, v in self._errors.items() if v[0] > now}
+
+    # ── 조회 ──────────────────────────────────────────────────
+    @staticmethod
+    def check_round(drw_no, ahead=MAX_AHEAD):
+        """1 ~ (발표된 최신 회차 + ahead) 밖이면 ValueError"""
+        latest = draw_calendar.latest_drawn_round() + ahead
+        if isinstance(drw_no, bool) or not isinstance(drw_no, int) or not 1 <= drw_no <= latest:
+            raise ValueError(f"회차는 1~{latest} 사이여야 합니다.")
+
+    def get(self, drw_no, save=True):
+        """회차 결과 (없으면 업스트림 1회 조회, 발표 전이면 None)
+        최근 ERROR_RETRY_SEC 안에 업스트림 오류가 난 회차는 다시 조회하지 않고 그 오류를 바로 던짐
+        범위 밖 회차는 업스트림 호출 없이 ValueError"""
+        self.check_round(drw_no)
+        with self._lock:
+            d = self._draws.get(drw_no)
+            if d is not None:
+                self._counters["hits"] += 1
+                return d
+            if self._misses.get(drw_no, 0) > time.time():
+                return None
+            retry_at, error = self._errors.get(drw_no, (0, None))
+            if retry_at > time.time():
+                self._counters["cached_errors"] += 1
+                raise error
+        return self._fetch_coalesced(drw_no, save=save)
+
+    def latest(self):
+        """발표된 최신 회차 결과 (지연 발표/업스트림 오류 시 직전 회차 → 아카이브 최신 회차로 대체)"""
+        expected = draw_calendar.latest_drawn_round()
+        for drw_no in (expected, expected - 1):
+            try:
+                d = self.get(drw_no)
+            except Exception as e:
+                logger.warning(f"[ARCHIVE] {drw_no}회 조회 실패 → 이전 회차로 대체: {e}")
+                continue
+            if d is not None:
+                return d
+        with self._lock:
+            return self._draws[max(self._draws)] if self._draws else None
+
+    def backfill(self, limit=None, pause=1.0):
+        """빠진 회차를 최신 회차부터 최대 limit 개(None 이면 전부) 채움 (pause 간격으로 업스트림 부하 분산)"""
+        latest = draw_calendar.latest_drawn_round()
+        missing = [n for n in range(latest, 0, -1) if n not in self._draws][:limit]
+        if missing:
+            logger.info(f"[ARCHIVE] 누락 회차 중 최근 {len(missing)}개 백필 시작 ({pause}s 간격)")
+        pending = 0
+        for drw_no in missing:
+            try:
+                pending += self.get(drw_no, save=False) is not None
+            except Exception as e:
+                logger.warning(f"[ARCHIVE] {drw_no}회 백필 실패: {e}")
+            if pending >= BACKFILL_SAVE_EVERY:
+                self._save()
+                pending = 0
+            time.sleep(pause)
+        if pending:
+            self._save()
+        return len(missing)
+
+    def backfill_async(self, limit=None, pause=1.0):
+        threading.Thread(target=self.backfill, args=(limit, pause), name="draw-backfill", daemon=True).start()
+
+    def rounds(self):
+        with self._lock:
+            return sorted(self._draws)
+
+    def all(self):
+        with self._lock:
+            return [self._draws[k] for k in sorted(self._draws)]
+
+    def stats(self):
+        with self._lock:
+            return {"rounds": len(self._draws), "pending_misses": len(self._misses),
+                    "pending_errors": len(self._errors), **self._counters}
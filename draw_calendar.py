@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+
+# ══════════════════════════════════════════════════════════════
+#  추첨 일정 (KST 기준 회차 계산)
+# ══════════════════════════════════════════════════════════════
+# 로또 6/45 는 2002-12-07(토) 1회 이후 매주 토요일 추첨한다.
+# 추첨은 20:35 경, 공식 결과 API 반영은 21:00 이후로 본다.
+# 판매: 매일 06:00~24:00, 추첨일(토)은 20:00 마감 → 일요일 06:00 다음 회차 판매 재개.
+
+KST = timezone(timedelta(hours=9))
+FIRST_DRAW_DATE = datetime(2002, 12, 7, tzinfo=KST)
+RESULT_HOUR = 21  # 이 시각 이후 해당 주 결과가 조회 가능하다고 간주
+SALES_CLOSE_HOUR = 20  # 추첨일 판매 마감
+SALES_OPEN_HOUR = 6    # 매일 판매 시작 (00:00~06:00 판매 중지)
+
+def now_kst():
+    return datetime.now(KST)
+
+def draw_date(round_no):
+    """회차 → 추첨일 (KST 자정 기준 datetime)"""
+    return FIRST_DRAW_DATE + timedelta(weeks=round_no - 1)
+
+def latest_drawn_round(now=None):
+    """결과가 발표된 가장 최근 회차"""
+    now = (now or now_kst()).astimezone(KST)
+    first_result = FIRST_DRAW_DATE + timedelta(hours=RESULT_HOUR)
+    return (now - first_result) // timedelta(weeks=1) + 1
+
+def next_result_time(now=None):
+    """다음 회차 결과가 조회 가능해지는 시각 (캐시 무효화 기준)"""
+    now = (now or now_kst()).astimezone(KST)
+    return draw_date(latest_drawn_round(now) + 1) + timedelta(hours=RESULT_HOUR)
+
+def sales_close_time(round_no):
+    """회차 판매 마감 시각 (추첨일 20:00)"""
+    return draw_date(round_no) + timedelta(hours=SALES_CLOSE_HOUR)
+
+def sales_round(now=None):
+    """지금 구매하면 들어가는 회차 (마감 이후 ~ 재개 전이면 다음 회차)"""
+    now = (now or now_kst()).astimezone(KST)
+    return (now - sales_close_time(1)) // timedelta(weeks=1) + 2
+
+def sales_status(now=None):
+    """현재 판매 회차와 판매 가능 여부
+    → {round, draw_date, open, reason, closes_at, reopens_at}"""
+    now = (now or now_kst()).astimezone(KST)
+    round_no = sales_round(now)
+    day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    reason, reopens_at = None, None
+    last_close = sales_close_time(round_no - 1)
+    if now < last_close + timedelta(hours=24 - SALES_CLOSE_HOUR + SALES_OPEN_HOUR):
+        reason = "추첨일 판매 마감"
+        reopens_at = last_close.replace(hour=SALES_OPEN_HOUR) + timedelta(days=1)
+    elif now.hour < SALES_OPEN_HOUR:
+        reason = "심야 판매 중지 (00:00~06:00)"
+        reopens_at = day_start + timedelta(hours=SALES_OPEN_HOUR)
+    return {
+        "round": round_no,
+        "draw_date": draw_date(round_no).strftime("%Y-%m-%d"),
+        "open": reason is None,
+        "reason": reason,
+        "closes_at": sales_close_time(round_no).isoformat(),
+        "reopens_at": reopens_at.isoformat() if reopens_at else None,
+    }
@@ -0,0 +1,259 @@
+import os
+import json
+import time
+import base64
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+
+import metrics
+from lotto_match import numbers_to_mask
+
+logger = logging.getLogger(__name__)
+
+# ══════════════════════════════════════════════════════════════
+#  구매 이력 저장소 (SQLite WAL)
+# ══════════════════════════════════════════════════════════════
+# - 추가는 INSERT 1건(O(1)), 조회는 (user_id, timestamp) 인덱스로 사용자별 페이지 단위
+# - WAL 모드로 여러 작성자/조회자가 동시에 접근해도 파일이 깨지지 않음
+# - 보존 기간(30일) 정리는 조회 경로가 아닌 백그라운드 스레드에서 수행
+# - 번호는 JSON 과 함께 45비트 마스크(mask)로도 저장 → 일괄 당첨 판정용
+# - seq 는 AUTOINCREMENT 라 재사용되지 않음 → 증분 동기화(since=seq)의 기준
+#   삭제/교체는 seq 로 표현할 수 없으므로 meta.epoch 를 올려 클라이언트가 전체 재동기화하게 함
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp  TEXT NOT NULL,
+    user_id    TEXT NOT NULL,
+    round      TEXT,
+    round_date TEXT,
+    numbers    TEXT NOT NULL,
+    mask       INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_history_user_ts ON history(user_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_history_ts ON history(timestamp);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+STORE_SECONDS = metrics.histogram(
+    "lotto_history_store_seconds", "구매 이력 저장소 연산 시간", ("op",))
+
+
+def encode_cursor(timestamp, seq):
+    """페이지 커서 (마지막 항목의 정렬 키) → 불투명 문자열"""
+    raw = json.dumps([timestamp, seq], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """encode_cursor 의 역 → (timestamp, seq), 형식이 틀리면 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, seq = json.loads(raw)
+    except Exception:
+        raise ValueError("잘못된 커서")
+    if not isinstance(timestamp, str) or not isinstance(seq, int):
+        raise ValueError("잘못된 커서")
+    return timestamp, seq
+
+
+class HistoryStore:
+    def __init__(self, path, retention_days=30):
+        self.path = path
+        self.retention_days = retention_days
+        self._local = threading.local()
+        self._retention_thread = None
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+
+    def _migrate(self, conn):
+        # 구버전 DB: mask 컬럼 추가 후 기존 행 채움
+        cols = {row['name'] for row in conn.execute("PRAGMA table_info(history)")}
+        if 'mask' not in cols:
+            conn.execute("ALTER TABLE history ADD COLUMN mask INTEGER")
+        rows = conn.execute("SELECT seq, numbers FROM history WHERE mask IS NULL").fetchall()
+        conn.executemany("UPDATE history SET mask = ? WHERE seq = ?",
+                         [(numbers_to_mask(json.loads(r['numbers'])), r['seq']) for r in rows])
+
+    def _conn(self):
+        # sqlite3 연결은 스레드 간 공유하지 않고 스레드별로 하나씩 유지
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    def _cutoff(self):
+        return (datetime.now() - timedelta(days=self.retention_days)).isoformat()
+
+    def _where(self, user_id):
+        sql = "timestamp > ?"
+        params = [self._cutoff()]
+        if user_id:
+            sql += " AND user_id = ?"
+            params.append(user_id)
+        return sql, params
+
+    @staticmethod
+    def _bump_epoch(conn):
+        conn.execute("INSERT INTO meta (key, value) VALUES ('epoch', '1') "
+                     "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1")
+
+    @staticmethod
+    def _row_to_entry(row):
+        return {
+            'seq': row['seq'],
+            'timestamp': row['timestamp'],
+            'numbers': json.loads(row['numbers']),
+            'round': row['round'],
+            'round_date': row['round_date'],
+            'user_id': row['user_id'],
+        }
+
+    def add(self, entry):
+        with STORE_SECONDS.time(op="add"), self._conn() as conn:
+            cur = conn.execute(
+                "INSERT INTO history (timestamp, user_id, round, round_date, numbers, mask) VALUES (?, ?, ?, ?, ?, ?)",
+                (entry['timestamp'], entry.get('user_id') or 'unknown', entry.get('round'),
+                 entry.get('round_date'), json.dumps(entry['numbers']), numbers_to_mask(entry['numbers'])),
+            )
+        entry['seq'] = cur.lastrowid
+        return entry
+
+    def list(self, user_id=None, limit=None, offset=0):
+        """최신순 조회 (보존 기간 이내만)"""
+        where, params = self._where(user_id)
+        sql = f"SELECT * FROM history WHERE {where} ORDER BY timestamp DESC, seq DESC LIMIT ? OFFSET ?"
+        params += [limit if limit is not None else -1, offset]
+        with STORE_SECONDS.time(op="list"):
+            rows = self._conn().execute(sql, params).fetchall()
+        return [self._row_to_entry(r) for r in rows]
+
+    def page(self, user_id=None, limit=200, cursor=None):
+        """최신순 키셋 페이지 - cursor 는 직전 페이지 마지막 항목의 (timestamp, seq)
+        OFFSET 과 달리 깊은 페이지도 인덱스 탐색 한 번, 중간에 추가가 있어도 중복/누락 없음"""
+        where, params = self._where(user_id)
+        if cursor is not None:
+            where += " AND (timestamp < ? OR (timestamp = ? AND seq < ?))"
+            params += [cursor[0], cursor[0], cursor[1]]
+        sql = f"SELECT * FROM history WHERE {where} ORDER BY timestamp DESC, seq DESC LIMIT ?"
+        with STORE_SECONDS.time(op="page"):
+            rows = self._conn().execute(sql, params + [limit]).fetchall()
+        return [self._row_to_entry(r) for r in rows]
+
+    def changes(self, user_id=None, since=0, limit=200):
+        """seq > since 인 추가분 (오래된 것부터) - 증분 동기화용"""
+        where, params = self._where(user_id)
+        sql = f"SELECT * FROM history WHERE {where} AND seq > ? ORDER BY seq LIMIT ?"
+        with STORE_SECONDS.time(op="changes"):
+            rows = self._conn().execute(sql, params + [since, limit]).fetchall()
+        return [self._row_to_entry(r) for r in rows]
+
+    def iter_entries(self, user_id=None, batch=500):
+        """전체 이력을 최신순으로 batch 건씩 읽어 하나씩 내보냄 (내보내기 스트리밍용)"""
+        cursor = None
+        while True:
+            rows = self.page(user_id=user_id, limit=batch, cursor=cursor)
+            yield from rows
+            if len(rows) < batch:
+                return
+            cursor = (rows[-1]['timestamp'], rows[-1]['seq'])
+
+    def state(self, user_id=None):
+        """조회 결과 버전 → {epoch, last_seq, count} (ETag / 증분 동기화 기준)"""
+        where, params = self._where(user_id)
+        with STORE_SECONDS.time(op="state"):
+            conn = self._conn()
+            count, last_seq = conn.execute(
+                f"SELECT COUNT(*), COALESCE(MAX(seq), 0) FROM history WHERE {where}", params).fetchone()
+            row = conn.execute("SELECT value FROM meta WHERE key = 'epoch'").fetchone()
+        return {"epoch": int(row['value']) if row else 0, "last_seq": last_seq, "count": count}
+
+    def tickets(self, user_id=None):
+        """일괄 당첨 판정용 경량 조회 → [(seq, timestamp, user_id, round, mask)]"""
+        where, params = self._where(user_id)
+        sql = f"SELECT seq, timestamp, user_id, round, mask FROM history WHERE {where} ORDER BY timestamp DESC, seq DESC"
+        with STORE_SECONDS.time(op="tickets"):
+            return [tuple(r) for r in self._conn().execute(sql, params).fetchall()]
+
+    def delete(self, user_id=None):
+        with STORE_SECONDS.time(op="delete"), self._conn() as conn:
+            if user_id:
+                cur = conn.execute("DELETE FROM history WHERE user_id = ?", (user_id,))
+            else:
+                cur = conn.execute("DELETE FROM history")
+            if cur.rowcount:
+                self._bump_epoch(conn)
+        return cur.rowcount
+
+    def replace_all(self, entries):
+        """전체 이력 교체 (단일 트랜잭션)"""
+        with STORE_SECONDS.time(op="replace_all"), self._conn() as conn:
+            conn.execute("DELETE FROM history")
+            self._bump_epoch(conn)
+            conn.executemany(
+                "INSERT INTO history (timestamp, user_id, round, round_date, numbers, mask) VALUES (?, ?, ?, ?, ?, ?)",
+                [(e['timestamp'], e.get('user_id') or 'unknown', e.get('round'), e.get('round_date'),
+                  json.dumps(e['numbers']), numbers_to_mask(e['numbers'])) for e in reversed(entries)],
+            )
+
+    def purge_expired(self):
+        with STORE_SECONDS.time(op="purge"), self._conn() as conn:
+            # 조회는 이미 보존 기간으로 걸러지므로 보이는 결과가 바뀌지 않음 → epoch 유지
+            cur = conn.execute("DELETE FROM history WHERE timestamp <= ?", (self._cutoff(),))
+        if cur.rowcount:
+            logger.info(f"[HISTORY] 보존 기간 초과 {cur.rowcount}건 정리")
+        return cur.rowcount
+
+    def import_json_once(self, json_path):
+        """기존 purchase_history.json 이력을 최초 1회만 가져옴"""
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'json_imported'").fetchone():
+            return 0
+        entries = []
+        if os.path.exists(json_path):
+            try:
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)
+            except Exception as e:
+                logger.error(f"[HISTORY] JSON 이력 읽기 실패: {e}")
+                return 0
+        with conn:
+            # JSON 파일은 최신순 → 오래된 것부터 넣어 seq 순서를 시간순으로 맞춤
+            conn.executemany(
+                "INSERT INTO history (timestamp, user_id, round, round_date, numbers, mask) VALUES (?, ?, ?, ?, ?, ?)",
+                [(e['timestamp'], e.get('user_id') or 'unknown', e.get('round'), e.get('round_date'),
+                  json.dumps(e.get('numbers', [])), numbers_to_mask(e.get('numbers', [])))
+                 for e in reversed(entries) if 'timestamp' in e],
+            )
+            conn.execute("INSERT INTO meta (key, value) VALUES ('json_imported', ?)",
+                         (datetime.now().isoformat(),))
+        if entries:
+            logger.info(f"[HISTORY] JSON 이력 {len(entries)}건 가져오기 완료")
+        return len(entries)
+
+    def start_retention(self, interval_sec=3600):
+        """보존 기간 정리 백그라운드 스레드 시작"""
+        if self._retention_thread:
+            return
+
+        def loop():
+            while True:
+                try:
+                    self.purge_expired()
+                except Exception as e:
+                    logger.error(f"[HISTORY] 정리 실패: {e}")
+                time.sleep(interval_sec)
+
+        self._retention_thread = threading.Thread(target=loop, name="history-retention", daemon=True)
+        self._retention_thread.start()
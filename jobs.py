@@ -0,0 +1,140 @@
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# ══════════════════════════════════════════════════════════════
+#  비동기 구매 작업 큐
+# ══════════════════════════════════════════════════════════════
+# /buy 는 작업을 큐에 넣고 즉시 job_id 를 돌려주며, 실제 자동화는
+# 제한된 크기의 백그라운드 실행기에서 돌아간다. 웹 스레드는 항상 비어 있다.
+
+class QueueFull(Exception):
+    """대기 중인 작업 수가 상한에 도달함"""
+
+
+class PurchaseJob:
+    def __init__(self, queued_msg="⏳ 구매 대기열에 등록되었습니다."):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"     # queued → running → succeeded / failed
+        self.steps = []
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self.progress("queued", queued_msg)
+
+    def progress(self, step, msg=""):
+        """단계 진행 기록 (자동화 코드에서 호출)"""
+        with self._lock:
+            self.steps.append({"step": step, "msg": msg, "at": round(time.time(), 3)})
+        logger.info(f"[JOB] {self.id[:8]} {step} {msg}")
+
+    @property
+    def finished(self):
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self):
+        with self._lock:
+            steps = list(self.steps)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "step": steps[-1]["step"] if steps else None,
+            "message": steps[-1]["msg"] if steps else "",
+            "steps": steps,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """제한된 워커 수로 구매 작업을 실행하고 상태를 보관"""
+
+    def __init__(self, runner, max_workers=1, max_pending=20, retention_sec=3600,
+                 name="purchase", queued_msg="⏳ 구매 대기열에 등록되었습니다."):
+        # runner(job, **kwargs) → 결과 dict (job.progress 로 진행 보고)
+        self._runner = runner
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention_sec = retention_sec
+        self.queued_msg = queued_msg
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_sec
+        for jid in [j.id for j in self._jobs.values()
+                    if j.finished and j.finished_at is not None and j.finished_at < cutoff]:
+            del self._jobs[jid]
+
+    def _active_count(self):
+        return sum(1 for j in self._jobs.values() if not j.finished)
+
+    def submit(self, **kwargs):
+        with self._lock:
+            self._prune()
+            if self._active_count() >= self.max_pending:
+                raise QueueFull(f"대기 작업 {self.max_pending}건 초과")
+            job = PurchaseJob(self.queued_msg)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, kwargs)
+        return job
+
+    def _run(self, job, kwargs):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            result = self._runner(job, **kwargs)
+        except Exception as e:
+            self._finish(job, error=e)
+            return
+        if isinstance(result, Future):
+            # 비동기 엔진: 실행기 스레드는 바로 반환하고 결과가 나오면 콜백으로 마무리
+            result.add_done_callback(lambda f: self._finish(job, *self._unwrap(f)))
+        else:
+            self._finish(job, result)
+
+    @staticmethod
+    def _unwrap(future):
+        error = future.exception()
+        return (None, error) if error else (future.result(), None)
+
+    def _finish(self, job, result=None, error=None):
+        if error is not None:
+            logger.error(f"[JOB] {job.id[:8]} 실행 오류: {error}", exc_info=error)
+        # finished_at 을 먼저 채운 뒤 상태 변경 - _prune(submit 스레드)이 완료 상태를 보면 시각도 항상 있음
+        with self._lock:
+            job.finished_at = time.time()
+            if error is not None:
+                job.error = str(error)[:200]
+                job.status = "failed"
+            else:
+                job.result = result
+                job.status = "succeeded" if result and result.get("success") else "failed"
+        job.progress("done", "✅ 작업 완료" if job.status == "succeeded" else "❌ 작업 실패")
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts = {}
+        for j in jobs:
+            counts[j.status] = counts.get(j.status, 0) + 1
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "jobs": counts,
+        }
@@ -0,0 +1,87 @@
+import numpy as np
+
+# ══════════════════════════════════════════════════════════════
+#  45비트 마스크 기반 당첨 판정 (NumPy 벡터 연산)
+# ══════════════════════════════════════════════════════════════
+# 번호 n → 비트 (n-1). 티켓/당첨번호를 uint64 하나로 표현하면
+# 일치 개수 = popcount(ticket & draw) 이므로 티켓×회차 전체를 한 번에 계산할 수 있다.
+
+RANK_NONE = 0
+CHUNK_CELLS = 4_000_000  # 티켓×회차 행렬을 이 크기 단위로 나눠 메모리 사용 제한
+
+def numbers_to_mask(numbers):
+    mask = 0
+    for n in numbers:
+        mask |= 1 << (int(n) - 1)
+    return mask
+
+def mask_to_numbers(mask):
+    return [i + 1 for i in range(45) if mask >> i & 1]
+
+if hasattr(np, 'bitwise_count'):  # NumPy 2.0+
+    def popcount(arr):
+        return np.bitwise_count(arr).astype(np.int8)
+else:
+    def popcount(arr):
+        x = arr.astype(np.uint64)
+        x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+        x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+        x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+        return ((x * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.int8)
+
+def prize_rank(matches, bonus_hit):
+    """일치 개수/보너스 적중 → 등수 (1~5, 미당첨 0)"""
+    rank = np.zeros(matches.shape, dtype=np.int8)
+    rank[matches == 3] = 5
+    rank[matches == 4] = 4
+    rank[matches == 5] = 3
+    rank[(matches == 5) & bonus_hit] = 2
+    rank[matches == 6] = 1
+    return rank
+
+def check_own_round(ticket_masks, ticket_rounds, draw_rounds, draw_masks, bonus_masks):
+    """각 티켓을 자기 회차 당첨번호와 비교 → (일치 개수, 등수, 추첨 여부)
+    아직 추첨 전/아카이브에 없는 회차는 drawn=False, 일치 -1."""
+    ticket_masks = np.asarray(ticket_masks, dtype=np.uint64)
+    ticket_rounds = np.asarray(ticket_rounds, dtype=np.int64)
+    draw_rounds = np.asarray(draw_rounds, dtype=np.int64)
+    if len(draw_rounds) == 0:
+        empty = np.full(len(ticket_masks), -1, dtype=np.int8)
+        return empty, np.zeros(len(ticket_masks), dtype=np.int8), np.zeros(len(ticket_masks), dtype=bool)
+
+    pos = np.clip(np.searchsorted(draw_rounds, ticket_rounds), 0, len(draw_rounds) - 1)
+    drawn = draw_rounds[pos] == ticket_rounds
+    win = np.asarray(draw_masks, dtype=np.uint64)[pos]
+    bonus = np.asarray(bonus_masks, dtype=np.uint64)[pos]
+
+    matches = popcount(ticket_masks & win)
+    bonus_hit = (ticket_masks & bonus) != 0
+    rank = prize_rank(matches, bonus_hit)
+    matches[~drawn] = -1
+    rank[~drawn] = RANK_NONE
+    return matches, rank, drawn
+
+def check_all_rounds(ticket_masks, draw_masks, bonus_masks):
+    """모든 티켓 × 모든 회차 → (티켓별 최고 등수, 티켓별 등수 분포[T×6])
+    등수 분포 열: [미당첨, 1등, 2등, 3등, 4등, 5등]"""
+    ticket_masks = np.asarray(ticket_masks, dtype=np.uint64)
+    draw_masks = np.asarray(draw_masks, dtype=np.uint64)
+    bonus_masks = np.asarray(bonus_masks, dtype=np.uint64)
+    n_t, n_d = len(ticket_masks), len(draw_masks)
+    best = np.zeros(n_t, dtype=np.int8)
+    dist = np.zeros((n_t, 6), dtype=np.int64)
+    if n_t == 0 or n_d == 0:
+        return best, dist
+
+    step = max(1, CHUNK_CELLS // n_d)
+    for start in range(0, n_t, step):
+        t = ticket_masks[start:start + step, None]
+        matches = popcount(t & draw_masks[None, :])
+        rank = prize_rank(matches, (t & bonus_masks[None, :]) != 0)
+        # 등수 0(미당첨)을 7로 바꿔 최솟값 = 최고 등수
+        ranked = np.where(rank == 0, 7, rank)
+        chunk_best = ranked.min(axis=1)
+        best[start:start + step] = np.where(chunk_best == 7, 0, chunk_best)
+        for r in range(6):
+            dist[start:start + step, r] = (rank == r).sum(axis=1)
+    return best, dist
@@ -0,0 +1,238 @@
+import json
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# ══════════════════════════════════════════════════════════════
+#  경량 메트릭 레지스트리 + 단계별 타이밍 span (Prometheus 텍스트 포맷)
+# ══════════════════════════════════════════════════════════════
+# - Counter / Histogram / Gauge 는 모듈 로드 시 한 번 정의하고 라벨은 키워드 인자로 넘긴다.
+# - span() 은 구매 흐름의 한 단계를 감싸 소요 시간을 phase 히스토그램에 기록하고,
+#   단계 안에서 생긴 셀렉터 폴백/재시도 등은 annotate() 로 span 속성에 남긴다.
+#   속성은 라벨(카디널리티 폭증)이 아니라 구조화 로그 한 줄로 남긴다.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: 라벨 {self.labelnames} 필요 (받음: {tuple(labels)})")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += self._samples()
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_label_str(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """값을 직접 set 하거나, 수집 시점에 fn() 을 호출해 읽는 게이지"""
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labelnames=(), fn=None):
+        super().__init__(name, help_text, labelnames)
+        self._fn = fn
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self):
+        if self._fn is not None:
+            try:
+                return [f"{self.name} {float(self._fn())}"]
+            except Exception as e:
+                logger.debug(f"[METRICS] {self.name} 수집 실패: {e}")
+                return []
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_label_str(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((k, {"counts": list(v["counts"]), "sum": v["sum"], "count": v["count"]})
+                           for k, v in self._values.items())
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, state["counts"]):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, [('le', '+Inf')])} {state['count']}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {state['sum']:.6f}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {state['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing  # 모듈 재로드 시 같은 메트릭 재사용
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=(), fn=None):
+        return self._register(Gauge(name, help_text, labelnames, fn))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for m in metrics:
+            lines += m.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+PHASE_SECONDS = histogram(
+    "lotto_phase_duration_seconds", "구매 흐름 단계별 소요 시간", ("phase", "outcome"))
+
+
+# ══════════════════════════════════════════════════════════════
+#  span
+# ══════════════════════════════════════════════════════════════
+# 진행 중인 span 스택 - 스레드별로도, asyncio 작업별로도 분리되도록 ContextVar 에 불변 튜플로 보관
+_stack_var = contextvars.ContextVar("metrics_span_stack", default=())
+
+
+class Span:
+    def __init__(self, phase, attrs):
+        self.phase = phase
+        self.attrs = dict(attrs)
+        self.outcome = None  # None → 정상 종료 시 "ok", 예외 시 "error"
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def incr(self, key, n=1):
+        self.attrs[key] = self.attrs.get(key, 0) + n
+
+
+def current_span():
+    stack = _stack_var.get()
+    return stack[-1] if stack else None
+
+
+def annotate(**attrs):
+    """현재 스레드(또는 asyncio 작업)에서 진행 중인 span 에 속성 추가 (없으면 무시)"""
+    s = current_span()
+    if s is not None:
+        s.set(**attrs)
+
+
+def incr(key, n=1):
+    s = current_span()
+    if s is not None:
+        s.incr(key, n)
+
+
+def mark_failed(outcome="fail"):
+    """진행 중인 모든 span 을 실패로 표시 (예외 없이 실패를 반환하는 흐름용)"""
+    for s in _stack_var.get():
+        if s.outcome is None:
+            s.outcome = outcome
+
+
+@contextmanager
+def span(phase, **attrs):
+    s = Span(phase, attrs)
+    token = _stack_var.set(_stack_var.get() + (s,))
+    start = time.perf_counter()
+    try:
+        yield s
+    except BaseException:
+        s.outcome = s.outcome or "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _stack_var.reset(token)
+        outcome = s.outcome or "ok"
+        PHASE_SECONDS.observe(elapsed, phase=phase, outcome=outcome)
+        record = {"phase": phase, "ms": round(elapsed * 1000, 1), "outcome": outcome, **s.attrs}
+        logger.info(f"[SPAN] {json.dumps(record, ensure_ascii=False, default=str)}")
@@ -0,0 +1,137 @@
+import re
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# ══════════════════════════════════════════════════════════════
+#  자동화 세션 네트워크 리소스 필터
+# ══════════════════════════════════════════════════════════════
+# RESOURCE_FILTER_MODE
+#   off    : 필터 없음 (비교 기준)
+#   lite   : 이미지/폰트/미디어 차단(이미지는 1x1 GIF 로 대체), 외부 분석 스크립트 차단
+#   strict : 동행복권 도메인의 document/script/xhr/fetch/stylesheet 만 허용, 나머지 차단
+# 차단 후보 URL 패턴만 Python 핸들러로 라우팅 → 허용 요청은 IPC 왕복 없이 그대로 통과한다.
+
+MODES = ("off", "lite", "strict")
+DEFAULT_FIRST_PARTY = ("dhlottery.co.kr",)
+HEAVY_EXT = r"\.(png|jpe?g|gif|webp|svg|ico|bmp|woff2?|ttf|otf|eot|mp4|webm|mp3)(\?|$)"
+ANALYTICS = (r"(google-analytics|googletagmanager|doubleclick|facebook\.net|"
+             r"wcs\.naver|adservice|criteo|kakao\.com/.*pixel)")
+STRICT_ALLOWED_TYPES = {"document", "script", "xhr", "fetch", "stylesheet"}
+LITE_BLOCKED_TYPES = {"image", "font", "media"}
+
+# 차단한 요청의 추정 크기 (실제로 받지 않았으므로 유형별 평균치로 계산)
+EST_BYTES = {"image": 30_000, "font": 60_000, "media": 500_000, "script": 40_000,
+             "stylesheet": 20_000, "other": 5_000}
+BLANK_GIF = bytes.fromhex("47494638396101000100800000000000ffffff21f90401000000002c"
+                          "00000000010001000002024401003b")
+
+
+class FilterSession:
+    """세션(구매 1건) 단위 카운터"""
+    def __init__(self, mode):
+        self.mode = mode
+        self.counters = {"routed": 0, "allowed": 0, "aborted": 0, "stubbed": 0, "est_bytes_saved": 0}
+        self.by_type = {}
+
+    def record(self, action, rtype):
+        self.counters["routed"] += 1
+        self.counters[action] += 1
+        if action != "allowed":
+            self.counters["est_bytes_saved"] += EST_BYTES.get(rtype, EST_BYTES["other"])
+            self.by_type[rtype] = self.by_type.get(rtype, 0) + 1
+
+    def summary(self):
+        return {"mode": self.mode, **self.counters, "blocked_by_type": dict(self.by_type)}
+
+
+class ResourceFilter:
+    def __init__(self, mode="off", first_party_hosts=DEFAULT_FIRST_PARTY):
+        if mode not in MODES:
+            logger.warning(f"[FILTER] 알 수 없는 모드 '{mode}' → off")
+            mode = "off"
+        self.mode = mode
+        # 허용 도메인 (하위 도메인 포함) - 모의 사이트로 돌릴 때는 그 호스트가 1st-party
+        hosts = "|".join(re.escape(h) for h in sorted(first_party_hosts) if h)
+        self._first_party = re.compile(rf"^https?://([^/]+\.)?({hosts})(:\d+)?/", re.I)
+        self._route_pattern = {
+            "lite": re.compile(f"({HEAVY_EXT}|{ANALYTICS})", re.I),
+            # 1st-party 가 아닌 모든 요청 + 1st-party 의 무거운 정적 리소스
+            "strict": re.compile(rf"(^https?://(?!([^/]+\.)?({hosts})(:\d+)?/)|{HEAVY_EXT})", re.I),
+        }.get(mode)
+        self._lock = threading.Lock()
+        self._totals = {"sessions": 0, "routed": 0, "allowed": 0, "aborted": 0, "stubbed": 0, "est_bytes_saved": 0}
+
+    def _decide(self, url, rtype):
+        first_party = bool(self._first_party.match(url))
+        if self.mode == "strict":
+            if first_party and rtype in STRICT_ALLOWED_TYPES:
+                return "allowed"
+        elif rtype not in LITE_BLOCKED_TYPES and not re.search(ANALYTICS, url, re.I):
+            return "allowed"
+        return "stubbed" if rtype == "image" else "aborted"
+
+    def install(self, context):
+        """컨텍스트에 라우팅 설치 → FilterSession (off 모드면 None)"""
+        if self.mode == "off":
+            return None
+        session = FilterSession(self.mode)
+
+        def handler(route, request):
+            action = self._classify(session, request)
+            try:
+                if action == "allowed":
+                    route.continue_()
+                elif action == "stubbed":
+                    route.fulfill(status=200, content_type="image/gif", body=BLANK_GIF)
+                else:
+                    route.abort("blockedbyclient")
+            except Exception:
+                pass  # 페이지 이동 중 취소된 요청
+
+        context.route(self._route_pattern, handler)
+        return session
+
+    async def install_async(self, context):
+        """install() 의 playwright.async_api 판"""
+        if self.mode == "off":
+            return None
+        session = FilterSession(self.mode)
+
+        async def handler(route, request):
+            action = self._classify(session, request)
+            try:
+                if action == "allowed":
+                    await route.continue_()
+                elif action == "stubbed":
+                    await route.fulfill(status=200, content_type="image/gif", body=BLANK_GIF)
+                else:
+                    await route.abort("blockedbyclient")
+            except Exception:
+                pass
+
+        await context.route(self._route_pattern, handler)
+        return session
+
+    def _classify(self, session, request):
+        rtype = request.resource_type
+        action = self._decide(request.url, rtype)
+        session.record(action, rtype)
+        return action
+
+    def finish(self, session):
+        """세션 카운터를 누적 통계에 합산하고 요약 반환"""
+        if session is None:
+            return None
+        summary = session.summary()
+        with self._lock:
+            self._totals["sessions"] += 1
+            for k, v in session.counters.items():
+                self._totals[k] += v
+        logger.info(f"[FILTER] 세션 요약: {summary}")
+        return summary
+
+    def stats(self):
+        with self._lock:
+            return {"mode": self.mode, **self._totals}
@@ -0,0 +1,144 @@
+import time
+import random
+import asyncio
+import logging
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# ══════════════════════════════════════════════════════════════
+#  체크포인트 기반 구매 상태 기계
+# ══════════════════════════════════════════════════════════════
+# 구매 흐름을 이름 붙은 단계(Step)의 나열로 실행하고, 단계가 끝날 때마다 체크포인트를 남긴다.
+#   - 일시적 실패(Retry 또는 단계의 retry_on 예외) → 실패한 단계만 다시 실행
+#     단계별 재시도 예산(retries) 안에서 지수 백오프 (max_backoff 상한, 지터 포함)
+#   - Rewind(step) → 전제 조건이 깨짐: 지정한 이전 단계의 체크포인트부터 다시 진행 (흐름당 max_rewinds 회)
+#   - Abort 또는 그 밖의 예외 → 즉시 중단 (예외를 그대로 다시 던짐, failed_step 에 단계명)
+# 단계 함수는 fn(attempt) 형태이며 진행 상태는 호출 측 객체에 보관한다 (재시도 시 이어서 진행 가능).
+
+STEP_RETRIES = metrics.counter(
+    "lotto_step_retries_total", "구매 단계 재시도/되감기 횟수", ("step", "kind"))
+
+
+class Retry(Exception):
+    """일시적 실패 - 같은 단계를 다시 시도"""
+
+
+class Abort(Exception):
+    """재시도해도 결과가 같은 실패 - 흐름 중단 (메시지는 사용자에게 그대로 전달)"""
+
+
+class Rewind(Exception):
+    """이전 단계의 결과가 무효가 됨 - step 단계부터 다시 진행"""
+    def __init__(self, step, reason=""):
+        self.step = step
+        super().__init__(reason or f"'{step}' 단계부터 다시 진행")
+
+
+class Step:
+    def __init__(self, name, fn, retries=0, retry_on=(), backoff=0.5, max_backoff=4.0, message=""):
+        self.name = name
+        self.fn = fn
+        self.retries = retries      # 첫 시도 외 추가 시도 횟수
+        self.retry_on = retry_on    # Retry 외에 일시적 실패로 볼 예외 타입
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.message = message      # 단계 시작 시 progress 메시지
+
+    def delay(self, attempt):
+        """attempt 번째 실패 후 대기 시간 (초)"""
+        base = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return base * random.uniform(0.5, 1.0)
+
+
+class StepFlow:
+    def __init__(self, steps, progress=None, max_rewinds=1):
+        self.steps = list(steps)
+        self._index = {s.name: i for i, s in enumerate(self.steps)}
+        self._progress = progress or (lambda step, msg="": None)
+        self.max_rewinds = max_rewinds
+        self.checkpoints = []   # 완료된 단계 [{step, attempts, elapsed}]
+        self.retries = {}       # 단계 → 재시도 횟수
+        self.rewinds = 0
+        self.failed_step = None
+
+    @property
+    def completed(self):
+        return [c["step"] for c in self.checkpoints]
+
+    def _enter(self, step, attempt):
+        if attempt == 1 and step.message:
+            self._progress(step.name, step.message)
+
+    def _checkpoint(self, step, attempt, started):
+        self.checkpoints.append({"step": step.name, "attempts": attempt,
+                                 "elapsed": round(time.perf_counter() - started, 3)})
+
+    def _recover(self, i, attempt, error):
+        """실패 처리 → (다음 단계 위치, 시도 번호, 대기 초), 복구 불가면 예외를 다시 던짐"""
+        step = self.steps[i]
+        if isinstance(error, Abort):
+            self.failed_step = step.name
+            raise error
+        if isinstance(error, Rewind):
+            target = self._index.get(error.step)
+            if target is None or target > i or self.rewinds >= self.max_rewinds:
+                self.failed_step = step.name
+                raise error
+            self.rewinds += 1
+            self.checkpoints = [c for c in self.checkpoints if self._index[c["step"]] < target]
+            STEP_RETRIES.inc(step=step.name, kind="rewind")
+            logger.warning(f"[FLOW] '{step.name}' → '{error.step}' 단계부터 다시 진행: {error}")
+            self._progress(error.step, f"↩️ {error}")
+            return target, 1, 0
+        transient = isinstance(error, Retry) or (step.retry_on and isinstance(error, step.retry_on))
+        if not transient or attempt > step.retries:
+            self.failed_step = step.name
+            raise error
+        self.retries[step.name] = self.retries.get(step.name, 0) + 1
+        STEP_RETRIES.inc(step=step.name, kind="retry")
+        delay = step.delay(attempt)
+        logger.warning(f"[FLOW] '{step.name}' 재시도 {attempt}/{step.retries} ({delay:.1f}s 후): {error}")
+        self._progress(step.name, f"🔁 재시도 중 ({attempt}/{step.retries})...")
+        return i, attempt + 1, delay
+
+    def run(self):
+        i, attempt = 0, 1
+        while i < len(self.steps):
+            step = self.steps[i]
+            started = time.perf_counter()
+            try:
+                self._enter(step, attempt)
+                step.fn(attempt)
+            except Exception as e:
+                i, attempt, delay = self._recover(i, attempt, e)
+                time.sleep(delay)
+                continue
+            self._checkpoint(step, attempt, started)
+            i, attempt = i + 1, 1
+
+    async def run_async(self):
+        """run() 과 같은 규칙 - 단계 함수는 코루틴, 백오프 동안 이벤트 루프를 양보"""
+        i, attempt = 0, 1
+        while i < len(self.steps):
+            step = self.steps[i]
+            started = time.perf_counter()
+            try:
+                self._enter(step, attempt)
+                await step.fn(attempt)
+            except Exception as e:
+                i, attempt, delay = self._recover(i, attempt, e)
+                await asyncio.sleep(delay)
+                continue
+            self._checkpoint(step, attempt, started)
+            i, attempt = i + 1, 1
+
+    def summary(self):
+        return {
+            "completed": self.completed,
+            "failed_step": self.failed_step,
+            "retries": dict(self.retries),
+            "rewinds": self.rewinds,
+            "checkpoints": list(self.checkpoints),
+        }
@@ -0,0 +1,150 @@
+import numpy as np
+
+# ══════════════════════════════════════════════════════════════
+#  조건부 번호 추천 (NumPy 일괄 샘플링)
+# ══════════════════════════════════════════════════════════════
+# 후보 티켓을 한 번에 수천 장씩 뽑아 조건을 행렬 연산으로 걸러낸다.
+# - 가중 비복원 추출: Gumbel-top-k (log w + Gumbel 잡음 상위 6개) → 행마다 반복문 없음
+# - 조건: 합계 범위, 홀수 개수, 저번호(1~22) 개수, 최대 연속 번호 길이,
+#         제외 조합(역대 1등 번호 / 본인 구매 이력 - 45비트 마스크 비교)
+# - 같은 seed + 같은 조건 → 같은 결과 (응답에 seed 를 돌려줌)
+
+LOW_MAX = 22
+MAX_COUNT = 10000
+MIN_BATCH = 2048
+MAX_BATCH = 200_000
+MAX_GENERATED = 1_000_000  # 조건이 너무 빡빡하면 이만큼 뽑고 포기 (요청당 작업량 상한)
+WEIGHTINGS = ("none", "frequency", "cold")
+_BITS = np.left_shift(np.uint64(1), np.arange(45, dtype=np.uint64))
+
+
+class RecommendError(ValueError):
+    """추천 조건이 잘못됨"""
+
+
+def _check_range(name, lo, hi, floor, ceil):
+    if lo is None and hi is None:
+        return None
+    lo = floor if lo is None else int(lo)
+    hi = ceil if hi is None else int(hi)
+    if not floor <= lo <= hi <= ceil:
+        raise RecommendError(f"{name} 범위는 {floor}~{ceil} 사이, 최소 ≤ 최대여야 합니다.")
+    return lo, hi
+
+
+def number_weights(weighting, frequency=None):
+    """가중 방식 → 번호별 가중치 (길이 45) 또는 None(균등)"""
+    if weighting not in WEIGHTINGS:
+        raise RecommendError(f"weighting 은 {', '.join(WEIGHTINGS)} 중 하나여야 합니다.")
+    if weighting == "none" or frequency is None or not np.any(frequency):
+        return None
+    freq = np.asarray(frequency, dtype=np.float64) + 1.0  # 한 번도 안 나온 번호도 후보에 남김
+    w = freq if weighting == "frequency" else 1.0 / freq
+    return w / w.sum()
+
+
+def sample(rng, size, log_w=None):
+    """(size × 6) 오름차순 번호 행렬 - log 가중치(길이 45)가 있으면 Gumbel-top-k"""
+    keys = rng.random((size, 45))
+    if log_w is not None:
+        keys = log_w - np.log(-np.log(keys))
+    top = np.argpartition(-keys, 6, axis=1)[:, :6]
+    return np.sort(top, axis=1) + 1
+
+
+def _max_run(tickets):
+    """행별 최대 연속 번호 길이"""
+    step = np.diff(tickets, axis=1) == 1
+    run = cur = np.ones(len(tickets), dtype=np.int8)
+    for j in range(step.shape[1]):
+        cur = np.where(step[:, j], cur + 1, 1)
+        run = np.maximum(run, cur)
+    return run
+
+
+def to_masks(tickets):
+    return np.bitwise_or.reduce(_BITS[tickets - 1], axis=1)
+
+
+def generate(count, seed=None, weights=None, sum_range=None, odd_range=None, low_range=None,
+             max_run=None, exclude_masks=None):
+    """조건을 만족하는 서로 다른 티켓 count 장 → (티켓 배열[count×6], 정보 dict)
+    조건이 너무 빡빡해 MAX_GENERATED 안에 다 못 채우면 찾은 만큼만 반환 (info['exhausted'])"""
+    if not 1 <= count <= MAX_COUNT:
+        raise RecommendError(f"추천 개수는 1~{MAX_COUNT} 사이여야 합니다.")
+    sum_range = _check_range("합계", *(sum_range or (None, None)), 21, 255)
+    odd_range = _check_range("홀수 개수", *(odd_range or (None, None)), 0, 6)
+    low_range = _check_range("저번호 개수", *(low_range or (None, None)), 0, 6)
+    if max_run is not None and not 1 <= int(max_run) <= 6:
+        raise RecommendError("최대 연속 길이는 1~6 사이여야 합니다.")
+    if seed is not None and (isinstance(seed, bool) or not isinstance(seed, (int, np.integer)) or seed < 0):
+        raise RecommendError("seed 는 0 이상의 정수여야 합니다.")
+
+    if seed is None:
+        seed = int(np.random.SeedSequence().generate_state(1)[0])
+    rng = np.random.default_rng(seed)
+    log_w = None if weights is None else np.log(np.asarray(weights, dtype=np.float64))
+    excluded = np.unique(np.asarray(exclude_masks if exclude_masks is not None else [], dtype=np.uint64))
+
+    rejected = {"sum": 0, "odd": 0, "low": 0, "run": 0, "excluded": 0, "duplicate": 0}
+    kept, kept_masks = [], np.zeros(0, dtype=np.uint64)
+    generated, rounds, accept_rate = 0, 0, 1.0
+    while len(kept_masks) < count and generated < MAX_GENERATED:
+        need = count - len(kept_masks)
+        size = int(min(MAX_BATCH, MAX_GENERATED - generated,
+                       max(MIN_BATCH, need / max(accept_rate, 1e-6) * 1.5)))
+        tickets = sample(rng, size, log_w)
+        generated += size
+        rounds += 1
+
+        ok = np.ones(size, dtype=bool)
+        for name, bounds, values in (
+                ("sum", sum_range, lambda: tickets.sum(axis=1)),
+                ("odd", odd_range, lambda: (tickets % 2).sum(axis=1)),
+                ("low", low_range, lambda: (tickets <= LOW_MAX).sum(axis=1))):
+            if bounds is not None:
+                v = values()
+                fail = ok & ((v < bounds[0]) | (v > bounds[1]))
+                rejected[name] += int(fail.sum())
+                ok &= ~fail
+        if max_run is not None:
+            fail = ok & (_max_run(tickets) > int(max_run))
+            rejected["run"] += int(fail.sum())
+            ok &= ~fail
+
+        masks = to_masks(tickets)
+        if len(excluded):
+            fail = ok & np.isin(masks, excluded)
+            rejected["excluded"] += int(fail.sum())
+            ok &= ~fail
+
+        # 배치 안 중복 + 이미 뽑은 것과의 중복 제거 (처음 나온 순서 유지)
+        idx = np.flatnonzero(ok)
+        _, first = np.unique(masks[idx], return_index=True)
+        first = idx[np.sort(first)]
+        fresh = first[~np.isin(masks[first], kept_masks)]
+        rejected["duplicate"] += int(ok.sum()) - len(fresh)
+        accept_rate = len(fresh) / size
+
+        fresh = fresh[:need]
+        kept.append(tickets[fresh])
+        kept_masks = np.concatenate([kept_masks, masks[fresh]])
+
+    result = np.vstack(kept) if kept else np.zeros((0, 6), dtype=np.int64)
+    return result, {
+        "seed": seed,
+        "generated": generated,
+        "rounds": rounds,
+        "rejected": rejected,
+        "exhausted": len(result) < count,
+    }
+
+
+def describe(tickets):
+    """티켓별 합계/홀수/저번호/최대 연속 (응답 표시용)"""
+    return {
+        "sum": tickets.sum(axis=1).tolist(),
+        "odd": (tickets % 2).sum(axis=1).tolist(),
+        "low": (tickets <= LOW_MAX).sum(axis=1).tolist(),
+        "max_run": _max_run(tickets).tolist() if len(tickets) else [],
+    }
@@ -0,0 +1,245 @@
+import time
+import base64
+import hashlib
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager, asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+# ══════════════════════════════════════════════════════════════
+#  작업별 실시간 화면 중계 (CDP screencast → MJPEG push)
+# ══════════════════════════════════════════════════════════════
+# - 프레임은 구매 흐름과 별개로 브라우저가 CDP screencast 로 밀어 줌 (축소 JPEG)
+# - 같은 화면이 반복되면 버림(중복 제거), 작업(job_id)마다 채널 분리
+# - 시청자는 multipart/x-mixed-replace(MJPEG)로 받고, 서버가 프레임률 상한을 둠
+# - 시청자 1명이 웹 스레드 1개를 작업 내내 점유하므로 전체/작업별 동시 시청자 수를 제한
+
+SCREENCAST_OPTIONS = {
+    "format": "jpeg",
+    "quality": 50,
+    "maxWidth": 960,
+    "maxHeight": 540,
+    "everyNthFrame": 2,
+}
+BOUNDARY = "frame"
+
+# 현재 구매 흐름이 기록할 채널 - 작업 스레드별, asyncio 세션(작업)별로 분리
+_current_channel = contextvars.ContextVar("screen_channel", default=None)
+
+
+class FrameChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.seq = 0
+        self.frame = None
+        self.digest = None
+        self.updated_at = time.time()
+        self.closed = False
+        self.screencast = False
+        self.cond = threading.Condition()
+
+
+class ScreenHub:
+    def __init__(self, max_fps=4, ttl=300, max_viewers=4, max_viewers_per_channel=2):
+        self.max_fps = max_fps
+        self.ttl = ttl
+        self.max_viewers = max_viewers
+        self.max_viewers_per_channel = max_viewers_per_channel
+        self._channels = {}
+        self._viewers = {}    # channel_id → 현재 시청자 수
+        self._lock = threading.Lock()
+        self._counters = {"frames": 0, "duplicates": 0, "fallback_captures": 0}
+
+    # ── 채널 ──────────────────────────────────────────────────
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        for cid in [c.id for c in self._channels.values() if c.closed and c.updated_at < cutoff]:
+            del self._channels[cid]
+
+    def channel(self, channel_id, create=False):
+        with self._lock:
+            ch = self._channels.get(channel_id)
+            if ch is None and create:
+                self._prune()
+                ch = self._channels[channel_id] = FrameChannel(channel_id)
+            return ch
+
+    def acquire_viewer(self, channel_id):
+        """시청 자리 확보 → 성공 여부 (전체/작업별 상한 초과 시 False, 끝나면 release_viewer)"""
+        with self._lock:
+            if sum(self._viewers.values()) >= self.max_viewers:
+                return False
+            if self._viewers.get(channel_id, 0) >= self.max_viewers_per_channel:
+                return False
+            self._viewers[channel_id] = self._viewers.get(channel_id, 0) + 1
+            return True
+
+    def release_viewer(self, channel_id):
+        with self._lock:
+            n = self._viewers.get(channel_id, 0) - 1
+            if n > 0:
+                self._viewers[channel_id] = n
+            else:
+                self._viewers.pop(channel_id, None)
+
+    def publish(self, channel_id, data):
+        """새 프레임 게시 (직전 프레임과 동일하면 무시) → 게시 여부"""
+        ch = self.channel(channel_id)
+        if ch is None or ch.closed:
+            return False
+        digest = hashlib.sha1(data).digest()
+        with ch.cond:
+            if digest == ch.digest:
+                self._counters["duplicates"] += 1
+                return False
+            ch.frame, ch.digest = data, digest
+            ch.seq += 1
+            ch.updated_at = time.time()
+            ch.cond.notify_all()
+        self._counters["frames"] += 1
+        return True
+
+    def close(self, channel_id):
+        ch = self.channel(channel_id)
+        if ch is None:
+            return
+        with ch.cond:
+            ch.closed = True
+            ch.updated_at = time.time()
+            ch.cond.notify_all()
+
+    def latest_frame(self):
+        """가장 최근에 갱신된 채널의 프레임 (/screenshot 하위 호환용)"""
+        with self._lock:
+            channels = [c for c in self._channels.values() if c.frame is not None]
+        if not channels:
+            return None
+        return max(channels, key=lambda c: c.updated_at).frame
+
+    # ── 브라우저 측 ───────────────────────────────────────────
+    def _start_channel(self, channel_id):
+        ch = self.channel(channel_id, create=True)
+        return ch, _current_channel.set(ch)
+
+    def _end_channel(self, channel_id, token):
+        _current_channel.reset(token)
+        self.close(channel_id)
+
+    @contextmanager
+    def session(self, channel_id, context, page):
+        """구매 1건 동안 CDP screencast 로 프레임 수집 (현재 스레드에 채널 연결)"""
+        ch, token = self._start_channel(channel_id)
+        cdp = None
+        try:
+            cdp = context.new_cdp_session(page)
+
+            def on_frame(params):
+                try:
+                    self.publish(channel_id, base64.b64decode(params["data"]))
+                finally:
+                    try:
+                        cdp.send("Page.screencastFrameAck", {"sessionId": params["sessionId"]})
+                    except Exception:
+                        pass
+
+            cdp.on("Page.screencastFrame", on_frame)
+            cdp.send("Page.startScreencast", SCREENCAST_OPTIONS)
+            ch.screencast = True
+        except Exception as e:
+            # CDP 미지원 환경 → capture() 호출 시점의 스크린샷으로 대체
+            logger.debug(f"[SCREEN] screencast 시작 실패: {e}")
+        try:
+            yield ch
+        finally:
+            if ch.screencast and cdp is not None:
+                try:
+                    cdp.send("Page.stopScreencast")
+                    cdp.detach()
+                except Exception:
+                    pass
+            self._end_channel(channel_id, token)
+
+    @asynccontextmanager
+    async def session_async(self, channel_id, context, page):
+        """session() 의 playwright.async_api 판 (현재 asyncio 작업에 채널 연결)"""
+        ch, token = self._start_channel(channel_id)
+        cdp = None
+        try:
+            cdp = await context.new_cdp_session(page)
+
+            async def on_frame(params):
+                try:
+                    self.publish(channel_id, base64.b64decode(params["data"]))
+                finally:
+                    try:
+                        await cdp.send("Page.screencastFrameAck", {"sessionId": params["sessionId"]})
+                    except Exception:
+                        pass
+
+            cdp.on("Page.screencastFrame", on_frame)
+            await cdp.send("Page.startScreencast", SCREENCAST_OPTIONS)
+            ch.screencast = True
+        except Exception as e:
+            logger.debug(f"[SCREEN] screencast 시작 실패: {e}")
+        try:
+            yield ch
+        finally:
+            if ch.screencast and cdp is not None:
+                try:
+                    await cdp.send("Page.stopScreencast")
+                    await cdp.detach()
+                except Exception:
+                    pass
+            self._end_channel(channel_id, token)
+
+    def capture(self, page):
+        """주요 단계 화면 기록 - screencast 가 돌고 있으면 아무것도 하지 않음"""
+        ch = _current_channel.get()
+        if ch is None or ch.screencast:
+            return
+        try:
+            data = page.screenshot(type="jpeg", quality=50, scale="css")
+            self._counters["fallback_captures"] += 1
+            self.publish(ch.id, data)
+        except Exception as e:
+            logger.debug(f"[SCREEN] 캡처 실패: {e}")
+
+    async def capture_async(self, page):
+        ch = _current_channel.get()
+        if ch is None or ch.screencast:
+            return
+        try:
+            data = await page.screenshot(type="jpeg", quality=50, scale="css")
+            self._counters["fallback_captures"] += 1
+            self.publish(ch.id, data)
+        except Exception as e:
+            logger.debug(f"[SCREEN] 캡처 실패: {e}")
+
+    # ── 시청자 측 ─────────────────────────────────────────────
+    def mjpeg(self, channel_id, fps=None):
+        """MJPEG multipart 스트림 생성기 (프레임률 상한, 작업 종료 시 끝)"""
+        ch = self.channel(channel_id)
+        fps = fps if fps and fps > 0 else self.max_fps  # 0/음수/NaN → 기본값
+        interval = 1.0 / min(fps, self.max_fps)
+        last_seq = 0
+        while ch is not None:
+            with ch.cond:
+                ch.cond.wait_for(lambda: ch.seq != last_seq or ch.closed, timeout=15)
+                seq, frame, closed = ch.seq, ch.frame, ch.closed
+            if seq != last_seq and frame is not None:
+                last_seq = seq
+                yield (f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                       f"Content-Length: {len(frame)}\r\n\r\n").encode() + frame + b"\r\n"
+            if closed:
+                break
+            time.sleep(interval)
+
+    def stats(self):
+        with self._lock:
+            active = sum(1 for c in self._channels.values() if not c.closed)
+            total = len(self._channels)
+            viewers = sum(self._viewers.values())
+        return {"channels": total, "active": active, "max_fps": self.max_fps,
+                "viewers": viewers, "max_viewers": self.max_viewers, **self._counters}
@@ -0,0 +1,176 @@
+import os
+import json
+import logging
+import threading
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# ══════════════════════════════════════════════════════════════
+#  학습형 셀렉터/프레임 해석기
+# ══════════════════════════════════════════════════════════════
+# 논리 동작("buy", "purchase_confirm" 등)마다 마지막으로 성공한 프레임을 기억해
+# 다음에는 그 프레임에서만 호출 측 셀렉터 목록을 순서대로 짧은 타임아웃으로 먼저 시도한다.
+# 셀렉터는 기억하지 않는다 - "input[value='확인']" 같은 범용 셀렉터가 한 번 학습되면
+# 다른 버튼을 누르고도 성공으로 집계되므로, 항상 호출 측 우선순위(구체적 → 범용)를 따른다.
+# 실패할 때만 전체 탐색으로 내려가며, 기억은 프로세스 메모리 + JSON 파일에 남겨 재시작 후에도 유지된다.
+
+FAST_CLICK_MS = 1000
+FULL_CLICK_MS = 2000
+MAIN_FRAME = "__main__"
+
+CLICKS = metrics.counter(
+    "lotto_selector_clicks_total", "동작별 클릭 경로 (hit=학습 경로, fallback=전체 탐색, failure=실패)",
+    ("action", "path"))
+
+
+class SelectorResolver:
+    def __init__(self, path=None):
+        self.path = path
+        self._known = {}   # action → {"frame": 키}
+        self._stats = {}   # action → {"hits", "misses", "failures"}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._known = json.load(f)
+            logger.info(f"[SELECTOR] 학습된 경로 {len(self._known)}건 로드")
+        except Exception as e:
+            logger.warning(f"[SELECTOR] 로드 실패: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = dict(self._known)
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.warning(f"[SELECTOR] 저장 실패: {e}")
+
+    def _count(self, action, key):
+        with self._lock:
+            s = self._stats.setdefault(action, {"hits": 0, "misses": 0, "failures": 0})
+            s[key] += 1
+
+    @staticmethod
+    def _record(action, path, selector=None):
+        CLICKS.inc(action=action, path=path)
+        metrics.annotate(**{f"{action}_path": path, f"{action}_selector": selector})
+
+    # ── 프레임 식별 ───────────────────────────────────────────
+    @staticmethod
+    def _frame_key(page, frame):
+        if frame == page.main_frame:
+            return MAIN_FRAME
+        if frame.name:
+            return frame.name
+        return "url:" + frame.url.split('?')[0]
+
+    @staticmethod
+    def _find_frame(page, key):
+        if key == MAIN_FRAME:
+            return page.main_frame
+        if key.startswith("url:"):
+            url = key[4:]
+            return next((f for f in page.frames if f.url.split('?')[0] == url), None)
+        return page.frame(name=key)
+
+    @staticmethod
+    def _try_click(frame, selector, timeout):
+        try:
+            el = frame.locator(selector).first
+            if el.is_visible():
+                el.click(force=True, timeout=timeout)
+                return True
+        except Exception:
+            pass
+        return False
+
+    @staticmethod
+    async def _try_click_async(frame, selector, timeout):
+        try:
+            el = frame.locator(selector).first
+            if await el.is_visible():
+                await el.click(force=True, timeout=timeout)
+                return True
+        except Exception:
+            pass
+        return False
+
+    # ── 클릭 ──────────────────────────────────────────────────
+    def _known_frame(self, page, action):
+        """학습된 프레임 (없으면 None)"""
+        known = self._known.get(action)
+        return self._find_frame(page, known["frame"]) if known else None
+
+    @staticmethod
+    def _search_order(page, selectors, frame_names):
+        """전체 탐색 순서: 셀렉터마다 우선 프레임 → 전체 프레임 → 메인"""
+        for selector in selectors:
+            candidates = [page.frame(name=n) for n in frame_names]
+            candidates += list(page.frames) + [page.main_frame]
+            seen = set()
+            for frame in candidates:
+                if frame is None or id(frame) in seen:
+                    continue
+                seen.add(id(frame))
+                yield frame, selector
+
+    def _hit(self, action, selector):
+        self._count(action, "hits")
+        self._record(action, "hit", selector)
+        return selector
+
+    def _learn(self, page, action, frame, selector):
+        learned = {"frame": self._frame_key(page, frame)}
+        if self._known.get(action) != learned:
+            with self._lock:
+                self._known[action] = learned
+            self._save()
+            logger.info(f"[SELECTOR] '{action}' 경로 학습: {learned}")
+        self._record(action, "fallback", selector)
+        return selector
+
+    def _fail(self, action):
+        self._count(action, "failures")
+        self._record(action, "failure")
+        return None
+
+    def click(self, page, action, selectors, frame_names):
+        """action 에 해당하는 버튼 클릭 → 사용된 셀렉터 (실패 시 None)"""
+        frame = self._known_frame(page, action)
+        if frame:
+            for selector in selectors:
+                if self._try_click(frame, selector, FAST_CLICK_MS):
+                    return self._hit(action, selector)
+        self._count(action, "misses")
+        for frame, selector in self._search_order(page, selectors, frame_names):
+            if self._try_click(frame, selector, FULL_CLICK_MS):
+                return self._learn(page, action, frame, selector)
+        return self._fail(action)
+
+    async def click_async(self, page, action, selectors, frame_names):
+        """click() 의 playwright.async_api 판 (학습 경로/통계 공유)"""
+        frame = self._known_frame(page, action)
+        if frame:
+            for selector in selectors:
+                if await self._try_click_async(frame, selector, FAST_CLICK_MS):
+                    return self._hit(action, selector)
+        self._count(action, "misses")
+        for frame, selector in self._search_order(page, selectors, frame_names):
+            if await self._try_click_async(frame, selector, FULL_CLICK_MS):
+                return self._learn(page, action, frame, selector)
+        return self._fail(action)
+
+    def stats(self):
+        with self._lock:
+            return {"known": dict(self._known), "actions": {k: dict(v) for k, v in self._stats.items()}}
@@ -0,0 +1,201 @@
+import os
+import time
+import shutil
+import logging
+import threading
+import urllib.request
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# ══════════════════════════════════════════════════════════════
+#  백그라운드 자가 진단 (liveness / readiness 용 캐시)
+# ══════════════════════════════════════════════════════════════
+# 요청 경로에서는 절대 브라우저를 띄우지 않는다. 점검은 전용 스레드가 주기적으로 수행하고
+# 결과를 시각과 함께 보관 → /readyz, /diagnostic 은 저장된 값만 읽어 즉시 응답.
+#   browser  : PLAYWRIGHT_BROWSERS_PATH 의 Chromium 실행 파일 존재 + 실제 기동/종료 (드물게)
+#   disk     : 작업 디렉터리 여유 공간
+#   memory   : 가용 메모리 (cgroup 제한이 있으면 그 안에서의 여유분)
+#   upstream : 동행복권 메인 응답 여부 (참고용, 준비 상태에는 반영하지 않음)
+
+CRITICAL_CHECKS = ("browser", "disk", "memory")
+MIN_REFRESH_SEC = 60  # 외부 요청으로 앞당길 수 있는 최소 간격
+
+CHECK_OK = metrics.gauge("lotto_selftest_ok", "자가 진단 항목별 통과 여부 (1/0)", ("check",))
+CHECK_SECONDS = metrics.histogram("lotto_selftest_seconds", "자가 진단 항목별 소요 시간", ("check",))
+
+
+def _read_int(path):
+    try:
+        with open(path) as f:
+            value = f.read().strip()
+        return None if value == "max" else int(value)
+    except (OSError, ValueError):
+        return None
+
+
+def available_memory_bytes():
+    """MemAvailable 과 cgroup(v2/v1) 여유분 중 작은 값 (확인 불가 시 None)"""
+    candidates = []
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    candidates.append(int(line.split()[1]) * 1024)
+                    break
+    except OSError:
+        pass
+    for limit_path, usage_path in (("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current"),
+                                   ("/sys/fs/cgroup/memory/memory.limit_in_bytes",
+                                    "/sys/fs/cgroup/memory/memory.usage_in_bytes")):
+        limit, usage = _read_int(limit_path), _read_int(usage_path)
+        if limit and usage is not None and limit < 1 << 60:
+            candidates.append(limit - usage)
+            break
+    return min(candidates) if candidates else None
+
+
+class SelfTest:
+    def __init__(self, browsers_path=None, launch_options=None, upstream_url=None, work_dir=".",
+                 interval=60, browser_interval=1800, min_disk_mb=200, min_memory_mb=300, user_agent=None):
+        self.browsers_path = browsers_path
+        self.launch_options = launch_options  # chromium.launch kwargs 를 돌려주는 callable
+        self.upstream_url = upstream_url
+        self.work_dir = work_dir
+        self.interval = interval
+        self.browser_interval = browser_interval
+        self.min_disk_mb = min_disk_mb
+        self.min_memory_mb = min_memory_mb
+        self.user_agent = user_agent
+        self.started_at = time.time()
+        self._results = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._force_browser = False
+        self._thread = None
+
+    # ── 결과 ──────────────────────────────────────────────────
+    def _record(self, name, ok, started, **detail):
+        elapsed = time.perf_counter() - started
+        result = {"ok": bool(ok), "checked_at": time.time(), "duration_ms": round(elapsed * 1000, 1), **detail}
+        with self._lock:
+            previous = self._results.get(name)
+            self._results[name] = result
+        CHECK_OK.set(1 if ok else 0, check=name)
+        CHECK_SECONDS.observe(elapsed, check=name)
+        if previous is None or previous["ok"] != result["ok"]:  # 상태가 바뀔 때만 기록
+            if ok:
+                logger.info(f"[SELFTEST] {name} 정상")
+            else:
+                logger.warning(f"[SELFTEST] {name} 실패: {detail}")
+        return result
+
+    def results(self):
+        with self._lock:
+            return {k: dict(v) for k, v in self._results.items()}
+
+    def readiness(self):
+        """(준비 여부, 항목별 결과) - 필수 항목이 모두 최근에 통과했어야 준비 완료"""
+        results = self.results()
+        now = time.time()
+        stale_after = {"browser": self.browser_interval * 2 + 300}
+        ready = True
+        for name in CRITICAL_CHECKS:
+            r = results.get(name)
+            if r is None:
+                ready = False
+                continue
+            r["age_sec"] = round(now - r["checked_at"], 1)
+            r["stale"] = r["age_sec"] > stale_after.get(name, self.interval * 3 + 60)
+            ready = ready and r["ok"] and not r["stale"]
+        return ready, results
+
+    # ── 점검 항목 ─────────────────────────────────────────────
+    def check_disk(self):
+        started = time.perf_counter()
+        usage = shutil.disk_usage(self.work_dir)
+        free_mb = usage.free // (1024 * 1024)
+        return self._record("disk", free_mb >= self.min_disk_mb, started,
+                            free_mb=free_mb, min_mb=self.min_disk_mb)
+
+    def check_memory(self):
+        started = time.perf_counter()
+        avail = available_memory_bytes()
+        if avail is None:
+            return self._record("memory", True, started, available_mb=None, note="확인 불가")
+        avail_mb = avail // (1024 * 1024)
+        return self._record("memory", avail_mb >= self.min_memory_mb, started,
+                            available_mb=avail_mb, min_mb=self.min_memory_mb)
+
+    def check_upstream(self):
+        if not self.upstream_url:
+            return None
+        started = time.perf_counter()
+        headers = {"User-Agent": self.user_agent} if self.user_agent else {}
+        try:
+            req = urllib.request.Request(self.upstream_url, headers=headers, method="GET")
+            with urllib.request.urlopen(req, timeout=10) as resp:
+                status = resp.status
+            return self._record("upstream", status < 500, started, status=status, url=self.upstream_url)
+        except Exception as e:
+            return self._record("upstream", False, started, error=str(e)[:200], url=self.upstream_url)
+
+    def check_browser(self):
+        """실행 파일 확인 후 실제로 한 번 기동해 봄 (이 스레드 전용 Playwright 인스턴스)"""
+        started = time.perf_counter()
+        detail = {"browsers_path": self.browsers_path}
+        try:
+            from playwright.sync_api import sync_playwright
+            with sync_playwright() as p:
+                exe = p.chromium.executable_path
+                detail["executable"] = exe
+                if not exe or not os.path.exists(exe):
+                    return self._record("browser", False, started, error="Chromium 실행 파일 없음", **detail)
+                options = dict(self.launch_options() if self.launch_options else {})
+                options.update(headless=True, proxy=None)
+                browser = p.chromium.launch(**options)
+                detail["version"] = browser.version
+                browser.close()
+            return self._record("browser", True, started, **detail)
+        except Exception as e:
+            return self._record("browser", False, started, error=str(e)[:300], **detail)
+
+    # ── 실행 ──────────────────────────────────────────────────
+    def run_once(self, include_browser=True):
+        self.check_disk()
+        self.check_memory()
+        self.check_upstream()
+        if include_browser:
+            self.check_browser()
+
+    def request_refresh(self, include_browser=False):
+        """다음 점검을 앞당김 (요청 스레드는 기다리지 않음) → 접수 여부"""
+        with self._lock:
+            last = self._results.get("browser" if include_browser else "disk", {}).get("checked_at", 0)
+        if time.time() - last < MIN_REFRESH_SEC:
+            return False
+        self._force_browser = self._force_browser or include_browser
+        self._wake.set()
+        return True
+
+    def start(self):
+        if self._thread:
+            return
+
+        def loop():
+            last_browser = 0.0
+            while True:
+                due = self._force_browser or time.time() - last_browser >= self.browser_interval
+                try:
+                    self.run_once(include_browser=due)
+                except Exception as e:
+                    logger.error(f"[SELFTEST] 점검 오류: {e}")
+                if due:
+                    last_browser = time.time()
+                    self._force_browser = False
+                self._wake.wait(self.interval)
+                self._wake.clear()
+
+        self._thread = threading.Thread(target=loop, name="selftest", daemon=True)
+        self._thread.start()
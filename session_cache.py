@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import hmac
+import base64
+import hashlib
+import logging
+import secrets
+import threading
+from collections import OrderedDict
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # cryptography 미설치 시 세션 캐시 비활성화
+    Fernet = None
+    InvalidToken = Exception
+
+logger = logging.getLogger(__name__)
+
+# ══════════════════════════════════════════════════════════════
+#  계정별 로그인 세션 캐시 (Playwright storage_state)
+# ══════════════════════════════════════════════════════════════
+# - 키: 계정 ID의 HMAC (파일명에 원문 ID가 남지 않음)
+# - 값: storage_state(JSON)를 Fernet으로 암호화한 토큰 (메모리/디스크 모두 암호문)
+# - 비밀번호가 다르면 캐시를 쓰지 않는다 (세션 탈취 방지용 검증값 저장)
+# - TTL 만료 + LRU 축출, 디스크 저장은 SESSION_CACHE_KEY 가 설정된 경우에만
+
+class SessionCache:
+    def __init__(self, directory=None, secret=None, ttl=1800, max_entries=100):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = Fernet is not None
+        # 고정 키가 없으면 프로세스 한정 임시 키 → 재시작 후 복호화 불가하므로 디스크 저장 생략
+        self.directory = directory if (directory and secret) else None
+        secret = secret or secrets.token_hex(32)
+        self._mac_key = hashlib.sha256(b"account:" + secret.encode()).digest()
+        if self.enabled:
+            self._fernet = Fernet(base64.urlsafe_b64encode(hashlib.sha256(b"state:" + secret.encode()).digest()))
+        self._entries = OrderedDict()  # account_key → (created_at, token)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+        if not self.enabled:
+            logger.warning("[SESSION] cryptography 미설치 → 세션 캐시 비활성화")
+        elif self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self._load_from_disk()
+
+    def _account_key(self, user_id):
+        return hmac.new(self._mac_key, user_id.encode(), hashlib.sha256).hexdigest()[:32]
+
+    def _pw_verifier(self, user_id, user_pw):
+        return hmac.new(self._mac_key, f"{user_id}\0{user_pw}".encode(), hashlib.sha256).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.bin")
+
+    def _load_from_disk(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".bin"):
+                path = os.path.join(self.directory, name)
+                files.append((os.path.getmtime(path), name[:-4], path))
+        # 오래된 것부터 넣어 LRU 순서 복원
+        for mtime, key, path in sorted(files):
+            if time.time() - mtime > self.ttl:
+                self._remove_file(key)
+                continue
+            try:
+                with open(path, "rb") as f:
+                    self._entries[key] = (mtime, f.read())
+            except OSError:
+                pass
+        self._evict()
+        logger.info(f"[SESSION] 디스크 세션 {len(self._entries)}건 로드")
+
+    def _remove_file(self, key):
+        if self.directory:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            self._remove_file(key)
+            self._counters["evictions"] += 1
+
+    def get(self, user_id, user_pw):
+        """유효한 storage_state(dict) 또는 None"""
+        if not self.enabled:
+            return None
+        key = self._account_key(user_id)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self._counters["misses"] += 1
+                return None
+            created_at, token = item
+            if time.time() - created_at > self.ttl:
+                del self._entries[key]
+                self._remove_file(key)
+                self._counters["expired"] += 1
+                return None
+            self._entries.move_to_end(key)
+        try:
+            payload = json.loads(self._fernet.decrypt(token))
+        except (InvalidToken, ValueError):
+            self.invalidate(user_id)
+            return None
+        if not hmac.compare_digest(payload.get("pw", ""), self._pw_verifier(user_id, user_pw)):
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+        with self._lock:
+            self._counters["hits"] += 1
+        return payload["state"]
+
+    def put(self, user_id, user_pw, storage_state):
+        if not self.enabled:
+            return
+        key = self._account_key(user_id)
+        payload = {"pw": self._pw_verifier(user_id, user_pw), "state": storage_state}
+        token = self._fernet.encrypt(json.dumps(payload).encode())
+        with self._lock:
+            self._entries[key] = (time.time(), token)
+            self._entries.move_to_end(key)
+            self._evict()
+        if self.directory:
+            tmp = self._path(key) + ".tmp"
+            try:
+                with open(tmp, "wb") as f:
+                    f.write(token)
+                os.chmod(tmp, 0o600)
+                os.replace(tmp, self._path(key))
+            except OSError as e:
+                logger.warning(f"[SESSION] 디스크 저장 실패: {e}")
+
+    def invalidate(self, user_id):
+        key = self._account_key(user_id)
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._counters["invalidations"] += 1
+        self._remove_file(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "persistent": bool(self.directory),
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                **self._counters,
+            }
@@ -0,0 +1,124 @@
+import os
+import re
+import gzip
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# ══════════════════════════════════════════════════════════════
+#  프런트엔드 정적 자산 파이프라인 (기동 시 1회 빌드)
+# ══════════════════════════════════════════════════════════════
+# - lotto_ai.html 의 인라인 <style>/<script> 를 내용 해시 파일명(app.<hash>.css/js)으로 분리
+# - 각 자산과 HTML 셸의 gzip / brotli(모듈 있으면) 변형을 미리 만들어 메모리에 보관
+# - 해시 자산은 immutable 로 1년 캐시, HTML 셸은 no-cache + ETag 로 304 재검증
+# - 원본 HTML 이 바뀌면(mtime) 다음 요청에서 다시 빌드
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ASSET_PREFIX = "/assets/"
+IMMUTABLE = "public, max-age=31536000, immutable"
+SHELL_CACHE = "no-cache"
+INLINE_STYLE = re.compile(r"<style>(.*?)</style>", re.S)
+INLINE_SCRIPT = re.compile(r"<script>(.*?)</script>", re.S)
+CONTENT_TYPES = {
+    "css": "text/css; charset=utf-8",
+    "js": "application/javascript; charset=utf-8",
+    "html": "text/html; charset=utf-8",
+}
+
+
+class Asset:
+    """한 자산의 원본/압축 변형 + ETag"""
+    def __init__(self, name, body, kind):
+        self.name = name
+        self.content_type = CONTENT_TYPES[kind]
+        self.digest = hashlib.sha256(body).hexdigest()[:16]
+        self.variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(body, quality=11)
+
+    def pick(self, accept_encoding):
+        """Accept-Encoding 에 맞는 (인코딩, 본문, ETag)"""
+        accepted = {e.split(";")[0].strip().lower() for e in (accept_encoding or "").split(",")}
+        for enc in ("br", "gzip"):
+            if enc in self.variants and enc in accepted:
+                return enc, self.variants[enc], f'"{self.digest}-{enc}"'
+        return "identity", self.variants["identity"], f'"{self.digest}"'
+
+    def sizes(self):
+        return {enc: len(body) for enc, body in self.variants.items()}
+
+
+class AssetPipeline:
+    def __init__(self, html_path):
+        self.html_path = html_path
+        self._mtime = None
+        self._shell = None
+        self._assets = {}
+        self._lock = threading.Lock()
+        self._counters = {"builds": 0, "shell_200": 0, "shell_304": 0, "asset_200": 0, "asset_304": 0}
+
+    def _build(self):
+        with open(self.html_path, "rb") as f:
+            html = f.read().decode("utf-8")
+        assets = {}
+
+        def extract(pattern, kind, tag):
+            def repl(m):
+                body = m.group(1).strip().encode("utf-8")
+                digest = hashlib.sha256(body).hexdigest()[:12]
+                name = f"app.{digest}.{kind}"
+                assets[name] = Asset(name, body, kind)
+                return tag.format(url=ASSET_PREFIX + name)
+            return pattern.sub(repl, html)
+
+        html = extract(INLINE_STYLE, "css", '<link rel="stylesheet" href="{url}">')
+        html = extract(INLINE_SCRIPT, "js", '<script src="{url}"></script>')
+        shell = Asset("index.html", html.encode("utf-8"), "html")
+        self._shell, self._assets = shell, assets
+        self._counters["builds"] += 1
+        logger.info(f"[ASSETS] 빌드 완료: 셸 {shell.sizes()} + "
+                    + ", ".join(f"{a.name} {a.sizes()}" for a in assets.values()))
+
+    def _ensure_fresh(self):
+        try:
+            mtime = os.path.getmtime(self.html_path)
+        except OSError:
+            mtime = None
+        if mtime != self._mtime or self._shell is None:
+            with self._lock:
+                if mtime != self._mtime or self._shell is None:
+                    self._build()
+                    self._mtime = mtime
+
+    def build(self):
+        """기동 시 미리 빌드 (실패해도 첫 요청에서 재시도)"""
+        try:
+            self._ensure_fresh()
+        except Exception as e:
+            logger.error(f"[ASSETS] 빌드 실패: {e}")
+
+    def shell(self):
+        self._ensure_fresh()
+        return self._shell
+
+    def asset(self, name):
+        self._ensure_fresh()
+        return self._assets.get(name)
+
+    def count(self, key):
+        self._counters[key] += 1
+
+    def stats(self):
+        shell = self._shell
+        return {
+            "brotli": brotli is not None,
+            "shell": shell.sizes() if shell else None,
+            "assets": {name: a.sizes() for name, a in self._assets.items()},
+            **self._counters,
+        }
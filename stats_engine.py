@@ -0,0 +1,145 @@
+import json
+import hashlib
+import threading
+
+import numpy as np
+
+# ══════════════════════════════════════════════════════════════
+#  당첨번호 통계 엔진 (NumPy 벡터 연산)
+# ══════════════════════════════════════════════════════════════
+# 회차×45 출현 행렬을 기준으로 번호별 빈도, 번호쌍 동시출현(45×45),
+# 미출현(overdue) 간격, 홀짝/고저/합계 분포, 최근 N회 구간 빈도를 계산한다.
+# 새 회차가 이어서 들어오면 누적 행렬만 갱신(증분)하고, 결과는 미리 만들어 둔다.
+
+WINDOWS = (10, 50, 100)
+LOW_MAX = 22         # 1~22 저번호 / 23~45 고번호
+SUM_BIN = 10         # 합계 분포 구간 폭
+
+
+class StatsEngine:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+        self._snapshot = None
+        self._etag = None
+
+    def _reset(self):
+        self.rounds = np.zeros(0, dtype=np.int32)
+        self.hits = np.zeros((0, 45), dtype=bool)      # 회차별 본번호 출현
+        self.bonus = np.zeros(0, dtype=np.int8)
+        self.freq = np.zeros(45, dtype=np.int64)
+        self.bonus_freq = np.zeros(45, dtype=np.int64)
+        self.pairs = np.zeros((45, 45), dtype=np.int64)
+
+    @property
+    def last_round(self):
+        return int(self.rounds[-1]) if len(self.rounds) else 0
+
+    def update(self, draws):
+        """draws: 회차 오름차순 결과 리스트 → 새 회차만 반영, 변경 시 True"""
+        with self._lock:
+            new = [d for d in draws if d['round'] > self.last_round]
+            if not new and len(draws) == len(self.rounds):
+                return False
+            contiguous = bool(new) and len(self.rounds) + len(new) == len(draws)
+            if contiguous:
+                self._append(new)
+            else:
+                # 중간 회차가 새로 채워진 경우(백필) → 전체 재계산
+                self._reset()
+                self._append(draws)
+            self._snapshot = self._build()
+            body = json.dumps(self._snapshot, sort_keys=True).encode()
+            self._etag = hashlib.sha1(body).hexdigest()[:16]
+            return True
+
+    def _append(self, draws):
+        if not draws:
+            return
+        nums = np.array([d['numbers'] for d in draws], dtype=np.int64) - 1
+        rows = np.zeros((len(draws), 45), dtype=bool)
+        rows[np.arange(len(draws))[:, None], nums] = True
+        bonus = np.array([d['bonus'] for d in draws], dtype=np.int8)
+
+        r = rows.astype(np.int64)
+        self.freq += r.sum(axis=0)
+        self.pairs += r.T @ r
+        np.add.at(self.bonus_freq, bonus.astype(np.int64) - 1, 1)
+
+        self.rounds = np.concatenate([self.rounds, [d['round'] for d in draws]]).astype(np.int32)
+        self.hits = np.vstack([self.hits, rows])
+        self.bonus = np.concatenate([self.bonus, bonus])
+
+    def _build(self):
+        n = len(self.rounds)
+        if n == 0:
+            return {"rounds": 0}
+        numbers = np.arange(1, 46)
+        hits = self.hits
+
+        # 미출현 간격: 마지막 출현 이후 지난 회차 수 (한 번도 안 나오면 전체 회차 수)
+        seen = hits.any(axis=0)
+        last_idx = np.where(seen, n - 1 - np.argmax(hits[::-1], axis=0), -1)
+        overdue = (n - 1) - last_idx
+        mean_gap = np.where(self.freq > 0, n / np.maximum(self.freq, 1), float(n))
+
+        # 회차별 홀짝/고저/합계
+        idx = np.nonzero(hits)[1].reshape(n, 6) + 1
+        odd = (idx % 2 == 1).sum(axis=1)
+        low = (idx <= LOW_MAX).sum(axis=1)
+        sums = idx.sum(axis=1)
+        sum_edges = np.arange(20, 260 + SUM_BIN, SUM_BIN)
+        sum_hist, _ = np.histogram(sums, bins=sum_edges)
+
+        # 최근 N회 구간 빈도 (누적합 차분)
+        cum = np.vstack([np.zeros((1, 45), dtype=np.int64), np.cumsum(hits, axis=0, dtype=np.int64)])
+        windows = {str(w): (cum[-1] - cum[max(n - w, 0)]).tolist() for w in WINDOWS}
+
+        order = np.argsort(-self.freq, kind='stable')
+        pairs = self.pairs.copy()
+        np.fill_diagonal(pairs, 0)
+        iu = np.triu_indices(45, k=1)
+        top_pair_idx = np.argsort(-pairs[iu], kind='stable')[:10]
+
+        return {
+            "rounds": n,
+            "first_round": int(self.rounds[0]),
+            "last_round": self.last_round,
+            "frequency": self.freq.tolist(),
+            "bonus_frequency": self.bonus_freq.tolist(),
+            "top_numbers": (numbers[order][:20]).tolist(),
+            "pairs": pairs.tolist(),
+            "top_pairs": [
+                {"pair": [int(iu[0][k]) + 1, int(iu[1][k]) + 1], "count": int(pairs[iu][k])}
+                for k in top_pair_idx
+            ],
+            "overdue": overdue.tolist(),
+            "mean_gap": np.round(mean_gap, 2).tolist(),
+            "odd_even": np.bincount(odd, minlength=7).tolist(),      # 홀수 개수 0~6
+            "low_high": np.bincount(low, minlength=7).tolist(),      # 저번호 개수 0~6
+            "sum": {
+                "mean": round(float(sums.mean()), 2),
+                "std": round(float(sums.std()), 2),
+                "bin_edges": sum_edges.tolist(),
+                "histogram": sum_hist.tolist(),
+            },
+            "windows": windows,
+        }
+
+    def snapshot(self):
+        """(etag, 미리 계산된 결과)"""
+        with self._lock:
+            return self._etag, self._snapshot
+
+    def frequency(self):
+        """번호별 누적 출현 횟수 사본 (길이 45)"""
+        with self._lock:
+            return self.freq.copy()
+
+    def weights(self):
+        """번호별 출현 확률 가중치 (길이 45, 합 1) - 추천 등에서 사용"""
+        with self._lock:
+            total = self.freq.sum()
+            if total == 0:
+                return np.full(45, 1 / 45)
+            return self.freq / total
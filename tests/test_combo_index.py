@@ -0,0 +1,111 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import combo_index as combos
+from combo_index import ComboIndex, TOTAL
+from lotto_match import numbers_to_mask, mask_to_numbers
+
+
+def test_rank_bounds():
+    assert combos.rank([1, 2, 3, 4, 5, 6]) == 0
+    assert combos.rank([40, 41, 42, 43, 44, 45]) == TOTAL - 1
+
+
+def test_rank_ignores_input_order():
+    assert combos.rank([45, 3, 17, 1, 30, 22]) == combos.rank([1, 3, 17, 22, 30, 45])
+
+
+def test_rank_unrank_round_trip_sampled():
+    rng = np.random.default_rng(0)
+    ranks = np.concatenate([[0, 1, TOTAL - 2, TOTAL - 1], rng.integers(0, TOTAL, size=5000)])
+    numbers = combos.unrank_many(ranks)
+    assert numbers.shape == (len(ranks), 6)
+    assert (np.diff(numbers, axis=1) > 0).all()
+    assert numbers.min() >= 1 and numbers.max() <= 45
+    assert (combos.rank_many(numbers) == ranks).all()
+    assert combos.unrank(int(ranks[10])) == numbers[10].tolist()
+
+
+def test_rank_is_dense_on_small_prefix():
+    # 번호 1~12 로 만든 조합은 rank 0 … C(12,6)-1 을 빈틈없이 채움
+    ranks = sorted(combos.rank(c) for c in itertools.combinations(range(1, 13), 6))
+    assert ranks == list(range(len(ranks)))
+
+
+def test_masks_to_combos_matches_numbers():
+    picks = [[1, 2, 3, 4, 5, 6], [7, 14, 21, 28, 35, 45]]
+    masks = np.array([numbers_to_mask(p) for p in picks], dtype=np.uint64)
+    assert combos.masks_to_combos(masks).tolist() == picks
+    assert mask_to_numbers(int(masks[1])) == picks[1]
+    with pytest.raises(ValueError):
+        combos.masks_to_combos(np.array([numbers_to_mask([1, 2, 3])], dtype=np.uint64))
+
+
+def test_record_and_rebuild_picks(tmp_path):
+    index = ComboIndex(str(tmp_path))
+    a, b = combos.rank([1, 2, 3, 4, 5, 6]), combos.rank([10, 11, 12, 13, 14, 15])
+    index.record_picks(100, [a, a, b])
+    assert index.pick_counts(100, [a, b]).tolist() == [2, 1]
+    index.record_picks(100, [a], delta=-1)
+    index.record_picks(100, [b, b], delta=-1)  # 0 미만으로 내려가지 않음
+    assert index.pick_counts(100, [a, b]).tolist() == [1, 0]
+    index.rebuild_round(100, [b])
+    assert index.round_summary(100) == {"round": 100, "distinct": 1, "picks": 1, "max": 1}
+
+
+def test_picks_persist_across_reopen(tmp_path):
+    rank = combos.rank([3, 9, 18, 27, 36, 44])
+    ComboIndex(str(tmp_path)).record_picks(7, [rank] * 300)  # 255 에서 포화
+    reopened = ComboIndex(str(tmp_path))
+    assert reopened.has_round(7)
+    assert reopened.pick_counts(7, [rank]).tolist() == [255]
+
+
+def test_prune_keeps_recent_rounds_only(tmp_path):
+    for name in ("picks--1.bits", "picks-0.bits", "picks-007.bits", "picks-9.u8"):
+        (tmp_path / name).write_bytes(b"")
+    index = ComboIndex(str(tmp_path), keep_rounds=2)
+    for round_no in (1, 2, 3):
+        index.record_picks(round_no, [0])
+    assert sorted(p.name for p in tmp_path.glob("picks-*")) == \
+        ["picks-2.bits", "picks-2.cnt", "picks-3.bits", "picks-3.cnt"]
+    with pytest.raises(ValueError):
+        index.has_round(0)
+
+
+def test_reads_do_not_create_rounds(tmp_path):
+    index = ComboIndex(str(tmp_path))
+    assert index.pick_counts(42, [0, 1]).tolist() == [0, 0]
+    assert index.round_summary(42) == {"round": 42, "distinct": 0, "picks": 0, "max": 0}
+    assert len(index.sample_unpicked(42, 10, seed=0)) == 10
+    assert index.record_picks(42, [0], create=False) is False
+    assert not index.has_round(42)
+    assert list(tmp_path.glob("picks-*")) == []
+
+
+def test_multi_counts_persist_and_summary(tmp_path):
+    a, b, c = (combos.rank(n) for n in ([1, 2, 3, 4, 5, 6], [2, 3, 4, 5, 6, 7], [3, 4, 5, 6, 7, 8]))
+    ComboIndex(str(tmp_path)).record_picks(9, [a, a, a, b, c, c])
+    index = ComboIndex(str(tmp_path))
+    assert index.pick_counts(9, [a, b, c]).tolist() == [3, 1, 2]
+    assert index.round_summary(9) == {"round": 9, "distinct": 3, "picks": 6, "max": 3}
+    index.record_picks(9, [a, a, c], delta=-1)
+    assert index.pick_counts(9, [a, b, c]).tolist() == [1, 1, 1]
+    assert (tmp_path / "picks-9.cnt").stat().st_size == 0
+    assert index.stats()["bytes"]["total"] < 3 * 1024 * 1024
+
+
+def test_winners_and_unpicked_sampling(tmp_path):
+    index = ComboIndex(str(tmp_path))
+    draws = [{"round": 1, "numbers": [1, 2, 3, 4, 5, 6]}, {"round": 2, "numbers": [1, 2, 3, 4, 5, 6]}]
+    assert index.sync_winners(draws) == 1
+    assert index.has_won([0, 1]).tolist() == [True, False]
+    assert index.won_rounds(0) == [1, 2]
+    picked = combos.rank([8, 9, 10, 11, 12, 13])
+    index.record_picks(5, [picked])
+    sample = index.sample_unpicked(5, 50, seed=1)
+    assert len(sample) == 50 and len(set(sample.tolist())) == 50
+    assert (index.pick_counts(5, sample) == 0).all()
+    assert not index.has_won(sample).any()
@@ -0,0 +1,63 @@
+import pytest
+
+import draw_archive
+from draw_archive import DrawArchive
+
+LATEST = 1000
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    monkeypatch.setattr(draw_archive.draw_calendar, "latest_drawn_round", lambda now=None: LATEST)
+    a = DrawArchive(str(tmp_path / "draws.json"))
+    a.calls = []
+
+    def fetch(drw_no):
+        a.calls.append(drw_no)
+        if drw_no > LATEST:
+            return None
+        return {"round": drw_no, "date": "2026-01-01", "numbers": [1, 2, 3, 4, 5, 6], "bonus": 7}
+    monkeypatch.setattr(a, "_fetch_upstream", fetch)
+    return a
+
+
+@pytest.mark.parametrize("drw_no", [-3, 0, LATEST + 2, 10 ** 9, True, "5"])
+def test_out_of_range_rounds_never_reach_upstream(archive, drw_no):
+    with pytest.raises(ValueError):
+        archive.get(drw_no)
+    assert archive.calls == []
+    assert archive.stats()["pending_misses"] == archive.stats()["pending_errors"] == 0
+
+
+def test_next_round_is_allowed_and_remembered_as_miss(archive):
+    assert archive.get(LATEST + 1) is None
+    assert archive.get(LATEST + 1) is None
+    assert archive.calls == [LATEST + 1]
+
+
+def test_errors_are_cached_then_expire(archive, monkeypatch):
+    def down(drw_no):
+        archive.calls.append(drw_no)
+        raise OSError("down")
+    monkeypatch.setattr(archive, "_fetch_upstream", down)
+    for _ in range(2):
+        with pytest.raises(OSError):
+            archive.get(5)
+    assert archive.calls == [5]
+    archive._errors[5] = (0, OSError("down"))  # 재시도 시각 경과
+    with pytest.raises(OSError):
+        archive.get(6)
+    assert 5 not in archive._errors  # 새 기록 시 만료분 정리
+
+
+def test_latest_falls_back_to_archived_draw(archive, monkeypatch):
+    archive.get(LATEST - 5)
+    monkeypatch.setattr(archive, "_fetch_upstream", lambda n: (_ for _ in ()).throw(OSError("down")))
+    assert archive.latest()["round"] == LATEST - 5
+
+
+def test_backfill_is_newest_first_and_capped(archive, tmp_path):
+    archive.get(LATEST)
+    assert archive.backfill(limit=3, pause=0) == 3
+    assert archive.calls == [LATEST, LATEST - 1, LATEST - 2, LATEST - 3]
+    assert DrawArchive(str(tmp_path / "draws.json")).rounds() == [LATEST - 3, LATEST - 2, LATEST - 1, LATEST]
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import draw_calendar as cal
+from draw_calendar import KST
+
+ROUND = 1200
+DRAW = cal.draw_date(ROUND)  # 추첨일(토) 00:00 KST
+
+
+def at(days=0, hours=0, minutes=0):
+    return DRAW + timedelta(days=days, hours=hours, minutes=minutes)
+
+
+def test_draw_dates_are_weekly_saturdays():
+    assert cal.draw_date(1) == datetime(2002, 12, 7, tzinfo=KST)
+    assert cal.draw_date(ROUND + 1) - DRAW == timedelta(weeks=1)
+    assert DRAW.weekday() == 5
+
+
+def test_latest_drawn_round_switches_at_result_hour():
+    assert cal.latest_drawn_round(at(hours=20, minutes=59)) == ROUND - 1
+    assert cal.latest_drawn_round(at(hours=21)) == ROUND
+    assert cal.latest_drawn_round(at(days=6, hours=23)) == ROUND
+    assert cal.next_result_time(at(hours=20)) == at(hours=21)
+    assert cal.next_result_time(at(hours=21)) == at(days=7, hours=21)
+
+
+def test_sales_round_moves_at_saturday_close():
+    assert cal.sales_round(at(days=-6, hours=6)) == ROUND
+    assert cal.sales_round(at(hours=19, minutes=59)) == ROUND
+    assert cal.sales_round(at(hours=20)) == ROUND + 1
+    assert cal.sales_round(at(days=1, hours=5)) == ROUND + 1
+
+
+def test_sales_round_accepts_other_timezones():
+    utc = at(hours=19, minutes=59).astimezone(cal.timezone.utc)
+    assert cal.sales_round(utc) == ROUND
+
+
+def test_sales_open_during_the_week():
+    status = cal.sales_status(at(days=-3, hours=12))
+    assert status["open"] and status["reason"] is None and status["reopens_at"] is None
+    assert status["round"] == ROUND
+    assert status["draw_date"] == DRAW.strftime("%Y-%m-%d")
+    assert status["closes_at"] == at(hours=20).isoformat()
+
+
+def test_overnight_closure():
+    status = cal.sales_status(at(days=-3, hours=3))
+    assert not status["open"] and "심야" in status["reason"]
+    assert status["reopens_at"] == at(days=-3, hours=6).isoformat()
+    assert cal.sales_status(at(days=-3, hours=6))["open"]
+
+
+def test_saturday_cutoff_until_sunday_morning():
+    for moment in (at(hours=20), at(hours=23, minutes=59), at(days=1, hours=5, minutes=59)):
+        status = cal.sales_status(moment)
+        assert not status["open"] and status["reason"] == "추첨일 판매 마감"
+        assert status["round"] == ROUND + 1
+        assert status["reopens_at"] == at(days=1, hours=6).isoformat()
+    assert cal.sales_status(at(days=1, hours=6))["open"]
+    assert cal.sales_status(at(hours=19, minutes=59))["open"]
@@ -0,0 +1,43 @@
+import numpy as np
+
+import lotto_match
+from lotto_match import numbers_to_mask
+
+
+def _masks(*picks):
+    return np.array([numbers_to_mask(p) for p in picks], dtype=np.uint64)
+
+
+WIN = [1, 2, 3, 4, 5, 6]
+BONUS = 7
+
+
+def test_popcount_matches_python():
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 1 << 45, size=1000, dtype=np.uint64)
+    assert lotto_match.popcount(values).tolist() == [bin(int(v)).count("1") for v in values]
+
+
+def test_check_own_round_ranks():
+    tickets = _masks(WIN, [1, 2, 3, 4, 5, 7], [1, 2, 3, 4, 5, 45], [1, 2, 3, 4, 44, 45],
+                     [1, 2, 3, 43, 44, 45], [1, 2, 42, 43, 44, 45], WIN)
+    rounds = [10, 10, 10, 10, 10, 10, 11]  # 11회는 아직 추첨 전
+    matches, rank, drawn = lotto_match.check_own_round(
+        tickets, rounds, [9, 10], _masks([40, 41, 42, 43, 44, 45], WIN), _masks([1], [BONUS]))
+    assert rank.tolist() == [1, 2, 3, 4, 5, 0, 0]
+    assert matches.tolist() == [6, 5, 5, 4, 3, 2, -1]
+    assert drawn.tolist() == [True] * 6 + [False]
+
+
+def test_check_own_round_without_draws():
+    matches, rank, drawn = lotto_match.check_own_round(_masks(WIN), [1], [], [], [])
+    assert matches.tolist() == [-1] and rank.tolist() == [0] and drawn.tolist() == [False]
+
+
+def test_check_all_rounds_best_and_distribution(monkeypatch):
+    monkeypatch.setattr(lotto_match, "CHUNK_CELLS", 2)  # 청크 경계도 함께 확인
+    tickets = _masks(WIN, [1, 2, 3, 43, 44, 45], [20, 21, 22, 23, 24, 25])
+    draws = _masks(WIN, [1, 2, 3, 4, 5, 45])
+    best, dist = lotto_match.check_all_rounds(tickets, draws, _masks([BONUS], [6]))
+    assert best.tolist() == [1, 4, 0]
+    assert dist.tolist() == [[0, 1, 1, 0, 0, 0], [0, 0, 0, 0, 1, 1], [2, 0, 0, 0, 0, 0]]
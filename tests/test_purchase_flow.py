@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+
+from purchase_flow import Abort, Retry, Rewind, Step, StepFlow
+
+_real_delay = Step.delay  # no_backoff 로 바꾸기 전 원본
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(Step, "delay", lambda self, attempt: 0)
+
+
+def _failing(times, error=Retry):
+    """처음 times 번은 error, 그 뒤로 성공 (시도 번호 기록)"""
+    calls = []
+
+    def fn(attempt):
+        calls.append(attempt)
+        if len(calls) <= times:
+            raise error("일시 오류")
+    fn.calls = calls
+    return fn
+
+
+def _ok(log, name):
+    return lambda attempt: log.append(name)
+
+
+def test_runs_steps_in_order_with_checkpoints():
+    log, events = [], []
+    flow = StepFlow([Step("login", _ok(log, "login"), message="로그인"), Step("buy", _ok(log, "buy"))],
+                    progress=lambda step, msg="": events.append((step, msg)))
+    flow.run()
+    assert log == ["login", "buy"]
+    assert flow.completed == ["login", "buy"]
+    assert events == [("login", "로그인")]
+    assert flow.summary()["failed_step"] is None
+
+
+def test_retry_reruns_only_the_failed_step():
+    log = []
+    flaky = _failing(2)
+    flow = StepFlow([Step("login", _ok(log, "login")), Step("buy", flaky, retries=2)])
+    flow.run()
+    assert log == ["login"]
+    assert flaky.calls == [1, 2, 3]
+    assert flow.retries == {"buy": 2}
+    assert flow.checkpoints[-1]["attempts"] == 3
+
+
+def test_retry_on_treats_listed_errors_as_transient():
+    flaky = _failing(1, TimeoutError)
+    flow = StepFlow([Step("open", flaky, retries=1, retry_on=(TimeoutError,))])
+    flow.run()
+    assert flaky.calls == [1, 2]
+
+
+def test_retry_budget_exhausted_raises_last_error():
+    flaky = _failing(5)
+    flow = StepFlow([Step("buy", flaky, retries=2)])
+    with pytest.raises(Retry):
+        flow.run()
+    assert flaky.calls == [1, 2, 3]
+    assert flow.failed_step == "buy" and flow.completed == []
+
+
+def test_abort_stops_without_retrying():
+    log = []
+    aborting = _failing(1, Abort)
+    flow = StepFlow([Step("login", _ok(log, "login")), Step("buy", aborting, retries=3),
+                     Step("confirm", _ok(log, "confirm"))])
+    with pytest.raises(Abort, match="일시 오류"):
+        flow.run()
+    assert aborting.calls == [1]
+    assert log == ["login"]
+    assert flow.summary() == {"completed": ["login"], "failed_step": "buy", "retries": {},
+                              "rewinds": 0, "checkpoints": flow.checkpoints}
+
+
+def test_unexpected_error_is_not_retried():
+    broken = _failing(1, KeyError)
+    flow = StepFlow([Step("buy", broken, retries=3)])
+    with pytest.raises(KeyError):
+        flow.run()
+    assert broken.calls == [1]
+
+
+def test_rewind_restarts_from_earlier_checkpoint():
+    log = []
+    state = {"rewound": False}
+
+    def confirm(attempt):
+        log.append("confirm")
+        if not state["rewound"]:
+            state["rewound"] = True
+            raise Rewind("login", "세션 만료")
+
+    flow = StepFlow([Step("login", _ok(log, "login")), Step("buy", _ok(log, "buy")),
+                     Step("confirm", confirm)])
+    flow.run()
+    assert log == ["login", "buy", "confirm", "login", "buy", "confirm"]
+    assert flow.rewinds == 1
+    assert flow.completed == ["login", "buy", "confirm"]
+
+
+def test_rewind_limit_and_forward_target_fail():
+    always = lambda attempt: (_ for _ in ()).throw(Rewind("login"))
+    flow = StepFlow([Step("login", lambda a: None), Step("buy", always)], max_rewinds=1)
+    with pytest.raises(Rewind):
+        flow.run()
+    assert flow.rewinds == 1 and flow.failed_step == "buy"
+
+    forward = StepFlow([Step("login", lambda a: (_ for _ in ()).throw(Rewind("buy"))),
+                        Step("buy", lambda a: None)])
+    with pytest.raises(Rewind):
+        forward.run()
+    assert forward.rewinds == 0 and forward.failed_step == "login"
+
+
+def test_run_async_follows_same_rules():
+    calls = []
+
+    async def flaky(attempt):
+        calls.append(attempt)
+        if attempt == 1:
+            raise Retry("잠시 후")
+
+    async def aborting(attempt):
+        raise Abort("잔액 부족")
+
+    flow = StepFlow([Step("buy", flaky, retries=1), Step("pay", aborting, retries=3)])
+    with pytest.raises(Abort):
+        asyncio.run(flow.run_async())
+    assert calls == [1, 2]
+    assert flow.completed == ["buy"] and flow.failed_step == "pay"
+
+
+def test_delay_is_capped_exponential_backoff():
+    step = Step("buy", None, backoff=0.5, max_backoff=2.0)
+    for attempt, base in ((1, 0.5), (2, 1.0), (3, 2.0), (6, 2.0)):
+        for _ in range(20):
+            assert base * 0.5 <= _real_delay(step, attempt) <= base
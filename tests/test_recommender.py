@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+import recommender
+from recommender import RecommendError
+from lotto_match import numbers_to_mask
+
+
+def _heavy(numbers):
+    """지정 번호에 몰린 가중치 - 좁은 조건도 금방 채워지게"""
+    w = np.full(45, 1e-6)
+    w[np.asarray(numbers) - 1] = 1.0
+    return w / w.sum()
+
+
+def test_same_seed_same_tickets():
+    a, info = recommender.generate(50, seed=7, sum_range=(100, 160))
+    b, _ = recommender.generate(50, seed=7, sum_range=(100, 160))
+    c, _ = recommender.generate(50, seed=8, sum_range=(100, 160))
+    assert info["seed"] == 7
+    assert (a == b).all()
+    assert not (a == c).all()
+
+
+def test_unseeded_call_reports_a_reusable_seed():
+    a, info = recommender.generate(5)
+    b, _ = recommender.generate(5, seed=info["seed"])
+    assert (a == b).all()
+
+
+def test_constraints_hold_for_every_ticket():
+    tickets, info = recommender.generate(300, seed=1, sum_range=(110, 150), odd_range=(2, 4),
+                                         low_range=(3, 3), max_run=2)
+    assert tickets.shape == (300, 6) and not info["exhausted"]
+    assert (np.diff(tickets, axis=1) > 0).all()
+    d = recommender.describe(tickets)
+    assert all(110 <= s <= 150 for s in d["sum"])
+    assert all(2 <= o <= 4 for o in d["odd"])
+    assert set(d["low"]) == {3}
+    assert max(d["max_run"]) <= 2
+    assert len({tuple(t) for t in tickets.tolist()}) == 300
+    assert sum(info["rejected"].values()) + 300 <= info["generated"]
+
+
+def test_excluded_combinations_never_returned():
+    # 합계 21~22 는 조합이 [1..6], [1,2,3,4,5,7] 두 가지뿐 → 하나를 제외하면 남은 하나만
+    excluded = [numbers_to_mask([1, 2, 3, 4, 5, 6])]
+    tickets, info = recommender.generate(1, seed=3, weights=_heavy(range(1, 8)), sum_range=(21, 22),
+                                         exclude_masks=excluded)
+    assert tickets.tolist() == [[1, 2, 3, 4, 5, 7]]
+    assert info["rejected"]["excluded"] > 0
+
+
+def test_exhausted_when_constraints_too_tight(monkeypatch):
+    monkeypatch.setattr(recommender, "MAX_GENERATED", 20000)
+    tickets, info = recommender.generate(3, seed=0, weights=_heavy(range(1, 7)), sum_range=(21, 21))
+    assert tickets.tolist() == [[1, 2, 3, 4, 5, 6]]
+    assert info["exhausted"] and info["generated"] <= 20000
+    assert info["rejected"]["duplicate"] > 0
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"count": 0}, {"count": recommender.MAX_COUNT + 1},
+    {"count": 1, "sum_range": (200, 100)}, {"count": 1, "odd_range": (0, 7)},
+    {"count": 1, "low_range": (-1, 3)}, {"count": 1, "max_run": 0},
+])
+def test_invalid_conditions_raise(kwargs):
+    with pytest.raises(RecommendError):
+        recommender.generate(**kwargs)
+
+
+def test_number_weights():
+    freq = np.arange(45)
+    assert recommender.number_weights("none", freq) is None
+    assert recommender.number_weights("frequency", np.zeros(45)) is None
+    hot, cold = recommender.number_weights("frequency", freq), recommender.number_weights("cold", freq)
+    assert np.isclose(hot.sum(), 1) and np.isclose(cold.sum(), 1)
+    assert hot.argmax() == 44 and cold.argmax() == 0
+    with pytest.raises(RecommendError):
+        recommender.number_weights("lucky", freq)
+
+
+def test_weighted_sampling_prefers_heavy_numbers():
+    tickets, _ = recommender.generate(1, seed=5, weights=_heavy([3, 9, 18, 27, 36, 44]))
+    assert tickets.tolist() == [[3, 9, 18, 27, 36, 44]]
+
+
+@pytest.mark.parametrize("seed", [-1, 1.5, True, "7"])
+def test_invalid_seed_raises(seed):
+    with pytest.raises(RecommendError):
+        recommender.generate(1, seed=seed)
@@ -0,0 +1,69 @@
+import numpy as np
+
+from stats_engine import StatsEngine
+
+
+def _draws(n, seed=0):
+    rng = np.random.default_rng(seed)
+    draws = []
+    for r in range(1, n + 1):
+        picks = rng.choice(45, size=7, replace=False) + 1
+        draws.append({"round": r, "numbers": sorted(picks[:6].tolist()), "bonus": int(picks[6])})
+    return draws
+
+
+def _full(draws):
+    engine = StatsEngine()
+    engine.update(draws)
+    return engine.snapshot()
+
+
+def test_incremental_update_matches_full_recompute():
+    draws = _draws(230)
+    engine = StatsEngine()
+    for end in (1, 60, 61, 170, 230):
+        assert engine.update(draws[:end])
+    assert engine.snapshot() == _full(draws)
+
+
+def test_no_change_returns_false_and_keeps_etag():
+    draws = _draws(20)
+    engine = StatsEngine()
+    assert engine.update(draws)
+    etag, _ = engine.snapshot()
+    assert not engine.update(draws)
+    assert engine.snapshot()[0] == etag
+
+
+def test_backfilled_gap_triggers_full_recompute():
+    draws = _draws(40)
+    engine = StatsEngine()
+    engine.update(draws[:10] + draws[20:])  # 11~20 회 누락
+    engine.update(draws)                    # 중간이 채워짐
+    assert engine.snapshot() == _full(draws)
+
+
+def test_snapshot_values():
+    draws = _draws(120, seed=1)
+    _, snap = _full(draws)
+    hits = np.zeros((120, 45), dtype=int)
+    for i, d in enumerate(draws):
+        hits[i, np.array(d["numbers"]) - 1] = 1
+    assert snap["rounds"] == 120 and snap["last_round"] == 120
+    assert snap["frequency"] == hits.sum(axis=0).tolist()
+    assert snap["windows"]["10"] == hits[-10:].sum(axis=0).tolist()
+    assert snap["windows"]["100"] == hits[-100:].sum(axis=0).tolist()
+    pairs = hits.T @ hits
+    np.fill_diagonal(pairs, 0)
+    assert snap["pairs"] == pairs.tolist()
+    last_seen = [max((i for i in range(120) if hits[i, n]), default=-1) for n in range(45)]
+    assert snap["overdue"] == [119 - i for i in last_seen]
+    assert sum(snap["odd_even"]) == sum(snap["low_high"]) == sum(snap["sum"]["histogram"]) == 120
+
+
+def test_weights_and_frequency():
+    engine = StatsEngine()
+    assert np.allclose(engine.weights(), 1 / 45)
+    engine.update(_draws(30))
+    assert np.isclose(engine.weights().sum(), 1)
+    assert engine.frequency().sum() == 30 * 6
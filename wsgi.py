@@ -0,0 +1,7 @@
+# ══════════════════════════════════════════════════════════════
+#  WSGI 진입점 (gunicorn wsgi:app)
+# ══════════════════════════════════════════════════════════════
+# app.py 는 임포트만으로 백그라운드 작업을 띄우지 않으므로 서버 기동 시 여기서 시작
+from app import app, start_background
+
+start_background()